@@ -0,0 +1,348 @@
+#!/usr/bin/env python
+
+#
+# This work is licensed under the terms of the MIT license.
+# For a copy, see <https://opensource.org/licenses/MIT>.
+
+"""
+Benchmark suite for the per-tick overhead of the scenario stack
+
+All benchmarks run against the headless fake CARLA backend (srunner/backend/fake_carla),
+hence no CARLA server is required. The CARLA PythonAPI is still needed for the agents
+package (RoadOption, and the agents used by the atomic behaviors), i.e. ${CARLA_ROOT}/PythonAPI
+has to be on the PYTHONPATH. The carla egg is not needed, and the benchmark requires Python 3.
+The following benchmarks are available:
+- tick_scenario: cost of ScenarioManager._tick_scenario() for every scenario configuration
+- data_provider: cost of CarlaDataProvider.on_carla_tick() for a growing number of actors
+- criteria: cost of the route criteria for a growing route length
+- sensor_interface: throughput of the camera callback and SensorInterface for growing image sizes
+
+The results are written as JSON, to allow tracking regressions over time.
+"""
+
+from __future__ import print_function
+import argparse
+from argparse import RawTextHelpFormatter
+from datetime import datetime
+import json
+import platform
+import random
+import sys
+import timeit
+
+import numpy as np
+import py_trees
+
+from srunner.backend import fake_carla
+fake_carla.install()
+
+# The fake backend has to be registered as carla before carla, the agents package and everything
+# depending on them is imported, which rules out the usual import order and grouping.
+# pylint: disable=wrong-import-position,wrong-import-order,ungrouped-imports
+import carla
+from agents.navigation.local_planner import RoadOption
+
+from scenario_runner import SCENARIOS, VERSION
+from srunner.challenge.envs.sensor_interface import CallBack, SensorInterface
+from srunner.scenariomanager.atomic_scenario_criteria import InRouteTest, RouteCompletionTest
+from srunner.scenariomanager.carla_data_provider import CarlaBlueprintCache, CarlaDataProvider
+from srunner.scenariomanager.scenario_manager import ScenarioManager
+from srunner.scenariomanager.timer import GameTime
+from srunner.scenarios.config_parser import iterate_scenario_configurations
+from srunner.scenarios.scenario_registry import get_scenario_class_or_fail
+# pylint: enable=wrong-import-position,wrong-import-order,ungrouped-imports
+
+
+BENCHMARKS = ["tick_scenario", "data_provider", "criteria", "sensor_interface"]
+
+
+def summarize(samples):
+    """
+    Statistics (in seconds) of a list of timing samples
+    """
+    if not samples:
+        return {'samples': 0}
+
+    samples = np.asarray(samples, dtype=np.float64)
+    p50, p90, p99 = np.percentile(samples, [50, 90, 99])
+    return {'samples': int(samples.shape[0]),
+            'mean': float(samples.mean()),
+            'p50': float(p50),
+            'p90': float(p90),
+            'p99': float(p99),
+            'max': float(samples.max()),
+            'total': float(samples.sum())}
+
+
+def spawn_vehicle(world, model, transform, autopilot=False):
+    """
+    Spawn a vehicle of the given model (wildcards allowed)
+    """
+    blueprint = random.choice(CarlaBlueprintCache.filter(world, model))
+    vehicle = world.spawn_actor(blueprint, transform)
+    vehicle.set_autopilot(autopilot)
+    return vehicle
+
+
+class TickTimer(object):
+
+    """
+    Times the world tick callbacks registered between the construction of the
+    timer and register_after_tick(), i.e. the ScenarioManager tick
+    """
+
+    def __init__(self, world):
+        self.samples = []
+        self._world = world
+        self._game_time = 0.0
+        self._start = 0.0
+        self._callback_ids = [world.on_tick(self._before_tick)]
+
+    def register_after_tick(self):
+        """
+        Register the callback stopping the time measurement
+        """
+        self._callback_ids.append(self._world.on_tick(self._after_tick))
+
+    def remove(self):
+        """
+        Unregister the callbacks from the world
+        """
+        for callback_id in self._callback_ids:
+            self._world.remove_on_tick(callback_id)
+        self._callback_ids = []
+
+    def _before_tick(self, _):
+        self._game_time = GameTime.get_time()
+        self._start = timeit.default_timer()
+
+    def _after_tick(self, _):
+        # the manager only advances the game time while the scenario is running
+        if GameTime.get_time() != self._game_time:
+            self.samples.append(timeit.default_timer() - self._start)
+
+
+def benchmark_tick_scenario(client):
+    """
+    Run every scenario configuration to its end, with the ego vehicle on
+    autopilot, and time each tick of the ScenarioManager.
+    """
+    results = {}
+
+    for config_file in sorted(SCENARIOS.keys()):
+        for config in iterate_scenario_configurations("group:" + config_file, "group:" + config_file):
+            world = client.load_world(config.town)
+            scenario_class = get_scenario_class_or_fail(config.type, SCENARIOS.keys())
+
+            # scenarios depending on a specific traffic light
+            traffic_light_location = getattr(scenario_class, '_traffic_light_location', None)
+            if traffic_light_location is not None:
+                world.add_traffic_light(carla.Transform(traffic_light_location))
+
+            # callbacks are invoked in the order of registration
+            tick_timer = TickTimer(world)
+            manager = ScenarioManager(world, client=client)
+            tick_timer.register_after_tick()
+
+            ego_vehicle = spawn_vehicle(world, config.ego_vehicle.model, config.ego_vehicle.transform, True)
+            other_actors = [spawn_vehicle(world, actor.model, actor.transform) for actor in config.other_actors]
+            scenario = scenario_class(world, ego_vehicle, other_actors, config.town)
+
+            manager.load_scenario(scenario)
+            world.start_ticking()
+            manager.run_scenario()
+            world.stop_ticking()
+            manager.stop_scenario()
+            tick_timer.remove()
+
+            result = summarize(tick_timer.samples)
+            result['type'] = config.type
+            result['status'] = str(manager.scenario_tree.status)
+            result['nodes'] = len(manager.scenario.tree_index.nodes)
+            result['leaves'] = len(manager.scenario.tree_index.leaves)
+            result['criteria'] = len(manager.scenario.tree_index.criteria)
+            result['game_time'] = manager.scenario_duration_game
+            results[config.name] = result
+
+            for actor in other_actors + [ego_vehicle]:
+                actor.destroy()
+            del scenario
+
+    return results
+
+
+def benchmark_data_provider(client, actor_counts, ticks):
+    """
+    Time CarlaDataProvider.on_carla_tick() for a growing number of registered actors
+    """
+    results = {}
+
+    for actor_count in actor_counts:
+        world = client.load_world("Town01")
+        carla_map = world.get_map()
+
+        actors = []
+        for index in range(actor_count):
+            lane = index % (2 * carla_map.lanes_per_direction)
+            location = carla.Location(x=10.0 * (index // (2 * carla_map.lanes_per_direction)),
+                                      y=(lane - carla_map.lanes_per_direction + 0.5) * carla_map.lane_width)
+            actors.append(spawn_vehicle(world, 'vehicle.*', carla.Transform(location), True))
+        CarlaDataProvider.register_actors(actors)
+
+        samples = []
+        for _ in range(ticks):
+            world.tick()
+            start = timeit.default_timer()
+            CarlaDataProvider.on_carla_tick()
+            samples.append(timeit.default_timer() - start)
+
+        result = summarize(samples)
+        result['per_actor_mean'] = result['mean'] / actor_count
+        results[str(actor_count)] = result
+
+        CarlaDataProvider.cleanup()
+        for actor in actors:
+            actor.destroy()
+
+    return results
+
+
+def benchmark_criteria(client, route_lengths, ticks):
+    """
+    Time the route criteria (InRouteTest, RouteCompletionTest) for a growing
+    number of route waypoints, with the ego vehicle driving along the route
+    """
+    results = {}
+
+    for route_length in route_lengths:
+        world = client.load_world("Town01")
+        lane_y = 0.5 * world.get_map().lane_width
+        route = [(carla.Location(x=float(index), y=lane_y), RoadOption.LANEFOLLOW) for index in range(route_length)]
+
+        ego_vehicle = spawn_vehicle(world, 'vehicle.lincoln.mkz2017', carla.Transform(route[0][0]), True)
+        CarlaDataProvider.register_actor(ego_vehicle)
+
+        criteria = py_trees.composites.Parallel("Criteria", policy=py_trees.common.ParallelPolicy.SUCCESS_ON_ALL)
+        criteria.add_child(InRouteTest(ego_vehicle, radius=30.0, route=route, offroad_max=20))
+        criteria.add_child(RouteCompletionTest(ego_vehicle, route=route))
+
+        samples = []
+        for _ in range(ticks):
+            world.tick()
+            CarlaDataProvider.on_carla_tick()
+            start = timeit.default_timer()
+            criteria.tick_once()
+            samples.append(timeit.default_timer() - start)
+
+        results[str(route_length)] = summarize(samples)
+
+        CarlaDataProvider.cleanup()
+        ego_vehicle.destroy()
+
+    return results
+
+
+def benchmark_sensor_interface(client, image_sizes, frames):
+    """
+    Time the camera callback (conversion and SensorInterface.update_sensor())
+    and SensorInterface.get_data() for growing image sizes
+    """
+    results = {}
+    world = client.load_world("Town01")
+
+    for width, height in image_sizes:
+        blueprint = CarlaBlueprintCache.find(world, 'sensor.camera.rgb')
+        blueprint.set_attribute('image_size_x', width)
+        blueprint.set_attribute('image_size_y', height)
+        sensor = world.spawn_actor(blueprint, carla.Transform())
+
+        sensor_interface = SensorInterface()
+        callback = CallBack('rgb', sensor, sensor_interface)
+        image = sensor._create_image(0, 0.0, carla.Transform())    # pylint: disable=protected-access
+
+        update_samples = []
+        get_data_samples = []
+        for frame in range(frames):
+            image.frame_number = frame
+            start = timeit.default_timer()
+            callback(image)
+            update_samples.append(timeit.default_timer() - start)
+
+            start = timeit.default_timer()
+            sensor_interface.get_data()
+            get_data_samples.append(timeit.default_timer() - start)
+
+        megabytes = width * height * 4 / 1e6
+        update = summarize(update_samples)
+        get_data = summarize(get_data_samples)
+        update['frames_per_second'] = 1.0 / update['mean']
+        update['megabytes_per_second'] = megabytes / update['mean']
+        get_data['frames_per_second'] = 1.0 / get_data['mean']
+        results["{}x{}".format(width, height)] = {'update_sensor': update, 'get_data': get_data}
+
+        sensor.destroy()
+
+    return results
+
+
+def main(args):
+    """
+    Run the selected benchmarks and return the results as dictionary
+    """
+    random.seed(args.seed)
+    client = carla.Client(args.host, int(args.port))
+
+    results = {'version': VERSION,
+               'date': datetime.now().isoformat(),
+               'python': platform.python_version(),
+               'platform': platform.platform(),
+               'benchmarks': {}}
+
+    for benchmark in args.benchmarks:
+        print("Running benchmark {}".format(benchmark), file=sys.stderr)
+        if benchmark == "tick_scenario":
+            output = benchmark_tick_scenario(client)
+        elif benchmark == "data_provider":
+            output = benchmark_data_provider(client, args.actor_counts, args.ticks)
+        elif benchmark == "criteria":
+            output = benchmark_criteria(client, args.route_lengths, args.ticks)
+        else:
+            output = benchmark_sensor_interface(
+                client, [tuple(int(value) for value in size.split('x')) for size in args.image_sizes], args.ticks)
+        results['benchmarks'][benchmark] = output
+
+    return results
+
+
+if __name__ == '__main__':
+
+    DESCRIPTION = ("CARLA Scenario Runner: Benchmark the per-tick overhead of the scenario stack\n"
+                   "Current version: " + str(VERSION))
+
+    PARSER = argparse.ArgumentParser(description=DESCRIPTION,
+                                     formatter_class=RawTextHelpFormatter)
+    PARSER.add_argument('--host', default='127.0.0.1',
+                        help='IP of the (fake) host server (default: localhost)')
+    PARSER.add_argument('--port', default='2000',
+                        help='TCP port of the (fake) host server (default: 2000)')
+    PARSER.add_argument('--benchmarks', nargs='+', default=BENCHMARKS, choices=BENCHMARKS,
+                        help='Benchmarks to run (default: all)')
+    PARSER.add_argument('--ticks', type=int, default=500,
+                        help='Number of ticks / frames per measurement (default: 500)')
+    PARSER.add_argument('--actor-counts', type=int, nargs='+', default=[10, 50, 100, 200, 500],
+                        help='Actor counts for the data_provider benchmark')
+    PARSER.add_argument('--route-lengths', type=int, nargs='+', default=[10, 100, 1000, 5000],
+                        help='Route lengths (waypoints) for the criteria benchmark')
+    PARSER.add_argument('--image-sizes', nargs='+', default=['320x240', '800x600', '1280x720', '1920x1080'],
+                        help='Image sizes (WIDTHxHEIGHT) for the sensor_interface benchmark')
+    PARSER.add_argument('--seed', type=int, default=0, help='Seed for the random actor models')
+    PARSER.add_argument('--output', default=None, help='JSON file to write the results to (default: stdout)')
+    ARGUMENTS = PARSER.parse_args()
+
+    RESULTS = main(ARGUMENTS)
+
+    if ARGUMENTS.output is not None:
+        with open(ARGUMENTS.output, 'w', encoding='utf-8') as fd:
+            json.dump(RESULTS, fd, indent=2, sort_keys=True)
+    else:
+        print(json.dumps(RESULTS, indent=2, sort_keys=True))
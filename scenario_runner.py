@@ -17,37 +17,51 @@ from __future__ import print_function
 import argparse
 from argparse import RawTextHelpFormatter
 from datetime import datetime
+import os
+import random
 import traceback
 
 import sys
 
-import carla
-
-from srunner.scenarios.follow_leading_vehicle import *
-from srunner.scenarios.opposite_vehicle_taking_priority import *
-from srunner.scenarios.object_crash_vehicle import *
-from srunner.scenarios.no_signal_junction_crossing import *
-from srunner.scenarios.object_crash_intersection import *
-from srunner.scenarios.control_loss import *
-from srunner.scenarios.config_parser import *
-from srunner.scenariomanager.scenario_manager import ScenarioManager
+from srunner.scenariomanager.checkpoint import CheckpointJournal
+from srunner.scenarios.scenario_catalog import get_scenario_catalog
+from srunner.scenarios.scenario_registry import get_scenario_class_or_fail, get_scenario_groups
 
 
 # Version of scenario_runner
 VERSION = 0.2
 
 
-# Dictionary of all supported scenarios.
-# key = Name of config file in Configs/
-# value = List as defined in the scenario module
-SCENARIOS = {
-    "FollowLeadingVehicle": FOLLOW_LEADING_VEHICLE_SCENARIOS,
-    "ObjectCrossing": OBJECT_CROSSING_SCENARIOS,
-    "RunningRedLight": RUNNING_RED_LIGHT_SCENARIOS,
-    "NoSignalJunction": NO_SIGNAL_JUNCTION_SCENARIOS,
-    "VehicleTurning": VEHICLE_TURNING_SCENARIOS,
-    "ControlLoss": CONTROL_LOSS_SCENARIOS
-}
+# List of all supported scenario groups (see srunner/scenarios/scenario_registry.py)
+# The groups are discovered from the scenario modules and the "srunner.scenarios"
+# entry points. ChallengeBasic requires the challenge evaluator and is excluded.
+# The scenario modules, the CARLA PythonAPI and the scenario manager are only
+# imported once a scenario is executed, hence the list commands start fast.
+SCENARIOS = get_scenario_groups(exclude=["ChallengeBasic"])
+
+
+def import_simulation_modules():
+    """
+    Import the CARLA PythonAPI and the modules needed to execute scenarios
+    """
+    # These imports are deferred to the execution of scenarios, as they load the CARLA
+    # PythonAPI (and through it the agents package), which --list / --list-groups and
+    # importing SCENARIOS (e.g. in scenario_benchmark.py) must not depend on.
+    # pylint: disable=import-outside-toplevel
+    import carla
+    from srunner.scenariomanager.actor_spawner import ActorPool, ActorSpawnRequest, BatchActorSpawner
+    from srunner.scenariomanager.result_cache import ResultCache
+    from srunner.scenariomanager.result_sink import ResultSink
+    from srunner.scenariomanager.result_writer import JUnitReport, ResultOutputProvider
+    from srunner.scenariomanager.scenario_manager import ScenarioManager
+    from srunner.scenarios.config_parser import find_scenario_config, iterate_scenario_configurations
+
+    return argparse.Namespace(carla=carla, ActorPool=ActorPool, ActorSpawnRequest=ActorSpawnRequest,
+                              BatchActorSpawner=BatchActorSpawner, ResultCache=ResultCache, ResultSink=ResultSink,
+                              JUnitReport=JUnitReport, ResultOutputProvider=ResultOutputProvider,
+                              ScenarioManager=ScenarioManager,
+                              find_scenario_config=find_scenario_config,
+                              iterate_scenario_configurations=iterate_scenario_configurations)
 
 
 class ScenarioRunner(object):
@@ -69,9 +83,17 @@ class ScenarioRunner(object):
     client_timeout = 10.0  # in seconds
     wait_for_world = 10.0  # in seconds
 
+    # Modules imported by import_simulation_modules()
+    modules = None
+
     # CARLA world and scenario handlers
     world = None
     manager = None
+    spawner = None
+    result_sinks = []
+    junit_report = None
+    journal = None
+    result_cache = None
 
     def __init__(self, args):
         """
@@ -79,10 +101,12 @@ class ScenarioRunner(object):
         Setup ScenarioManager
         """
 
+        self.modules = import_simulation_modules()
+
         # First of all, we need to create the client that will send the requests
         # to the simulator. Here we'll assume the simulator is accepting
         # requests in the localhost at port 2000.
-        client = carla.Client(args.host, int(args.port))
+        client = self.modules.carla.Client(args.host, int(args.port))
         client.set_timeout(self.client_timeout)
 
         # Once we have a client we can retrieve the world that is currently
@@ -93,7 +117,25 @@ class ScenarioRunner(object):
         self.world.wait_for_tick(self.wait_for_world)
 
         # Create scenario manager
-        self.manager = ScenarioManager(self.world, args.debug)
+        self.manager = self.modules.ScenarioManager(self.world, args.debug, client=client)
+        self.spawner = self.modules.BatchActorSpawner(client, self.world,
+                                                      self.modules.ActorPool(client) if args.actor_pool else None)
+
+        # The results of all scenarios are collected in one JSON Lines file / JUnit report
+        self.result_sinks = []
+        if args.results_file:
+            self.result_sinks.append(self.modules.ResultSink(args.results_file))
+        if args.junit_report:
+            self.junit_report = self.modules.JUnitReport(args.junit_report, resume=args.resume)
+            self.result_sinks.append(self.junit_report)
+
+        # Finished scenario executions are journaled, to resume an interrupted batch
+        if args.checkpoint:
+            self.journal = CheckpointJournal(args.checkpoint, args.resume, overwrite=args.force)
+
+        # Results of identical scenario executions are reused
+        if args.result_cache:
+            self.result_cache = self.modules.ResultCache()
 
     def __del__(self):
         """
@@ -101,130 +143,183 @@ class ScenarioRunner(object):
         """
 
         self.cleanup(True)
+
+        # Result sinks left open here belong to an interrupted batch
+        for result_sink in self.result_sinks:
+            if result_sink is self.junit_report:
+                result_sink.close(finished=False)
+            else:
+                result_sink.close()
+        self.result_sinks = []
+        if self.journal is not None:
+            self.journal.close()
+            self.journal = None
         if self.manager is not None:
             del self.manager
         if self.world is not None:
             del self.world
 
-    @staticmethod
-    def get_scenario_class_or_fail(scenario):
-        """
-        Get scenario class by scenario name
-        If scenario is not supported or not found, exit script
-        """
-
-        for scenarios in SCENARIOS.values():
-            if scenario in scenarios:
-                if scenario in globals():
-                    return globals()[scenario]
-
-        print("Scenario '{}' not supported ... Exiting".format(scenario))
-        sys.exit(-1)
-
     def cleanup(self, ego=False):
         """
         Remove and destroy all actors
-        """
-
-        # We need enumerate here, otherwise the actors are not properly removed
-        for i, _ in enumerate(self.actors):
-            if self.actors[i] is not None:
-                self.actors[i].destroy()
-                self.actors[i] = None
-
-        self.actors = []
-
-        if ego and self.ego_vehicle is not None:
-            self.ego_vehicle.destroy()
-            self.ego_vehicle = None
 
-    def setup_vehicle(self, model, spawn_point, hero=False):
-        """
-        Function to setup the most relevant vehicle parameters,
-        incl. spawn point and vehicle model.
+        With --actor-pool, the actors are parked to be reused by the next
+        scenario, and only destroyed together with the ego vehicle
         """
 
-        blueprint_library = self.world.get_blueprint_library()
-
-        # Get vehicle by model
-        blueprint = random.choice(blueprint_library.filter(model))
-        if hero:
-            blueprint.set_attribute('role_name', 'hero')
-        else:
-            blueprint.set_attribute('role_name', 'scenario')
-
-        vehicle = self.world.try_spawn_actor(blueprint, spawn_point)
-
-        if vehicle is None:
-            raise Exception(
-                "Error: Unable to spawn vehicle {} at {}".format(model, spawn_point))
-        else:
-            # Let's deactivate the autopilot of the vehicle
-            vehicle.set_autopilot(False)
+        if self.spawner is not None:
+            self.spawner.release(self.actors)
+        self.actors = []
 
-        return vehicle
+        if ego:
+            if self.spawner is not None:
+                self.spawner.destroy_pool()
+            if self.ego_vehicle is not None:
+                self.ego_vehicle.destroy()
+                self.ego_vehicle = None
 
     def prepare_actors(self, config):
         """
         Spawn or update all scenario actors according to
         their parameters provided in config
+
+        All actors are spawned with one command batch (see BatchActorSpawner)
         """
 
+        spawn_request = self.modules.ActorSpawnRequest
+        requests = [spawn_request(actor.model, actor.transform) for actor in config.other_actors]
+
         # If ego_vehicle already exists, just update location
         # Otherwise spawn ego vehicle
         if self.ego_vehicle is None:
-            self.ego_vehicle = self.setup_vehicle(config.ego_vehicle.model, config.ego_vehicle.transform, True)
+            requests.insert(0, spawn_request(config.ego_vehicle.model, config.ego_vehicle.transform, True))
         else:
             self.ego_vehicle.set_transform(config.ego_vehicle.transform)
 
+        actors, errors = self.spawner.spawn(requests)
+        if self.ego_vehicle is None:
+            self.ego_vehicle = actors.pop(0)
+
         # spawn all other actors
-        for actor in config.other_actors:
-            new_actor = self.setup_vehicle(actor.model, actor.transform)
-            self.actors.append(new_actor)
+        self.actors.extend(actor for actor in actors if actor is not None)
+
+        errors = [error for error in errors if error is not None]
+        if errors:
+            raise Exception("\n".join(errors))
 
-    def analyze_scenario(self, args, config):
+    @staticmethod
+    def _get_output_filenames(args, config):
         """
-        Provide feedback about success/failure of a scenario
+        Returns the names of the text file (--file) and JUnit file (--junit) of a scenario (or None)
         """
-
         current_time = str(datetime.now().strftime('%Y-%m-%d-%H-%M-%S'))
-        junit_filename = None
-        if args.junit:
-            junit_filename = config.name + current_time + ".xml"
         filename = None
         if args.file:
             filename = config.name + current_time + ".txt"
+        junit_filename = None
+        if args.junit:
+            junit_filename = config.name + current_time + ".xml"
+        return filename, junit_filename
+
+    def analyze_scenario(self, args, config, repetition=0, seed=None, cache_key=None):
+        """
+        Provide feedback about success/failure of a scenario
+        The result is stored in the result cache, if a cache_key is given.
+        """
+
+        filename, junit_filename = self._get_output_filenames(args, config)
+
+        result_sinks = list(self.result_sinks)
+        if cache_key is not None:
+            result_sinks.append(self.result_cache.get_result_sink(cache_key))
+
+        failure = self.manager.analyze_scenario(args.output, filename, junit_filename,
+                                                result_sinks, config.name, seed)
+        if not failure:
+            print("Success!")
+        else:
+            print("Failure!")
+
+        if self.journal is not None:
+            self.journal.add(config.name, repetition, seed, "FAILURE" if failure else "SUCCESS")
+
+    def analyze_cached_scenario(self, args, config, record, repetition=0, seed=None):
+        """
+        Provide feedback about success/failure of a scenario taken from the result cache
+        The outputs (--output, --file, --junit) are the same as for an executed scenario.
+        """
+        print("Using cached result of scenario: " + config.name)
+        filename, junit_filename = self._get_output_filenames(args, config)
+        self.modules.ResultOutputProvider(None, record['result'], args.output, filename, junit_filename,
+                                          record=record).write()
 
-        if not self.manager.analyze_scenario(args.output, filename, junit_filename):
+        failure = record['result'] in ("FAILURE", "TIMEOUT")
+        if not failure:
             print("Success!")
         else:
             print("Failure!")
 
+        for result_sink in self.result_sinks:
+            result_sink.write(record)
+
+        if self.journal is not None:
+            self.journal.add(config.name, repetition, seed, "FAILURE" if failure else "SUCCESS")
+
+    def _get_cache_key(self, args, config, seed):
+        """
+        Returns the result cache key of a scenario execution, or None if it is not cached
+        """
+        # Unseeded randomized executions are not reproducible, hence not cached
+        if self.result_cache is None or (seed is None and args.randomize):
+            return None
+        return self.result_cache.get_run_key(config.name, config.type, seed, "scenario_runner-{}".format(VERSION),
+                                             randomize=args.randomize)
+
     def run(self, args):
         """
         Run all scenarios according to provided commandline args
         """
 
+        # Every scenario execution gets its own seed (args.seed + number of the execution)
+        execution = 0
+
         # Setup and run the scenarios for repetition times
-        for _ in range(int(args.repetitions)):
+        for repetition in range(int(args.repetitions)):
 
             # Load the scenario configurations provided in the config file
             scenario_configurations = None
             if args.scenario.startswith("group:"):
-                scenario_configurations = parse_scenario_configuration(args.scenario, args.scenario)
+                scenario_configurations = self.modules.iterate_scenario_configurations(args.scenario, args.scenario)
             else:
-                scenario_config_file = find_scenario_config(args.scenario)
+                scenario_config_file = self.modules.find_scenario_config(args.scenario)
                 if scenario_config_file is None:
                     print("Configuration for scenario {} cannot be found!".format(args.scenario))
                     continue
-                scenario_configurations = parse_scenario_configuration(scenario_config_file, args.scenario)
+                scenario_configurations = self.modules.iterate_scenario_configurations(scenario_config_file,
+                                                                                       args.scenario)
 
             # Execute each configuration
             for config in scenario_configurations:
 
+                seed = args.seed + execution if args.seed is not None else None
+                execution += 1
+
+                if self.journal is not None and self.journal.is_finished(config.name, repetition, seed):
+                    print("Skipping finished scenario: " + config.name)
+                    continue
+
+                cache_key = self._get_cache_key(args, config, seed)
+                if cache_key is not None and not args.force:
+                    record = self.result_cache.get(cache_key)
+                    if record is not None:
+                        self.analyze_cached_scenario(args, config, record, repetition, seed)
+                        continue
+
                 # Prepare scenario
                 print("Preparing scenario: " + config.name)
-                scenario_class = ScenarioRunner.get_scenario_class_or_fail(config.type)
+                scenario_class = get_scenario_class_or_fail(config.type, SCENARIOS.keys())
+                if seed is not None:
+                    random.seed(seed)
                 try:
                     self.prepare_actors(config)
                     scenario = scenario_class(self.world,
@@ -242,10 +337,14 @@ class ScenarioRunner(object):
 
                 # Load scenario and run it
                 self.manager.load_scenario(scenario)
+                if args.record_trajectory:
+                    current_time = str(datetime.now().strftime('%Y-%m-%d-%H-%M-%S'))
+                    self.manager.start_trajectory_recording(
+                        os.path.join(args.record_trajectory, config.name + current_time))
                 self.manager.run_scenario()
 
                 # Provide outputs if required
-                self.analyze_scenario(args, config)
+                self.analyze_scenario(args, config, repetition, seed, cache_key)
 
                 # Stop scenario and cleanup
                 self.manager.stop_scenario()
@@ -255,6 +354,10 @@ class ScenarioRunner(object):
 
             print("No more scenarios .... Exiting")
 
+        for result_sink in self.result_sinks:
+            result_sink.close()
+        self.result_sinks = []
+
 
 if __name__ == '__main__':
 
@@ -271,6 +374,29 @@ if __name__ == '__main__':
     PARSER.add_argument('--output', action="store_true", help='Provide results on stdout')
     PARSER.add_argument('--file', action="store_true", help='Write results into a txt file')
     PARSER.add_argument('--junit', action="store_true", help='Write results into a junit file')
+    PARSER.add_argument('--results-file', default=None,
+                        help='Append one JSON record per scenario to this JSON Lines file')
+    PARSER.add_argument('--junit-report', default=None,
+                        help='Write the results of all scenarios into one consolidated junit file')
+    PARSER.add_argument('--seed', type=int, default=None,
+                        help='Seed of the random number generator (incremented for every scenario execution)')
+    PARSER.add_argument('--checkpoint', default=None,
+                        help='Journal file of the finished scenario executions. A journal with records is\n'
+                             'only continued with --resume or overwritten with --force')
+    PARSER.add_argument('--resume', action="store_true",
+                        help='Skip the scenario executions finished according to the --checkpoint journal\n'
+                             'and continue the --junit-report of the interrupted batch')
+    PARSER.add_argument('--result-cache', action="store_true",
+                        help='Reuse the results of identical scenario executions (same configuration, scenario\n'
+                             'source, seed and version) instead of running them again')
+    PARSER.add_argument('--force', action="store_true",
+                        help='Run all scenarios, even if a cached result exists (the cache is updated),\n'
+                             'and overwrite a --checkpoint journal with records instead of refusing to start')
+    PARSER.add_argument('--actor-pool', action="store_true",
+                        help='Park the actors of a finished scenario and reuse them in the next scenarios,\n'
+                             'instead of destroying and spawning them again')
+    PARSER.add_argument('--record-trajectory', default=None,
+                        help='Directory to record the actor trajectories of every scenario into')
     # pylint: disable=line-too-long
     PARSER.add_argument(
         '--scenario', help='Name of the scenario to be executed. Use the preposition \'group:\' to run all scenarios of one class, e.g. ControlLoss or FollowLeadingVehicle')
@@ -284,7 +410,7 @@ if __name__ == '__main__':
 
     if ARGUMENTS.list:
         print("Currently the following scenarios are supported:")
-        print(*get_list_of_scenarios(), sep='\n')
+        print(*get_scenario_catalog().get_names(), sep='\n')
         sys.exit(0)
 
     if ARGUMENTS.list_class:
@@ -292,6 +418,18 @@ if __name__ == '__main__':
         print(*SCENARIOS.keys(), sep='\n')
         sys.exit(0)
 
+    if ARGUMENTS.resume and not ARGUMENTS.checkpoint:
+        print("Please specify the journal to resume from using '--checkpoint FILE'\n\n")
+        PARSER.print_help(sys.stdout)
+        sys.exit(0)
+
+    if ARGUMENTS.checkpoint and not (ARGUMENTS.resume or ARGUMENTS.force) and \
+            CheckpointJournal.has_records(ARGUMENTS.checkpoint):
+        print("The journal {} is not empty, continue it using '--resume' or overwrite it "
+              "using '--force'\n\n".format(ARGUMENTS.checkpoint))
+        PARSER.print_help(sys.stdout)
+        sys.exit(0)
+
     if ARGUMENTS.scenario is None:
         print("Please specify a scenario using '--scenario SCENARIONAME'\n\n")
         PARSER.print_help(sys.stdout)
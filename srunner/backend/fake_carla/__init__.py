@@ -0,0 +1,49 @@
+#!/usr/bin/env python
+
+#
+# This work is licensed under the terms of the MIT license.
+# For a copy, see <https://opensource.org/licenses/MIT>.
+
+"""
+Headless, in-process stand-in for the CARLA client API.
+
+It implements the subset of the carla module used by scenario_runner, with a
+simple kinematic vehicle model, a procedural road network (parallel straight
+roads along the x axis with a junction every junction_spacing meters), traffic
+lights, as well as collision, lane invasion, camera, lidar and GNSS sensors.
+This allows to run and benchmark the behavior trees without a simulator.
+
+Usage (before anything imports carla):
+
+    from srunner.backend import fake_carla
+    fake_carla.install()
+
+The simulation is advanced with FakeWorld.tick(), or continuously in a
+background thread with FakeWorld.start_ticking().
+
+The package is split into geometry, data (controls, states and sensor data),
+blueprints, road_map, actors, world, command (carla.command) and client.
+"""
+
+import sys
+
+from srunner.backend.fake_carla import command
+from srunner.backend.fake_carla.actors import Actor, ActorList, Sensor, TrafficLight, Vehicle, Walker
+from srunner.backend.fake_carla.blueprints import ActorBlueprint, BlueprintLibrary
+from srunner.backend.fake_carla.client import Client
+from srunner.backend.fake_carla.data import (CollisionEvent, GnssEvent, Image, LaneInvasionEvent, LidarMeasurement,
+                                             SensorData, Timestamp, TrafficLightState, VehicleControl, WalkerControl)
+from srunner.backend.fake_carla.geometry import (BoundingBox, Color, GeoLocation, Location, Rotation, Transform,
+                                                 Vector3D)
+from srunner.backend.fake_carla.road_map import FakeMap, Waypoint
+from srunner.backend.fake_carla.world import DebugHelper, FakeWorld, WorldSettings
+
+
+def install():
+    """
+    Register this package as 'carla' (and its command module as 'carla.command') in sys.modules
+    """
+    if 'carla' in sys.modules and sys.modules['carla'] is not sys.modules[__name__]:
+        raise RuntimeError("The carla module was imported before the fake backend was installed")
+    sys.modules['carla'] = sys.modules[__name__]
+    sys.modules['carla.command'] = command
@@ -0,0 +1,470 @@
+#!/usr/bin/env python
+
+#
+# This work is licensed under the terms of the MIT license.
+# For a copy, see <https://opensource.org/licenses/MIT>.
+
+"""
+Actors of the fake CARLA backend: vehicles, walkers, traffic lights and sensors
+"""
+
+import fnmatch
+import math
+import struct
+
+from srunner.backend.fake_carla.data import (CollisionEvent, GnssEvent, Image, LaneInvasionEvent, LidarMeasurement,
+                                             TrafficLightState, VehicleControl, WalkerControl)
+from srunner.backend.fake_carla.geometry import BoundingBox, Location, Rotation, Transform, Vector3D
+
+
+class Actor(object):
+
+    """
+    Static actor, base class of all other actors
+    """
+
+    def __init__(self, world, actor_id, blueprint, transform, parent=None):
+        self._world = world
+        self.id = actor_id
+        self.type_id = blueprint.id
+        self.attributes = dict(blueprint._attributes)     # pylint: disable=protected-access
+        self.parent = parent
+        self.is_alive = True
+        self.bounding_box = BoundingBox(extent=Vector3D(0.5, 0.5, 0.5))
+        self._transform = Transform(transform.location, transform.rotation)
+        self._velocity = Vector3D()
+        self._simulate_physics = True
+
+    def get_world(self):
+        """
+        Returns the world of the actor
+        """
+        return self._world
+
+    def get_transform(self):
+        """
+        Returns the world transform, composed with the parent transform for attached actors
+        """
+        if self.parent is not None:
+            return Transform(self.parent.get_transform().transform(self._transform.location),
+                             Rotation(yaw=self.parent.get_transform().rotation.yaw + self._transform.rotation.yaw))
+        return Transform(self._transform.location, self._transform.rotation)
+
+    def get_location(self):
+        """
+        Returns the world location
+        """
+        return self.get_transform().location
+
+    def get_velocity(self):
+        """
+        Returns the velocity in m/s
+        """
+        return Vector3D(self._velocity)
+
+    def get_angular_velocity(self):
+        """
+        Returns the angular velocity, which is not simulated
+        """
+        return Vector3D()
+
+    def get_acceleration(self):
+        """
+        Returns the acceleration, which is not simulated
+        """
+        return Vector3D()
+
+    def set_transform(self, transform):
+        """
+        Teleport the actor
+        """
+        self._transform = Transform(transform.location, transform.rotation)
+
+    def set_location(self, location):
+        """
+        Teleport the actor, keeping its rotation
+        """
+        self._transform.location = Location(location)
+
+    def set_velocity(self, velocity):
+        """
+        Set the velocity in m/s
+        """
+        self._velocity = Vector3D(velocity)
+
+    def set_simulate_physics(self, enabled=True):
+        """
+        Enable or disable the motion model of the actor
+        """
+        self._simulate_physics = enabled
+
+    def destroy(self):
+        """
+        Remove the actor (and its children) from the world. Returns False, if it was already destroyed.
+        """
+        if not self.is_alive:
+            return False
+        self.is_alive = False
+        self._world.remove_actor(self)
+        return True
+
+    def tick(self, delta_seconds):
+        """
+        Advance the actor by delta_seconds, static actors do not move
+        """
+
+    def __repr__(self):
+        return "Actor(id={}, type={})".format(self.id, self.type_id)
+
+
+class Vehicle(Actor):
+
+    """
+    Vehicle with a kinematic bicycle model
+    """
+
+    MAX_ACCELERATION = 4.0      # m/s^2 at full throttle
+    MAX_DECELERATION = 8.0      # m/s^2 at full brake
+    DRAG = 0.05                 # 1/s
+    MAX_STEER_ANGLE = 70.0      # degrees
+    WHEELBASE = 2.9             # meters
+    AUTOPILOT_VELOCITY = 10.0   # m/s
+
+    def __init__(self, world, actor_id, blueprint, transform, parent=None):
+        super(Vehicle, self).__init__(world, actor_id, blueprint, transform, parent)
+        two_wheeled = self.attributes.get('number_of_wheels') == '2'
+        self.bounding_box = BoundingBox(extent=Vector3D(0.9, 0.4, 0.8) if two_wheeled else Vector3D(2.4, 1.0, 0.8))
+        self._control = VehicleControl()
+        self._autopilot = False
+        self._speed = 0.0
+
+    def apply_control(self, control):
+        """
+        Apply the vehicle control from the next tick on
+        """
+        self._control = VehicleControl(control.throttle, control.steer, control.brake, control.hand_brake,
+                                       control.reverse, control.manual_gear_shift)
+
+    def get_control(self):
+        """
+        Returns a copy of the applied vehicle control
+        """
+        control = self._control
+        return VehicleControl(control.throttle, control.steer, control.brake, control.hand_brake,
+                              control.reverse, control.manual_gear_shift)
+
+    def set_autopilot(self, enabled=True):
+        """
+        Enable or disable the autopilot, which follows the lane at AUTOPILOT_VELOCITY
+        """
+        self._autopilot = enabled
+
+    def set_transform(self, transform):
+        """
+        Teleport the vehicle and stop it
+        """
+        super(Vehicle, self).set_transform(transform)
+        self._speed = 0.0
+        self._velocity = Vector3D()
+
+    def set_velocity(self, velocity):
+        """
+        Set the velocity in m/s
+        """
+        super(Vehicle, self).set_velocity(velocity)
+        self._speed = math.sqrt(velocity.x**2 + velocity.y**2)
+
+    def get_speed_limit(self):
+        """
+        Returns the speed limit in km/h
+        """
+        return 30.0
+
+    def tick(self, delta_seconds):
+        """
+        Advance the bicycle model by delta_seconds
+        """
+        if not self._simulate_physics or self.parent is not None:
+            return
+
+        control = self._control
+        if self._autopilot:
+            waypoint = self._world.get_map().get_waypoint(self._transform.location)
+            self._transform.rotation.yaw = waypoint.transform.rotation.yaw
+            control = VehicleControl(throttle=1.0 if self._speed < self.AUTOPILOT_VELOCITY else 0.0)
+
+        acceleration = control.throttle * self.MAX_ACCELERATION - self.DRAG * self._speed
+        if control.brake > 0.0 or control.hand_brake:
+            acceleration -= (1.0 if control.hand_brake else control.brake) * self.MAX_DECELERATION
+        direction = -1.0 if control.reverse else 1.0
+
+        self._speed = max(0.0, self._speed + acceleration * delta_seconds)
+        steer = max(-1.0, min(1.0, control.steer))
+        yaw_rate = self._speed / self.WHEELBASE * math.tan(math.radians(steer * self.MAX_STEER_ANGLE))
+        self._transform.rotation.yaw += math.degrees(yaw_rate * delta_seconds) * direction
+
+        yaw = math.radians(self._transform.rotation.yaw)
+        self._velocity = Vector3D(direction * self._speed * math.cos(yaw), direction * self._speed * math.sin(yaw))
+        self._transform.location = self._transform.location + Location(self._velocity.x * delta_seconds,
+                                                                        self._velocity.y * delta_seconds)
+
+
+class Walker(Actor):
+
+    """
+    Walker moving with the direction and speed of its control
+    """
+
+    def __init__(self, world, actor_id, blueprint, transform, parent=None):
+        super(Walker, self).__init__(world, actor_id, blueprint, transform, parent)
+        self.bounding_box = BoundingBox(extent=Vector3D(0.3, 0.3, 0.9))
+        self._control = WalkerControl()
+
+    def apply_control(self, control):
+        """
+        Apply the walker control from the next tick on
+        """
+        self._control = control
+
+    def get_control(self):
+        """
+        Returns the applied walker control
+        """
+        return self._control
+
+    def tick(self, delta_seconds):
+        """
+        Move the walker by delta_seconds
+        """
+        if not self._simulate_physics or self.parent is not None:
+            return
+        self._velocity = self._control.direction * self._control.speed
+        self._transform.location = self._transform.location + Location(self._velocity * delta_seconds)
+
+
+class TrafficLight(Actor):
+
+    """
+    Traffic light cycling Green -> Yellow -> Red, unless frozen
+    """
+
+    def __init__(self, world, actor_id, blueprint, transform, trigger_extent=None, state=TrafficLightState.Red):
+        super(TrafficLight, self).__init__(world, actor_id, blueprint, transform)
+        self.trigger_volume = BoundingBox(Location(), trigger_extent if trigger_extent is not None
+                                          else Vector3D(2.0, 2.0, 1.0))
+        self.state = state
+        self._frozen = False
+        self._elapsed_time = 0.0
+        self._durations = {TrafficLightState.Green: 10.0, TrafficLightState.Yellow: 3.0, TrafficLightState.Red: 10.0}
+
+    def get_state(self):
+        """
+        Returns the TrafficLightState
+        """
+        return self.state
+
+    def set_state(self, state):
+        """
+        Switch to the state and restart its timer
+        """
+        self.state = state
+        self._elapsed_time = 0.0
+
+    def freeze(self, freeze):
+        """
+        Stop or resume the state cycle
+        """
+        self._frozen = freeze
+
+    def is_frozen(self):
+        """
+        Returns True, if the state cycle is stopped
+        """
+        return self._frozen
+
+    def set_green_time(self, seconds):
+        """
+        Set the duration of the green phase
+        """
+        self._durations[TrafficLightState.Green] = seconds
+
+    def set_yellow_time(self, seconds):
+        """
+        Set the duration of the yellow phase
+        """
+        self._durations[TrafficLightState.Yellow] = seconds
+
+    def set_red_time(self, seconds):
+        """
+        Set the duration of the red phase
+        """
+        self._durations[TrafficLightState.Red] = seconds
+
+    def get_elapsed_time(self):
+        """
+        Returns the seconds spent in the current state
+        """
+        return self._elapsed_time
+
+    def tick(self, delta_seconds):
+        """
+        Advance the state cycle by delta_seconds
+        """
+        if self._frozen or self.state not in self._durations:
+            return
+        self._elapsed_time += delta_seconds
+        if self._elapsed_time >= self._durations[self.state]:
+            next_state = {TrafficLightState.Green: TrafficLightState.Yellow,
+                          TrafficLightState.Yellow: TrafficLightState.Red,
+                          TrafficLightState.Red: TrafficLightState.Green}
+            self.set_state(next_state[self.state])
+
+
+class Sensor(Actor):
+
+    """
+    Sensor actor. The measurements are produced by the world on every tick.
+    """
+
+    def __init__(self, world, actor_id, blueprint, transform, parent=None):
+        super(Sensor, self).__init__(world, actor_id, blueprint, transform, parent)
+        self._callback = None
+        self._last_lane = None
+        self._contacts = set()
+        self._raw_data = None
+
+    @property
+    def is_listening(self):
+        """
+        True, if a callback is registered
+        """
+        return self._callback is not None
+
+    def listen(self, callback):
+        """
+        Register the callback for the measurements
+        """
+        self._callback = callback
+
+    def stop(self):
+        """
+        Unregister the callback
+        """
+        self._callback = None
+
+    def destroy(self):
+        """
+        Unregister the callback and remove the sensor from the world
+        """
+        self._callback = None
+        return super(Sensor, self).destroy()
+
+    def _create_image(self, frame, timestamp, transform):
+        width = int(self.attributes.get('image_size_x', 800))
+        height = int(self.attributes.get('image_size_y', 600))
+        if self._raw_data is None:
+            self._raw_data = bytes(bytearray(width * height * 4))
+        return Image(frame, timestamp, transform, width, height, float(self.attributes.get('fov', 90)),
+                     self._raw_data)
+
+    def _create_lidar_measurement(self, frame, timestamp, transform):
+        channels = int(self.attributes.get('channels', 32))
+        if self._raw_data is None:
+            points_per_frame = int(int(self.attributes.get('points_per_second', 56000)) /
+                                   float(self.attributes.get('rotation_frequency', 10)))
+            points = []
+            for index in range(points_per_frame):
+                angle = 2.0 * math.pi * index / points_per_frame
+                distance = 5.0 + 45.0 * ((index * 7919) % 1000) / 1000.0
+                points.extend([distance * math.cos(angle), distance * math.sin(angle),
+                               -1.5 + (index % channels) * 0.1])
+            self._raw_data = struct.pack('{}f'.format(len(points)), *points)
+        return LidarMeasurement(frame, timestamp, transform, channels, self._raw_data)
+
+    def produce(self, frame, timestamp):
+        """
+        Create the measurement of this tick (if any) and invoke the callback
+        """
+        if self._callback is None:
+            return
+
+        transform = self.get_transform()
+        if self.type_id.startswith('sensor.camera'):
+            self._callback(self._create_image(frame, timestamp, transform))
+        elif self.type_id.startswith('sensor.lidar'):
+            self._callback(self._create_lidar_measurement(frame, timestamp, transform))
+        elif self.type_id == 'sensor.other.gnss':
+            geolocation = self._world.get_map().transform_to_geolocation(transform.location)
+            self._callback(GnssEvent(frame, timestamp, transform, geolocation.latitude,
+                                     geolocation.longitude, geolocation.altitude))
+        elif self.type_id in ('sensor.other.lane_detector', 'sensor.other.lane_invasion'):
+            waypoint = self._world.get_map().get_waypoint(transform.location)
+            lane = (waypoint.road_id, waypoint.lane_id)
+            if self._last_lane is not None and lane[1] != self._last_lane[1]:
+                self._callback(LaneInvasionEvent(frame, timestamp, transform, self.parent, []))
+            self._last_lane = lane
+        elif self.type_id == 'sensor.other.collision':
+            contacts = set()
+            for other in self._world.get_actors():
+                if other is self.parent or isinstance(other, (Sensor, TrafficLight)):
+                    continue
+                if overlap(self.parent, other):
+                    contacts.add(other.id)
+                    if other.id not in self._contacts:
+                        self._callback(CollisionEvent(frame, timestamp, transform, self.parent, other, Vector3D()))
+            self._contacts = contacts
+
+
+def _corners(actor):
+    """
+    Corners of the bounding box of the actor in the xy plane
+    """
+    transform = actor.get_transform()
+    extent = actor.bounding_box.extent
+    return [transform.transform(Location(sign_x * extent.x, sign_y * extent.y))
+            for sign_x, sign_y in ((1, 1), (1, -1), (-1, -1), (-1, 1))]
+
+
+def overlap(actor, other):
+    """
+    Collision check of the bounding boxes in the xy plane (separating axis test)
+    """
+    location = actor.get_location()
+    other_location = other.get_location()
+    reach = actor.bounding_box.extent.x + actor.bounding_box.extent.y + \
+        other.bounding_box.extent.x + other.bounding_box.extent.y
+    if abs(location.x - other_location.x) > reach or abs(location.y - other_location.y) > reach:
+        return False
+
+    corners = _corners(actor)
+    other_corners = _corners(other)
+    for box in (corners, other_corners):
+        for first, second in ((box[0], box[1]), (box[1], box[2])):
+            axis_x, axis_y = second.y - first.y, first.x - second.x
+            projection = [corner.x * axis_x + corner.y * axis_y for corner in corners]
+            other_projection = [corner.x * axis_x + corner.y * axis_y for corner in other_corners]
+            if max(projection) < min(other_projection) or max(other_projection) < min(projection):
+                return False
+    return True
+
+
+class ActorList(list):
+
+    """
+    List of actors as returned by World.get_actors()
+    """
+
+    def filter(self, pattern):
+        """
+        Returns the actors whose type id matches the wildcard pattern
+        """
+        return ActorList([actor for actor in self if fnmatch.fnmatch(actor.type_id, pattern)])
+
+    def find(self, actor_id):
+        """
+        Returns the actor with the id, or None
+        """
+        for actor in self:
+            if actor.id == actor_id:
+                return actor
+        return None
@@ -0,0 +1,118 @@
+#!/usr/bin/env python
+
+#
+# This work is licensed under the terms of the MIT license.
+# For a copy, see <https://opensource.org/licenses/MIT>.
+
+"""
+Blueprints of the fake CARLA backend
+"""
+
+import fnmatch
+
+
+class ActorBlueprint(object):
+
+    """
+    Blueprint with id, tags and attributes
+    """
+
+    def __init__(self, blueprint_id, tags=None, attributes=None):
+        self.id = blueprint_id
+        self.tags = tags if tags is not None else blueprint_id.split('.')
+        self._attributes = dict(attributes) if attributes is not None else {}
+
+    def has_tag(self, tag):
+        """
+        Returns True, if the blueprint has the tag
+        """
+        return tag in self.tags
+
+    def match_tags(self, pattern):
+        """
+        Returns True, if any tag matches the wildcard pattern
+        """
+        return any(fnmatch.fnmatch(tag, pattern) for tag in self.tags)
+
+    def has_attribute(self, key):
+        """
+        Returns True, if the blueprint has the attribute
+        """
+        return key in self._attributes
+
+    def get_attribute(self, key):
+        """
+        Returns the value of the attribute
+        """
+        return self._attributes[key]
+
+    def set_attribute(self, key, value):
+        """
+        Set the attribute to str(value)
+        """
+        self._attributes[key] = str(value)
+
+    def copy(self):
+        """
+        Returns an independent copy of the blueprint
+        """
+        return ActorBlueprint(self.id, list(self.tags), self._attributes)
+
+    def __repr__(self):
+        return "ActorBlueprint(id={}, tags={})".format(self.id, self.tags)
+
+
+class BlueprintLibrary(object):
+
+    """
+    List of blueprints, handing out copies
+    """
+
+    def __init__(self, blueprints):
+        self._blueprints = list(blueprints)
+
+    def find(self, blueprint_id):
+        """
+        Returns the blueprint with the id, raises IndexError if there is none
+        """
+        for blueprint in self._blueprints:
+            if blueprint.id == blueprint_id:
+                return blueprint.copy()
+        raise IndexError("blueprint '{}' not found".format(blueprint_id))
+
+    def filter(self, pattern):
+        """
+        Returns the library of all blueprints whose id or tags match the wildcard pattern
+        """
+        return BlueprintLibrary([blueprint for blueprint in self._blueprints
+                                 if fnmatch.fnmatch(blueprint.id, pattern) or blueprint.match_tags(pattern)])
+
+    def __getitem__(self, index):
+        return self._blueprints[index].copy()
+
+    def __len__(self):
+        return len(self._blueprints)
+
+    def __iter__(self):
+        return iter([blueprint.copy() for blueprint in self._blueprints])
+
+
+DEFAULT_BLUEPRINTS = [
+    ActorBlueprint('vehicle.lincoln.mkz2017', attributes={'role_name': 'autopilot', 'number_of_wheels': '4'}),
+    ActorBlueprint('vehicle.tesla.model3', attributes={'role_name': 'autopilot', 'number_of_wheels': '4'}),
+    ActorBlueprint('vehicle.audi.tt', attributes={'role_name': 'autopilot', 'number_of_wheels': '4'}),
+    ActorBlueprint('vehicle.nissan.micra', attributes={'role_name': 'autopilot', 'number_of_wheels': '4'}),
+    ActorBlueprint('vehicle.volkswagen.t2', attributes={'role_name': 'autopilot', 'number_of_wheels': '4'}),
+    ActorBlueprint('vehicle.diamondback.century', attributes={'role_name': 'autopilot', 'number_of_wheels': '2'}),
+    ActorBlueprint('vehicle.gazelle.omafiets', attributes={'role_name': 'autopilot', 'number_of_wheels': '2'}),
+    ActorBlueprint('walker.pedestrian.0001', attributes={'role_name': 'walker'}),
+    ActorBlueprint('static.prop.streetbarrier'),
+    ActorBlueprint('static.prop.container'),
+    ActorBlueprint('sensor.other.collision'),
+    ActorBlueprint('sensor.other.lane_detector'),
+    ActorBlueprint('sensor.other.lane_invasion'),
+    ActorBlueprint('sensor.other.gnss'),
+    ActorBlueprint('sensor.camera.rgb', attributes={'image_size_x': '800', 'image_size_y': '600', 'fov': '90'}),
+    ActorBlueprint('sensor.lidar.ray_cast', attributes={'channels': '32', 'range': '5000',
+                                                        'points_per_second': '56000', 'rotation_frequency': '10'}),
+]
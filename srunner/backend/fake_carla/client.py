@@ -0,0 +1,90 @@
+#!/usr/bin/env python
+
+#
+# This work is licensed under the terms of the MIT license.
+# For a copy, see <https://opensource.org/licenses/MIT>.
+
+"""
+Client of the fake CARLA backend
+"""
+
+from srunner.backend.fake_carla.command import apply_command
+from srunner.backend.fake_carla.road_map import FakeMap
+from srunner.backend.fake_carla.world import FakeWorld
+
+_WORLDS = {}
+
+
+class Client(object):
+
+    """
+    Client returning one FakeWorld per host and port
+    """
+
+    def __init__(self, host='127.0.0.1', port=2000, worker_threads=0):
+        self._address = ('127.0.0.1' if host == 'localhost' else host, int(port))
+
+    def set_timeout(self, seconds):
+        """
+        Set the network timeout, which is ignored
+        """
+
+    def get_client_version(self):
+        """
+        Returns the client version
+        """
+        return "fake"
+
+    def get_server_version(self):
+        """
+        Returns the server version
+        """
+        return "fake"
+
+    def get_world(self):
+        """
+        Returns the world of the address, created on first use
+        """
+        if self._address not in _WORLDS:
+            _WORLDS[self._address] = FakeWorld()
+        return _WORLDS[self._address]
+
+    def load_world(self, map_name):
+        """
+        Replace the world of the address by a new world with the map name
+        """
+        # as for the simulator, the frame count continues across map changes
+        frame = 0
+        if self._address in _WORLDS:
+            _WORLDS[self._address].stop_ticking()
+            frame = _WORLDS[self._address].get_frame()
+        _WORLDS[self._address] = FakeWorld(FakeMap(name=map_name), frame=frame)
+        return _WORLDS[self._address]
+
+    def reload_world(self):
+        """
+        Replace the world of the address by a new world with the same map
+        """
+        return self.load_world(self.get_world().get_map().name)
+
+    def apply_batch(self, commands):
+        """
+        Apply the commands in order
+        """
+        self.apply_batch_sync(commands)
+
+    def apply_batch_sync(self, commands, do_tick=False):
+        """
+        Apply the commands in order and return their responses, optionally tick the world afterwards
+        """
+        world = self.get_world()
+        responses = [apply_command(world, batch_command) for batch_command in commands]
+        if do_tick:
+            world.tick()
+        return responses
+
+    def get_available_maps(self):
+        """
+        Returns the map names
+        """
+        return ["/Game/Carla/Maps/Town0{}".format(index) for index in range(1, 6)]
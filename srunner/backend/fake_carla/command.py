@@ -0,0 +1,167 @@
+#!/usr/bin/env python
+
+#
+# This work is licensed under the terms of the MIT license.
+# For a copy, see <https://opensource.org/licenses/MIT>.
+
+"""
+Command batches of the fake CARLA backend, installed as carla.command
+"""
+
+from srunner.backend.fake_carla.actors import Actor
+from srunner.backend.fake_carla.geometry import Transform
+
+# placeholder for the id of the actor spawned by the enclosing SpawnActor (name as in the CARLA API)
+FutureActor = 0     # pylint: disable=invalid-name
+
+
+class _Command(object):
+
+    """
+    Command applied to an actor (given as actor or actor id)
+    """
+
+    def __init__(self, actor, *arguments):
+        self.actor_id = actor.id if isinstance(actor, Actor) else actor
+        self.arguments = arguments
+
+    def apply(self, world, actor_id):
+        """
+        Apply the command to the actor with the id, raises RuntimeError if it does not exist
+        """
+        actor = world.get_actor(actor_id)
+        if actor is None:
+            raise RuntimeError("Actor {} not found".format(actor_id))
+        self._apply(actor)
+
+    def _apply(self, actor):
+        raise NotImplementedError
+
+
+class SpawnActor(object):
+
+    """
+    Spawn command, followed by the commands given with then() for the new actor
+    """
+
+    def __init__(self, blueprint, transform, parent=None):
+        # as for CARLA, the blueprint is copied into the command
+        self.blueprint = blueprint.copy()
+        self.transform = Transform(transform.location, transform.rotation)
+        self.parent = parent
+        self.do_after = []
+
+    def then(self, other_command):
+        """
+        Add a command to apply after the spawn, use FutureActor as its actor
+        """
+        self.do_after.append(other_command)
+        return self
+
+
+class DestroyActor(_Command):
+
+    """
+    Destroy the actor
+    """
+
+    def _apply(self, actor):
+        actor.destroy()
+
+
+class ApplyTransform(_Command):
+
+    """
+    Teleport the actor
+    """
+
+    def _apply(self, actor):
+        actor.set_transform(*self.arguments)
+
+
+class ApplyVelocity(_Command):
+
+    """
+    Set the velocity of the actor
+    """
+
+    def _apply(self, actor):
+        actor.set_velocity(*self.arguments)
+
+
+class ApplyVehicleControl(_Command):
+
+    """
+    Apply a vehicle control
+    """
+
+    def _apply(self, actor):
+        actor.apply_control(*self.arguments)
+
+
+class ApplyWalkerControl(_Command):
+
+    """
+    Apply a walker control
+    """
+
+    def _apply(self, actor):
+        actor.apply_control(*self.arguments)
+
+
+class SetAutopilot(_Command):
+
+    """
+    Enable or disable the autopilot of the vehicle
+    """
+
+    def _apply(self, actor):
+        actor.set_autopilot(*self.arguments)
+
+
+class SetSimulatePhysics(_Command):
+
+    """
+    Enable or disable the motion model of the actor
+    """
+
+    def _apply(self, actor):
+        actor.set_simulate_physics(*self.arguments)
+
+
+class Response(object):
+
+    """
+    Result of a command: the actor id, or an error message
+    """
+
+    def __init__(self, actor_id=0, error=""):
+        self.actor_id = actor_id
+        self.error = error
+
+    def has_error(self):
+        """
+        Returns True, if the command failed
+        """
+        return bool(self.error)
+
+
+def apply_command(world, batch_command):
+    """
+    Apply one command of a batch and return its Response
+    """
+    try:
+        if isinstance(batch_command, SpawnActor):
+            parent = None
+            if batch_command.parent is not None:
+                parent = world.get_actor(batch_command.parent)
+            actor = world.spawn_actor(batch_command.blueprint, batch_command.transform, parent)
+            for other_command in batch_command.do_after:
+                actor_id = actor.id if other_command.actor_id == FutureActor else other_command.actor_id
+                other_command.apply(world, actor_id)
+            return Response(actor.id)
+
+        batch_command.apply(world, batch_command.actor_id)
+        return Response(batch_command.actor_id)
+    except RuntimeError as error:
+        return Response(error=str(error))
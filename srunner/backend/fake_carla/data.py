@@ -0,0 +1,152 @@
+#!/usr/bin/env python
+
+#
+# This work is licensed under the terms of the MIT license.
+# For a copy, see <https://opensource.org/licenses/MIT>.
+
+"""
+Controls, states and sensor data of the fake CARLA backend
+"""
+
+from enum import IntEnum
+
+from srunner.backend.fake_carla.geometry import Vector3D
+
+
+class VehicleControl(object):
+
+    """
+    Control of a vehicle
+    """
+
+    def __init__(self, throttle=0.0, steer=0.0, brake=0.0, hand_brake=False, reverse=False,
+                 manual_gear_shift=False, gear=0):
+        self.throttle = throttle
+        self.steer = steer
+        self.brake = brake
+        self.hand_brake = hand_brake
+        self.reverse = reverse
+        self.manual_gear_shift = manual_gear_shift
+        self.gear = gear
+
+    def __repr__(self):
+        return "VehicleControl(throttle={}, steer={}, brake={}, hand_brake={}, reverse={})".format(
+            self.throttle, self.steer, self.brake, self.hand_brake, self.reverse)
+
+
+class WalkerControl(object):
+
+    """
+    Control of a walker
+    """
+
+    def __init__(self, direction=None, speed=0.0, jump=False):
+        self.direction = Vector3D(direction) if direction is not None else Vector3D(1.0, 0.0, 0.0)
+        self.speed = speed
+        self.jump = jump
+
+
+class TrafficLightState(IntEnum):
+
+    """
+    Traffic light states, str() returns the plain name as the CARLA enum does
+    """
+
+    # the member names follow the CARLA API
+    Red = 0         # pylint: disable=invalid-name
+    Yellow = 1      # pylint: disable=invalid-name
+    Green = 2       # pylint: disable=invalid-name
+    Off = 3         # pylint: disable=invalid-name
+    Unknown = 4     # pylint: disable=invalid-name
+
+    def __str__(self):
+        return self.name
+
+
+class Timestamp(object):
+
+    """
+    Timestamp of a world tick
+    """
+
+    def __init__(self, frame_count=0, elapsed_seconds=0.0, delta_seconds=0.0, platform_timestamp=0.0):
+        self.frame_count = frame_count
+        self.elapsed_seconds = elapsed_seconds
+        self.delta_seconds = delta_seconds
+        self.platform_timestamp = platform_timestamp
+
+
+class SensorData(object):
+
+    """
+    Base class of all sensor measurements
+    """
+
+    def __init__(self, frame_number, timestamp, transform):
+        self.frame_number = frame_number
+        self.timestamp = timestamp
+        self.transform = transform
+
+
+class Image(SensorData):
+
+    """
+    Camera image with BGRA raw data
+    """
+
+    def __init__(self, frame_number, timestamp, transform, width, height, fov, raw_data):
+        super(Image, self).__init__(frame_number, timestamp, transform)
+        self.width = width
+        self.height = height
+        self.fov = fov
+        self.raw_data = raw_data
+
+
+class LidarMeasurement(SensorData):
+
+    """
+    Lidar point cloud with float32 xyz raw data
+    """
+
+    def __init__(self, frame_number, timestamp, transform, channels, raw_data):
+        super(LidarMeasurement, self).__init__(frame_number, timestamp, transform)
+        self.channels = channels
+        self.raw_data = raw_data
+
+
+class GnssEvent(SensorData):
+
+    """
+    GNSS measurement
+    """
+
+    def __init__(self, frame_number, timestamp, transform, latitude, longitude, altitude):
+        super(GnssEvent, self).__init__(frame_number, timestamp, transform)
+        self.latitude = latitude
+        self.longitude = longitude
+        self.altitude = altitude
+
+
+class CollisionEvent(SensorData):
+
+    """
+    Collision of the parent actor with another actor
+    """
+
+    def __init__(self, frame_number, timestamp, transform, actor, other_actor, normal_impulse):
+        super(CollisionEvent, self).__init__(frame_number, timestamp, transform)
+        self.actor = actor
+        self.other_actor = other_actor
+        self.normal_impulse = normal_impulse
+
+
+class LaneInvasionEvent(SensorData):
+
+    """
+    Lane change of the parent actor
+    """
+
+    def __init__(self, frame_number, timestamp, transform, actor, crossed_lane_markings):
+        super(LaneInvasionEvent, self).__init__(frame_number, timestamp, transform)
+        self.actor = actor
+        self.crossed_lane_markings = crossed_lane_markings
@@ -0,0 +1,153 @@
+#!/usr/bin/env python
+
+#
+# This work is licensed under the terms of the MIT license.
+# For a copy, see <https://opensource.org/licenses/MIT>.
+
+"""
+Geometry types of the fake CARLA backend
+"""
+
+import math
+
+
+class Vector3D(object):
+
+    """
+    3D vector, base class of Location
+    """
+
+    def __init__(self, x=0.0, y=0.0, z=0.0):
+        if isinstance(x, Vector3D):
+            x, y, z = x.x, x.y, x.z
+        self.x = float(x)
+        self.y = float(y)
+        self.z = float(z)
+
+    def __add__(self, other):
+        return self.__class__(self.x + other.x, self.y + other.y, self.z + other.z)
+
+    def __sub__(self, other):
+        return self.__class__(self.x - other.x, self.y - other.y, self.z - other.z)
+
+    def __mul__(self, scalar):
+        return self.__class__(self.x * scalar, self.y * scalar, self.z * scalar)
+
+    def __truediv__(self, scalar):
+        return self.__class__(self.x / scalar, self.y / scalar, self.z / scalar)
+
+    __div__ = __truediv__
+
+    def __eq__(self, other):
+        return isinstance(other, Vector3D) and (self.x, self.y, self.z) == (other.x, other.y, other.z)
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __hash__(self):
+        return hash((self.x, self.y, self.z))
+
+    def __repr__(self):
+        return "{}(x={:.6f}, y={:.6f}, z={:.6f})".format(self.__class__.__name__, self.x, self.y, self.z)
+
+
+class Location(Vector3D):
+
+    """
+    Location in meters
+    """
+
+    def distance(self, other):
+        """
+        Euclidean distance to the other location
+        """
+        return math.sqrt((self.x - other.x)**2 + (self.y - other.y)**2 + (self.z - other.z)**2)
+
+
+class Rotation(object):
+
+    """
+    Rotation in degrees
+    """
+
+    def __init__(self, pitch=0.0, yaw=0.0, roll=0.0):
+        self.pitch = float(pitch)
+        self.yaw = float(yaw)
+        self.roll = float(roll)
+
+    def get_forward_vector(self):
+        """
+        Unit vector pointing in the direction of the rotation
+        """
+        pitch = math.radians(self.pitch)
+        yaw = math.radians(self.yaw)
+        return Vector3D(math.cos(pitch) * math.cos(yaw), math.cos(pitch) * math.sin(yaw), math.sin(pitch))
+
+    def __repr__(self):
+        return "Rotation(pitch={:.6f}, yaw={:.6f}, roll={:.6f})".format(self.pitch, self.yaw, self.roll)
+
+
+class Transform(object):
+
+    """
+    Transform with location and rotation. Only the yaw is considered when
+    transforming locations.
+    """
+
+    def __init__(self, location=None, rotation=None):
+        self.location = Location(location) if location is not None else Location()
+        self.rotation = Rotation(rotation.pitch, rotation.yaw, rotation.roll) if rotation is not None else Rotation()
+
+    def transform(self, location):
+        """
+        Transform the location from the local into the world frame
+        """
+        yaw = math.radians(self.rotation.yaw)
+        return Location(self.location.x + location.x * math.cos(yaw) - location.y * math.sin(yaw),
+                        self.location.y + location.x * math.sin(yaw) + location.y * math.cos(yaw),
+                        self.location.z + location.z)
+
+    def get_forward_vector(self):
+        """
+        Unit vector pointing in the direction of the rotation
+        """
+        return self.rotation.get_forward_vector()
+
+    def __repr__(self):
+        return "Transform({}, {})".format(self.location, self.rotation)
+
+
+class BoundingBox(object):
+
+    """
+    Bounding box given by its center and half extent
+    """
+
+    def __init__(self, location=None, extent=None):
+        self.location = Location(location) if location is not None else Location()
+        self.extent = Vector3D(extent) if extent is not None else Vector3D()
+
+
+class Color(object):
+
+    """
+    RGBA color of the debug helper
+    """
+
+    def __init__(self, r=0, g=0, b=0, a=255):
+        self.r = r
+        self.g = g
+        self.b = b
+        self.a = a
+
+
+class GeoLocation(object):
+
+    """
+    Geographic location in degrees and meters
+    """
+
+    def __init__(self, latitude=0.0, longitude=0.0, altitude=0.0):
+        self.latitude = latitude
+        self.longitude = longitude
+        self.altitude = altitude
@@ -0,0 +1,128 @@
+#!/usr/bin/env python
+
+#
+# This work is licensed under the terms of the MIT license.
+# For a copy, see <https://opensource.org/licenses/MIT>.
+
+"""
+Procedural road network of the fake CARLA backend
+"""
+
+import math
+
+from srunner.backend.fake_carla.geometry import GeoLocation, Location, Rotation, Transform
+
+
+class Waypoint(object):
+
+    """
+    Waypoint on the procedural road network of FakeMap
+    """
+
+    def __init__(self, carla_map, x, lane_index, forward):
+        self._map = carla_map
+        self._lane_index = lane_index
+        self._forward = forward
+
+        lane_offset = (lane_index + 0.5) * carla_map.lane_width
+        y = lane_offset if forward else -lane_offset
+        self.transform = Transform(Location(x, y, 0.0), Rotation(yaw=0.0 if forward else 180.0))
+        self.lane_id = -(lane_index + 1) if forward else lane_index + 1
+        self.road_id = int(math.floor(x / carla_map.junction_spacing))
+        self.section_id = 0
+        self.s = x - self.road_id * carla_map.junction_spacing
+        self.lane_width = carla_map.lane_width
+        self.is_intersection = self.s < carla_map.junction_length
+        self.is_junction = self.is_intersection
+
+    def next(self, distance):
+        """
+        Returns the list with the waypoint distance meters ahead in driving direction
+        """
+        step = distance if self._forward else -distance
+        return [Waypoint(self._map, self.transform.location.x + step, self._lane_index, self._forward)]
+
+    def get_left_lane(self):
+        """
+        Returns the waypoint on the left lane, which is the opposite direction for the innermost lane
+        """
+        if self._lane_index == 0:
+            return Waypoint(self._map, self.transform.location.x, 0, not self._forward)
+        return Waypoint(self._map, self.transform.location.x, self._lane_index - 1, self._forward)
+
+    def get_right_lane(self):
+        """
+        Returns the waypoint on the right lane, or None for the outermost lane
+        """
+        if self._lane_index + 1 >= self._map.lanes_per_direction:
+            return None
+        return Waypoint(self._map, self.transform.location.x, self._lane_index + 1, self._forward)
+
+
+class FakeMap(object):
+
+    """
+    Road along the x axis with lanes_per_direction lanes per driving
+    direction. Lanes with y > 0 are driven in +x direction. Every
+    junction_spacing meters the first junction_length meters are a junction.
+    """
+
+    def __init__(self, name="Town01", lanes_per_direction=2, lane_width=3.5,
+                 junction_spacing=100.0, junction_length=12.0, length=1000.0):
+        self.name = name
+        self.lanes_per_direction = lanes_per_direction
+        self.lane_width = lane_width
+        self.junction_spacing = junction_spacing
+        self.junction_length = junction_length
+        self.length = length
+
+    def get_waypoint(self, location, project_to_road=True):
+        """
+        Returns the waypoint of the lane containing the location
+        """
+        forward = location.y >= 0.0
+        lane_index = int(abs(location.y) // self.lane_width)
+        if lane_index >= self.lanes_per_direction:
+            if not project_to_road:
+                return None
+            lane_index = self.lanes_per_direction - 1
+        return Waypoint(self, location.x, lane_index, forward)
+
+    def get_spawn_points(self):
+        """
+        Returns spawn points every 20 meters on all lanes
+        """
+        spawn_points = []
+        for x in range(0, int(self.length), 20):
+            for lane_index in range(self.lanes_per_direction):
+                for forward in (True, False):
+                    transform = Waypoint(self, float(x), lane_index, forward).transform
+                    transform.location.z = 0.5
+                    spawn_points.append(transform)
+        return spawn_points
+
+    def generate_waypoints(self, distance):
+        """
+        Returns waypoints every distance meters on all lanes
+        """
+        waypoints = []
+        x = 0.0
+        while x < self.length:
+            for lane_index in range(self.lanes_per_direction):
+                waypoints.append(Waypoint(self, x, lane_index, True))
+                waypoints.append(Waypoint(self, x, lane_index, False))
+            x += distance
+        return waypoints
+
+    def transform_to_geolocation(self, location):
+        """
+        Returns the geolocation of the location
+        """
+        return GeoLocation(42.0 + location.y / 111000.0, 2.0 + location.x / 111000.0, location.z)
+
+    def to_opendrive(self):
+        """
+        Returns a minimal OpenDRIVE document with the geo reference of the map
+        """
+        return ("<?xml version=\"1.0\"?><OpenDRIVE><header name=\"{}\">"
+                "<geoReference>+lat_0=42.0 +lon_0=2.0</geoReference></header></OpenDRIVE>".format(self.name))
@@ -0,0 +1,276 @@
+#!/usr/bin/env python
+
+#
+# This work is licensed under the terms of the MIT license.
+# For a copy, see <https://opensource.org/licenses/MIT>.
+
+"""
+World of the fake CARLA backend
+"""
+
+import itertools
+import threading
+import time
+
+from srunner.backend.fake_carla.actors import Actor, ActorList, Sensor, TrafficLight, Vehicle, Walker, overlap
+from srunner.backend.fake_carla.blueprints import DEFAULT_BLUEPRINTS, ActorBlueprint, BlueprintLibrary
+from srunner.backend.fake_carla.data import Timestamp, TrafficLightState
+from srunner.backend.fake_carla.road_map import FakeMap
+
+
+class DebugHelper(object):
+
+    """
+    Debug drawing, which is ignored as there is no rendering
+    """
+
+    def draw_point(self, location, size=0.1, color=None, life_time=-1.0, persistent_lines=True):
+        """
+        Draw a point
+        """
+
+    def draw_line(self, begin, end, thickness=0.1, color=None, life_time=-1.0, persistent_lines=True):
+        """
+        Draw a line
+        """
+
+    def draw_arrow(self, begin, end, thickness=0.1, arrow_size=0.1, color=None, life_time=-1.0,
+                   persistent_lines=True):
+        """
+        Draw an arrow
+        """
+
+    def draw_box(self, box, rotation, thickness=0.1, color=None, life_time=-1.0, persistent_lines=True):
+        """
+        Draw a box
+        """
+
+    def draw_string(self, location, text, draw_shadow=False, color=None, life_time=-1.0, persistent_lines=True):
+        """
+        Draw a text
+        """
+
+
+class WorldSettings(object):
+
+    """
+    Settings of the world
+    """
+
+    def __init__(self, synchronous_mode=False, no_rendering_mode=False, fixed_delta_seconds=0.05):
+        self.synchronous_mode = synchronous_mode
+        self.no_rendering_mode = no_rendering_mode
+        self.fixed_delta_seconds = fixed_delta_seconds
+
+
+class FakeWorld(object):
+
+    """
+    In-process world. Besides the CARLA API subset, it offers tick(),
+    start_ticking() / stop_ticking() and add_traffic_light() to control
+    the simulation.
+    """
+
+    def __init__(self, carla_map=None, delta_seconds=0.05, frame=0):
+        self._map = carla_map if carla_map is not None else FakeMap()
+        self._settings = WorldSettings(fixed_delta_seconds=delta_seconds)
+        self._blueprint_library = BlueprintLibrary(DEFAULT_BLUEPRINTS)
+        self._actors = []
+        self._actor_ids = itertools.count(1)
+        self._callbacks = {}
+        self._callback_ids = itertools.count(1)
+        self._frame = frame
+        self._elapsed_seconds = 0.0
+        self._lock = threading.RLock()
+        self._tick_condition = threading.Condition()
+        self._ticking_thread = None
+        self._ticking = False
+        self.debug = DebugHelper()
+        self.id = id(self)
+
+    # -- CARLA API ---------------------------------------------------------------
+
+    def get_map(self):
+        """
+        Returns the FakeMap
+        """
+        return self._map
+
+    def get_blueprint_library(self):
+        """
+        Returns the BlueprintLibrary
+        """
+        return self._blueprint_library
+
+    def get_settings(self):
+        """
+        Returns a copy of the WorldSettings
+        """
+        return WorldSettings(self._settings.synchronous_mode, self._settings.no_rendering_mode,
+                             self._settings.fixed_delta_seconds)
+
+    def apply_settings(self, settings):
+        """
+        Apply the WorldSettings and return the current frame
+        """
+        self._settings = settings
+        return self._frame
+
+    def get_actors(self, actor_ids=None):
+        """
+        Returns the ActorList of all actors, or of the actors with the given ids
+        """
+        with self._lock:
+            actors = list(self._actors)
+        if actor_ids is not None:
+            actors = [actor for actor in actors if actor.id in actor_ids]
+        return ActorList(actors)
+
+    def get_actor(self, actor_id):
+        """
+        Returns the actor with the id, or None
+        """
+        return self.get_actors().find(actor_id)
+
+    def try_spawn_actor(self, blueprint, transform, attach_to=None):
+        """
+        Spawn an actor, returns None if the spawn position is occupied
+        """
+        try:
+            return self.spawn_actor(blueprint, transform, attach_to)
+        except RuntimeError:
+            return None
+
+    def spawn_actor(self, blueprint, transform, attach_to=None):
+        """
+        Spawn an actor, raises RuntimeError if the spawn position is occupied
+        """
+        with self._lock:
+            actor_id = next(self._actor_ids)
+            if blueprint.id.startswith('vehicle'):
+                actor = Vehicle(self, actor_id, blueprint, transform, attach_to)
+            elif blueprint.id.startswith('walker'):
+                actor = Walker(self, actor_id, blueprint, transform, attach_to)
+            elif blueprint.id.startswith('sensor'):
+                actor = Sensor(self, actor_id, blueprint, transform, attach_to)
+            else:
+                actor = Actor(self, actor_id, blueprint, transform, attach_to)
+
+            if attach_to is None and not isinstance(actor, Sensor):
+                for other in self._actors:
+                    if not isinstance(other, (Sensor, TrafficLight)) and overlap(actor, other):
+                        raise RuntimeError("Spawn failed because of collision at spawn position")
+
+            self._actors.append(actor)
+            return actor
+
+    def remove_actor(self, actor):
+        """
+        Remove the actor and destroy the actors attached to it
+        """
+        with self._lock:
+            if actor in self._actors:
+                self._actors.remove(actor)
+            for child in [other for other in self._actors if other.parent is actor]:
+                child.destroy()
+
+    def on_tick(self, callback):
+        """
+        Register a callback invoked with the Timestamp of every tick, returns its id
+        """
+        callback_id = next(self._callback_ids)
+        self._callbacks[callback_id] = callback
+        return callback_id
+
+    def remove_on_tick(self, callback_id):
+        """
+        Unregister the callback with the id
+        """
+        self._callbacks.pop(callback_id, None)
+
+    def wait_for_tick(self, seconds=10.0):
+        """
+        Wait for the next tick of the ticking thread, or tick once if it is not running
+        """
+        if not self._ticking:
+            return self.tick()
+
+        frame = self._frame
+        with self._tick_condition:
+            self._tick_condition.wait_for(lambda: self._frame > frame, timeout=seconds)
+        return self._get_timestamp()
+
+    # -- Simulation control ------------------------------------------------------
+
+    def add_traffic_light(self, transform, trigger_extent=None, state=TrafficLightState.Red):
+        """
+        Add a traffic light, which cannot be spawned from a blueprint
+        """
+        with self._lock:
+            traffic_light = TrafficLight(self, next(self._actor_ids), ActorBlueprint('traffic.traffic_light'),
+                                         transform, trigger_extent, state)
+            self._actors.append(traffic_light)
+            return traffic_light
+
+    def get_frame(self):
+        """
+        Returns the current frame
+        """
+        return self._frame
+
+    def _get_timestamp(self):
+        return Timestamp(self._frame, self._elapsed_seconds, self._settings.fixed_delta_seconds, time.time())
+
+    def tick(self):
+        """
+        Advance the simulation by one step, produce the sensor data and
+        invoke all on_tick callbacks. Returns the new timestamp.
+        """
+        delta_seconds = self._settings.fixed_delta_seconds
+        with self._lock:
+            self._frame += 1
+            self._elapsed_seconds += delta_seconds
+            actors = list(self._actors)
+            for actor in actors:
+                actor.tick(delta_seconds)
+
+        timestamp = self._get_timestamp()
+        for actor in actors:
+            if isinstance(actor, Sensor) and actor.is_alive:
+                actor.produce(self._frame, timestamp.elapsed_seconds)
+
+        for callback in list(self._callbacks.values()):
+            callback(timestamp)
+
+        with self._tick_condition:
+            self._tick_condition.notify_all()
+
+        return timestamp
+
+    def start_ticking(self, real_time=False):
+        """
+        Tick continuously in a background thread (as fast as possible, or in real time)
+        """
+        if self._ticking:
+            return
+
+        def run():
+            while self._ticking:
+                start = time.time()
+                self.tick()
+                if real_time:
+                    time.sleep(max(0.0, self._settings.fixed_delta_seconds - (time.time() - start)))
+
+        self._ticking = True
+        self._ticking_thread = threading.Thread(target=run)
+        self._ticking_thread.daemon = True
+        self._ticking_thread.start()
+
+    def stop_ticking(self):
+        """
+        Stop the ticking thread and wait for it
+        """
+        self._ticking = False
+        if self._ticking_thread is not None and self._ticking_thread is not threading.current_thread():
+            self._ticking_thread.join()
+        self._ticking_thread = None
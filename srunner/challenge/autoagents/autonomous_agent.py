@@ -49,6 +49,11 @@ class AutonomousAgent():
              'id': 'LIDAR'}
         ]
 
+        Lidar sensors accept the optional keys 'max_points', 'downsampling' ('voxel' or 'range'),
+        'voxel_size' and 'max_range' to reduce the point cloud on ingest, and 'reuse_buffers' to avoid an
+        allocation per measurement, in which case the agent must copy point clouds it keeps for more than one
+        step (see LidarPipeline).
+
         """
         sensors = []
 
@@ -16,6 +16,7 @@ import argparse
 from argparse import RawTextHelpFormatter
 from datetime import datetime
 import importlib
+import math
 import random
 import sys
 import time
@@ -23,18 +24,20 @@ import time
 import carla
 from agents.navigation.local_planner import RoadOption
 
+from srunner.challenge.envs.agent_host import AgentHost
+from srunner.challenge.envs.sensor_recorder import SensorRecorder
 from srunner.challenge.envs.server_manager import ServerManagerBinary, ServerManagerDocker
-from srunner.challenge.envs.sensor_interface import CallBack, Speedometer, HDMapReader
-from srunner.scenarios.challenge_basic import *
+from srunner.challenge.envs.sensor_interface import CallBack, LidarPipeline, Speedometer, HDMapReader
 from srunner.scenarios.config_parser import *
+from srunner.scenarios.scenario_registry import get_scenario_class_or_fail, get_scenario_groups
+from srunner.scenariomanager.actor_spawner import ActorSpawnRequest, BatchActorSpawner
+from srunner.scenariomanager.carla_data_provider import CarlaBlueprintCache
+from srunner.scenariomanager.checkpoint import CheckpointJournal
+from srunner.scenariomanager.result_cache import ResultCache
 from srunner.scenariomanager.scenario_manager import ScenarioManager
 
-# Dictionary of supported scenarios.
-# key = Name of config file in configs/
-# value = List as defined in the scenario module
-SCENARIOS = {
-    "ChallengeBasic": CHALLENGE_BASIC_SCENARIOS
-}
+# Scenario groups supported by the challenge (see srunner/scenarios/scenario_registry.py)
+SCENARIOS = get_scenario_groups(["ChallengeBasic"])
 
 
 class ChallengeEvaluator(object):
@@ -53,10 +56,29 @@ class ChallengeEvaluator(object):
     # CARLA world and scenario handlers
     world = None
     manager = None
+    spawner = None
+
+    # Optional recorder for the agent's sensor data
+    sensor_recorder = None
+
+    # Optional journal of the finished scenario executions
+    journal = None
+
+    # Optional cache of the results of previous scenario executions
+    result_cache = None
 
     def __init__(self, args):
         self.output_scenario = []
 
+        # the results of the executions finished before are taken from the journal
+        if args.checkpoint:
+            self.journal = CheckpointJournal(args.checkpoint, args.resume, overwrite=args.force)
+            for record in self.journal.records:
+                self.output_scenario.append((record['result'], record['score'], record['message']))
+
+        if args.result_cache:
+            self.result_cache = ResultCache()
+
         # first we instantiate the Agent
         module_name = os.path.basename(args.agent).split('.')[0]
         module_spec = importlib.util.spec_from_file_location(module_name, args.agent)
@@ -80,26 +102,14 @@ class ChallengeEvaluator(object):
         """
 
         self.cleanup(True)
+        if self.journal is not None:
+            self.journal.close()
+            self.journal = None
         if self.manager is not None:
             del self.manager
         if self.world is not None:
             del self.world
 
-    @staticmethod
-    def get_scenario_class_or_fail(scenario):
-        """
-        Get scenario class by scenario name
-        If scenario is not supported or not found, exit script
-        """
-
-        for scenarios in SCENARIOS.values():
-            if scenario in scenarios:
-                if scenario in globals():
-                    return globals()[scenario]
-
-        print("Scenario '{}' not supported ... Exiting".format(scenario))
-        sys.exit(-1)
-
     def cleanup(self, ego=False):
         """
         Remove and destroy all actors
@@ -118,44 +128,14 @@ class ChallengeEvaluator(object):
                 self._sensors_list[i] = None
         self._sensors_list = []
 
+        if self.sensor_recorder is not None:
+            self.sensor_recorder.stop()
+            self.sensor_recorder = None
+
         if ego and self.ego_vehicle is not None:
             self.ego_vehicle.destroy()
             self.ego_vehicle = None
 
-    def setup_vehicle(self, model, spawn_point, hero=False, autopilot=False, random_location=False):
-        """
-        Function to setup the most relevant vehicle parameters,
-        incl. spawn point and vehicle model.
-        """
-
-        blueprint_library = self.world.get_blueprint_library()
-
-        # Get vehicle by model
-        blueprint = random.choice(blueprint_library.filter(model))
-        if hero:
-            blueprint.set_attribute('role_name', 'hero')
-        else:
-            blueprint.set_attribute('role_name', 'scenario')
-
-        if random_location:
-            spawn_points = list(self.world.get_map().get_spawn_points())
-            random.shuffle(spawn_points)
-            for spawn_point in spawn_points:
-                vehicle = self.world.try_spawn_actor(blueprint, spawn_point)
-                if vehicle:
-                    break
-        else:
-            vehicle = self.world.try_spawn_actor(blueprint, spawn_point)
-
-        if vehicle is None:
-            raise Exception(
-                "Error: Unable to spawn vehicle {} at {}".format(model, spawn_point))
-        else:
-            # Let's deactivate the autopilot of the vehicle
-            vehicle.set_autopilot(autopilot)
-
-        return vehicle
-
     def setup_sensors(self, sensors, vehicle):
         """
         Create the sensors defined by the user and attach them to the ego-vehicle
@@ -163,7 +143,6 @@ class ChallengeEvaluator(object):
         :param vehicle: ego vehicle
         :return:
         """
-        bp_library = self.world.get_blueprint_library()
         for sensor_spec in sensors:
             # These are the pseudosensors (not spawned)
             if sensor_spec['type'].startswith('sensor.speedometer'):
@@ -174,7 +153,7 @@ class ChallengeEvaluator(object):
                 sensor = HDMapReader(vehicle, sensor_spec['reading_frequency'])
             # These are the sensors spawned on the carla world
             else:
-                bp = bp_library.find(sensor_spec['type'])
+                bp = CarlaBlueprintCache.find(self.world, sensor_spec['type'])
                 if sensor_spec['type'].startswith('sensor.camera'):
                     bp.set_attribute('image_size_x', str(sensor_spec['width']))
                     bp.set_attribute('image_size_y', str(sensor_spec['height']))
@@ -201,7 +180,10 @@ class ChallengeEvaluator(object):
                 sensor = self.world.spawn_actor(bp, sensor_transform,
                                                 vehicle)
             # setup callback
-            sensor.listen(CallBack(sensor_spec['id'], sensor, self.agent_instance.sensor_interface))
+            lidar_pipeline = None
+            if sensor_spec['type'].startswith('sensor.lidar'):
+                lidar_pipeline = LidarPipeline.from_sensor_spec(sensor_spec)
+            sensor.listen(CallBack(sensor_spec['id'], sensor, self.agent_instance.sensor_interface, lidar_pipeline))
             self._sensors_list.append(sensor)
 
         # check that all sensors have initialized their data structure
@@ -214,30 +196,46 @@ class ChallengeEvaluator(object):
         their parameters provided in config
         """
 
+        requests = [ActorSpawnRequest(actor.model, actor.transform, False, actor.autopilot, actor.random_location)
+                    for actor in config.other_actors]
+
         # If ego_vehicle already exists, just update location
         # Otherwise spawn ego vehicle
         if self.ego_vehicle is None:
-            self.ego_vehicle = self.setup_vehicle(config.ego_vehicle.model, config.ego_vehicle.transform, hero=True)
+            requests.insert(0, ActorSpawnRequest(config.ego_vehicle.model, config.ego_vehicle.transform, True))
         else:
             self.ego_vehicle.set_transform(config.ego_vehicle.transform)
 
-        # setup sensors
-        self.setup_sensors(self.agent_instance.sensors(), self.ego_vehicle)
-
-        # spawn all other actors
-        for actor in config.other_actors:
-            new_actor = self.setup_vehicle(actor.model, actor.transform, hero=False, autopilot=actor.autopilot,
-                                           random_location=actor.random_location)
-            self.actors.append(new_actor)
+        # All actors are spawned with one command batch
+        actors, errors = self.spawner.spawn(requests)
+        if self.ego_vehicle is None:
+            self.ego_vehicle = actors.pop(0)
+        self.actors.extend(actor for actor in actors if actor is not None)
 
+        errors = [error for error in errors if error is not None]
+        if errors:
+            raise Exception("\n".join(errors))
 
+        # setup sensors
+        self.setup_sensors(self.agent_instance.sensors(), self.ego_vehicle)
 
-    def analyze_scenario(self, args, config, final_summary=False):
+    def analyze_scenario(self, args, config, repetition=0, seed=None, cache_key=None, cached_record=None):
         """
         Provide feedback about success/failure of a scenario
+        If a cached_record is given, the result is taken from it instead of the
+        scenario manager. Otherwise it is stored in the cache, if a cache_key is given.
         """
-        result, score, return_message = self.manager.analyze_scenario_challenge()
+        if cached_record is not None:
+            print("Using cached result of scenario: " + config.name)
+            result, score, return_message = cached_record['result'], cached_record['score'], cached_record['message']
+        else:
+            result, score, return_message = self.manager.analyze_scenario_challenge()
+            if cache_key is not None:
+                self.result_cache.put(cache_key, {'result': result, 'score': score, 'message': return_message})
+
         self.output_scenario.append((result, score, return_message))
+        if self.journal is not None:
+            self.journal.add(config.name, repetition, seed, result, score=score, message=return_message)
 
         # show results stoud
         print(return_message)
@@ -362,28 +360,66 @@ class ChallengeEvaluator(object):
         self._carla_server.reset(args.host, args.port)
         self._carla_server.wait_until_ready()
 
+        # Every scenario execution gets its own seed (args.seed + number of the execution)
+        execution = 0
+
         # Setup and run the scenarios for repetition times
-        for _ in range(int(args.repetitions)):
+        for repetition in range(int(args.repetitions)):
 
             # Load the scenario configurations provided in the config file
             scenario_configurations = None
             if args.scenario.startswith("group:"):
-                scenario_configurations = parse_scenario_configuration(args.scenario, args.scenario)
+                scenario_configurations = iterate_scenario_configurations(args.scenario, args.scenario)
             else:
                 scenario_config_file = find_scenario_config(args.scenario)
                 if scenario_config_file is None:
                     print("Configuration for scenario {} cannot be found!".format(args.scenario))
                     continue
-                scenario_configurations = parse_scenario_configuration(scenario_config_file, args.scenario)
+                scenario_configurations = iterate_scenario_configurations(scenario_config_file, args.scenario)
 
             # Execute each configuration
             for config in scenario_configurations:
+                seed = None
+                if args.seed is not None:
+                    seed = args.seed + execution
+                execution += 1
+
+                if self.journal is not None and self.journal.is_finished(config.name, repetition, seed):
+                    print("Skipping finished scenario: " + config.name)
+                    continue
+
+                # Unseeded randomized executions are not reproducible, hence not cached
+                cache_key = None
+                if self.result_cache is not None and (seed is not None or not args.randomize):
+                    cache_key = self.result_cache.get_run_key(config.name, config.type, seed, "challenge_evaluator",
+                                                              [args.agent, args.config],
+                                                              randomize=args.randomize,
+                                                              agent_budget=args.agent_budget,
+                                                              agent_fallback=args.agent_fallback)
+                if cache_key is not None and not args.force:
+                    record = self.result_cache.get(cache_key)
+                    if record is not None:
+                        self.analyze_scenario(args, config, repetition, seed, cached_record=record)
+                        continue
+
+                if seed is not None:
+                    random.seed(seed)
+
                 # create agent instance
-                self.agent_instance = getattr(self.module_agent, self.module_agent.__name__)(args.config)
+                if args.agent_process:
+                    self.agent_instance = AgentHost(args.agent, args.config)
+                else:
+                    self.agent_instance = getattr(self.module_agent, self.module_agent.__name__)(args.config)
+
+                if args.record_sensors:
+                    current_time = str(datetime.now().strftime('%Y-%m-%d-%H-%M-%S'))
+                    self.sensor_recorder = SensorRecorder(os.path.join(args.record_sensors, config.name + current_time),
+                                                          drop_policy=args.record_drop_policy)
+                    self.agent_instance.sensor_interface.set_recorder(self.sensor_recorder)
 
                 # Prepare scenario
                 print("Preparing scenario: " + config.name)
-                scenario_class = ChallengeEvaluator.get_scenario_class_or_fail(config.type)
+                scenario_class = get_scenario_class_or_fail(config.type, SCENARIOS.keys())
 
                 client = carla.Client(args.host, int(args.port))
                 client.set_timeout(self.client_timeout)
@@ -396,7 +432,9 @@ class ChallengeEvaluator(object):
                 self.world.wait_for_tick(self.wait_for_world)
 
                 # Create scenario manager
-                self.manager = ScenarioManager(self.world, args.debug)
+                self.manager = ScenarioManager(self.world, args.debug, args.agent_budget, args.agent_fallback,
+                                               client=client)
+                self.spawner = BatchActorSpawner(client, self.world)
 
                 try:
                     self.prepare_actors(config)
@@ -419,10 +457,17 @@ class ChallengeEvaluator(object):
                     print("The scenario cannot be loaded")
                     print(exception)
                     self.cleanup(ego=True)
+                    # with --agent-process this also ends the agent process and removes its shared memory
+                    self.agent_instance.destroy()
                     continue
 
                 # Load scenario and run it
                 self.manager.load_scenario(scenario)
+                if args.record_trajectory:
+                    current_time = str(datetime.now().strftime('%Y-%m-%d-%H-%M-%S'))
+                    self.manager.start_trajectory_recording(
+                        os.path.join(args.record_trajectory, config.name + current_time),
+                        config.route.array, config.target.transform.location)
 
                 # debug
                 if args.route_visible:
@@ -432,7 +477,7 @@ class ChallengeEvaluator(object):
                 self.manager.run_scenario(self.agent_instance)
 
                 # Provide outputs if required
-                self.analyze_scenario(args, config)
+                self.analyze_scenario(args, config, repetition, seed, cache_key)
 
                 # Stop scenario and cleanup
                 self.manager.stop_scenario()
@@ -461,6 +506,33 @@ if __name__ == '__main__':
     PARSER.add_argument('--docker-version', type=str, help='Docker version to use for CARLA server', default="0.9.3")
     PARSER.add_argument("-a", "--agent", type=str, help="Path to Agent's py file to evaluate")
     PARSER.add_argument("--config", type=str, help="Path to Agent's configuration file", default="")
+    PARSER.add_argument('--agent-process', action="store_true",
+                        help='Run the agent in a separate process, sensor data is shared via memory-mapped buffers')
+    PARSER.add_argument('--agent-budget', type=float, default=None,
+                        help='Time budget in seconds for every agent step (default: unlimited)')
+    PARSER.add_argument('--agent-fallback', default='wait', choices=['wait', 'last', 'brake'],
+                        help='Control applied if an agent step exceeds its budget: wait for the agent, '
+                             'repeat the last control or brake (default: wait)')
+    PARSER.add_argument('--record-sensors', type=str, default=None,
+                        help='Directory to record all sensor data of the agent into (default: no recording)')
+    PARSER.add_argument('--record-drop-policy', default='newest', choices=['newest', 'oldest', 'block'],
+                        help='Frames dropped by the sensor recorder if its queue is full (default: newest)')
+    PARSER.add_argument('--record-trajectory', type=str, default=None,
+                        help='Directory to record the actor trajectories of every scenario into')
+    PARSER.add_argument('--seed', type=int, default=None,
+                        help='Seed of the random number generator (incremented for every scenario execution)')
+    PARSER.add_argument('--checkpoint', type=str, default=None,
+                        help='Journal file of the finished scenario executions. A journal with records is\n'
+                             'only continued with --resume or overwritten with --force')
+    PARSER.add_argument('--resume', action="store_true",
+                        help='Skip the scenario executions finished according to the --checkpoint journal '
+                             'and include their results in the final summary')
+    PARSER.add_argument('--result-cache', action="store_true",
+                        help='Reuse the results of identical scenario executions (same configuration, scenario\n'
+                             'source, agent and its configuration, seed) instead of running them again')
+    PARSER.add_argument('--force', action="store_true",
+                        help='Run all scenarios, even if a cached result exists (the cache is updated),\n'
+                             'and overwrite a --checkpoint journal with records instead of refusing to start')
     PARSER.add_argument('--route-visible', action="store_true", help='Run with a visible route')
     PARSER.add_argument('--debug', action="store_true", help='Run with debug output')
     PARSER.add_argument('--file', action="store_true", help='Write results into a txt file')
@@ -497,6 +569,18 @@ if __name__ == '__main__':
         print(*SCENARIOS.keys(), sep='\n')
         sys.exit(0)
 
+    if ARGUMENTS.resume and not ARGUMENTS.checkpoint:
+        print("Please specify the journal to resume from using '--checkpoint FILE'\n\n")
+        PARSER.print_help(sys.stdout)
+        sys.exit(0)
+
+    if ARGUMENTS.checkpoint and not (ARGUMENTS.resume or ARGUMENTS.force) and \
+            CheckpointJournal.has_records(ARGUMENTS.checkpoint):
+        print("The journal {} is not empty, continue it using '--resume' or overwrite it "
+              "using '--force'\n\n".format(ARGUMENTS.checkpoint))
+        PARSER.print_help(sys.stdout)
+        sys.exit(0)
+
     if ARGUMENTS.scenario is None:
         print("Please specify a scenario using '--scenario SCENARIONAME'\n\n")
         PARSER.print_help(sys.stdout)
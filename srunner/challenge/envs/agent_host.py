@@ -0,0 +1,318 @@
+#!/usr/bin/env python
+
+#
+# This work is licensed under the terms of the MIT license.
+# For a copy, see <https://opensource.org/licenses/MIT>.
+
+"""
+Out-of-process host for autonomous agents.
+
+The agent is executed in a separate process, so that its run_step() does not
+compete for the GIL with the sensor callbacks and the scenario behavior tree.
+Sensor frames are written by the evaluator into memory-mapped ring buffers,
+which the agent process reads without copying. Only small frame descriptors
+and the resulting vehicle control are exchanged via a pipe.
+"""
+
+import importlib.util
+import mmap
+import multiprocessing
+import os
+import tempfile
+import threading
+import traceback
+
+import numpy as np
+
+import carla
+
+from srunner.challenge.envs.sensor_interface import SensorInterface
+
+
+def _shared_memory_dir():
+    """
+    Prefer a RAM backed file system for the ring buffers, if available
+    """
+    if os.path.isdir('/dev/shm'):
+        return '/dev/shm'
+    return tempfile.gettempdir()
+
+
+class SharedMemoryRing(object):
+
+    """
+    Memory-mapped ring buffer with a fixed number of equally sized slots.
+
+    The slot handed out last to the reader (pinned) and the most recently
+    written slot are never overwritten, hence at least three slots are required.
+    """
+
+    def __init__(self, slot_size, slots=3):
+        if slots < 3:
+            raise ValueError("A shared memory ring requires at least 3 slots")
+
+        self.slot_size = slot_size
+        self.slots = slots
+        self.latest = None
+        self._pinned = None
+        self._next = 0
+        self._lock = threading.Lock()
+
+        fd, self.path = tempfile.mkstemp(prefix='srunner_ring_', dir=_shared_memory_dir())
+        try:
+            os.ftruncate(fd, self.slot_size * self.slots)
+            self._buffer = mmap.mmap(fd, self.slot_size * self.slots)
+        finally:
+            os.close(fd)
+
+    def write(self, array):
+        """
+        Copy the array into the next free slot and return the slot index.
+        The slot becomes the most recent one only once it is published.
+        """
+        with self._lock:
+            slot = self._next
+            while slot in (self.latest, self._pinned):
+                slot = (slot + 1) % self.slots
+            self._next = (slot + 1) % self.slots
+
+        offset = slot * self.slot_size
+        self._buffer[offset:offset + array.nbytes] = array.tobytes()
+        return slot
+
+    def publish(self, slot):
+        """
+        Make the written slot the most recent one
+        """
+        with self._lock:
+            self.latest = slot
+
+    def pin(self, slot):
+        """
+        Pin the slot for the reader (it is not overwritten until another slot is pinned)
+        """
+        with self._lock:
+            self._pinned = slot
+
+    def close(self):
+        """
+        Release the mapping and remove the backing file
+        """
+        self._buffer.close()
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+class SharedMemorySensorInterface(SensorInterface):
+
+    """
+    SensorInterface that mirrors all numpy sensor data into shared memory rings.
+    Non-array data (e.g. speed or HD map pseudo sensors) is passed by value.
+    """
+
+    def __init__(self, slots=3):
+        super(SharedMemorySensorInterface, self).__init__()
+        self._slots = slots
+        self._rings = {}
+        self._retired_rings = []
+        self._descriptors = {}
+        self._lock = threading.Lock()
+
+    def update_sensor(self, tag, data, timestamp):
+        if tag not in self._sensors_objects:
+            raise ValueError("The sensor with tag [{}] has not been created!".format(tag))
+
+        retired_ring = None
+        if isinstance(data, np.ndarray):
+            data = np.ascontiguousarray(data)
+            ring = self._rings.get(tag)
+            if ring is None or ring.slot_size < data.nbytes:
+                # lidar clouds vary in size, hence leave some headroom
+                retired_ring = ring
+                ring = SharedMemoryRing(max(2 * data.nbytes, mmap.PAGESIZE), self._slots)
+                self._rings[tag] = ring
+            slot = ring.write(data)
+            descriptor = ('ring', ring, slot, data.dtype.str, data.shape)
+        else:
+            descriptor = ('value', data)
+
+        # The slot is published together with its descriptor, hence a reader
+        # never decodes a slot with the dtype and shape of another frame
+        with self._lock:
+            if descriptor[0] == 'ring':
+                descriptor[1].publish(descriptor[2])
+            if retired_ring is not None:
+                self._retired_rings.append(retired_ring)
+            self._data_buffers[tag] = data
+            self._timestamps[tag] = timestamp
+            self._descriptors[tag] = descriptor
+
+        if self._recorder is not None:
+            self._recorder.record(tag, data, timestamp)
+
+    def get_descriptors(self):
+        """
+        Pin the latest frame of every sensor and return picklable descriptors
+        """
+        with self._lock:
+            descriptors = dict(self._descriptors)
+            timestamps = dict(self._timestamps)
+            retired_rings, self._retired_rings = self._retired_rings, []
+
+            # pin while holding the lock, so the slots cannot be published over and reused meanwhile
+            for descriptor in descriptors.values():
+                if descriptor[0] == 'ring':
+                    descriptor[1].pin(descriptor[2])
+
+        # rings replaced before this step are not referenced by the reader anymore
+        for ring in retired_rings:
+            ring.close()
+
+        output = {}
+        for tag, descriptor in descriptors.items():
+            if descriptor[0] == 'ring':
+                _, ring, slot, dtype, shape = descriptor
+                output[tag] = (timestamps[tag], ('ring', ring.path, ring.slot_size * slot, dtype, shape))
+            else:
+                output[tag] = (timestamps[tag], descriptor)
+        return output
+
+    def destroy(self):
+        """
+        Remove all shared memory rings
+        """
+        for ring in list(self._rings.values()) + self._retired_rings:
+            ring.close()
+        self._rings = {}
+        self._retired_rings = []
+
+
+def _load_agent(path_to_agent, path_to_conf_file):
+    """
+    Instantiate the agent class defined in the given python file
+    """
+    module_name = os.path.basename(path_to_agent).split('.')[0]
+    module_spec = importlib.util.spec_from_file_location(module_name, path_to_agent)
+    module_agent = importlib.util.module_from_spec(module_spec)
+    module_spec.loader.exec_module(module_agent)
+    return getattr(module_agent, module_agent.__name__)(path_to_conf_file)
+
+
+def _agent_process(path_to_agent, path_to_conf_file, connection):
+    """
+    Main loop of the agent process
+    """
+    mappings = {}
+
+    def read(descriptor):
+        if descriptor[0] != 'ring':
+            return descriptor[1]
+        _, path, offset, dtype, shape = descriptor
+        if path not in mappings:
+            with open(path, 'rb') as ring_file:
+                mappings[path] = mmap.mmap(ring_file.fileno(), 0, access=mmap.ACCESS_READ)
+        dtype = np.dtype(dtype)
+        count = int(np.prod(shape))
+        return np.frombuffer(mappings[path], dtype=dtype, count=count, offset=offset).reshape(shape)
+
+    try:
+        agent = _load_agent(path_to_agent, path_to_conf_file)
+        connection.send(('sensors', agent.sensors()))
+
+        while True:
+            command, payload = connection.recv()
+            if command == 'step':
+                # forget rings that have been replaced by the evaluator
+                active_paths = set(descriptor[1] for _, descriptor in payload.values() if descriptor[0] == 'ring')
+                for path in list(mappings.keys()):
+                    if path not in active_paths:
+                        del mappings[path]
+
+                input_data = {tag: (timestamp, read(descriptor))
+                              for tag, (timestamp, descriptor) in payload.items()}
+                control = agent.run_step(input_data)
+                connection.send(('control', (control.throttle, control.steer, control.brake,
+                                             control.hand_brake, control.reverse)))
+            elif command == 'plan':
+                agent.set_global_plan(payload)
+            elif command == 'destroy':
+                agent.destroy()
+                break
+    except Exception:   # pylint: disable=broad-except
+        connection.send(('error', traceback.format_exc()))
+    finally:
+        connection.close()
+
+
+class AgentHost(object):
+
+    """
+    Evaluator-side proxy for an agent running in its own process.
+
+    It offers the subset of the AutonomousAgent interface used by the
+    ChallengeEvaluator and the ScenarioManager.
+    """
+
+    def __init__(self, path_to_agent, path_to_conf_file, slots=3):
+        self.sensor_interface = SharedMemorySensorInterface(slots)
+
+        self._connection, child_connection = multiprocessing.Pipe()
+        self._process = multiprocessing.Process(target=_agent_process,
+                                                args=(path_to_agent, path_to_conf_file, child_connection))
+        self._process.daemon = True
+        self._process.start()
+        child_connection.close()
+
+        self._sensors = self._receive('sensors')
+
+    def _receive(self, expected):
+        message, payload = self._connection.recv()
+        if message == 'error':
+            raise RuntimeError("Agent process failed:\n{}".format(payload))
+        if message != expected:
+            raise RuntimeError("Unexpected message '{}' from agent process".format(message))
+        return payload
+
+    def sensors(self):
+        """
+        Returns the sensor definitions reported by the agent process
+        """
+        return self._sensors
+
+    def all_sensors_ready(self):
+        """
+        Returns True, once every registered sensor has delivered data
+        """
+        return self.sensor_interface.all_sensors_ready()
+
+    def set_global_plan(self, global_plan):
+        """
+        Forward the global plan to the agent process
+        """
+        self._connection.send(('plan', global_plan))
+
+    def __call__(self):
+        self._connection.send(('step', self.sensor_interface.get_descriptors()))
+        throttle, steer, brake, hand_brake, reverse = self._receive('control')
+
+        control = carla.VehicleControl()
+        control.throttle = throttle
+        control.steer = steer
+        control.brake = brake
+        control.hand_brake = hand_brake
+        control.reverse = reverse
+        control.manual_gear_shift = False
+
+        return control
+
+    def destroy(self):
+        """
+        Stop the agent process and release the shared memory
+        """
+        if self._process.is_alive():
+            self._connection.send(('destroy', None))
+            self._process.join(timeout=5.0)
+            if self._process.is_alive():
+                self._process.terminate()
+        self._connection.close()
+        self.sensor_interface.destroy()
@@ -124,10 +124,106 @@ class Speedometer(object):
         self._run_ps = False
 
 
+class LidarPipeline(object):
+    """
+    Converts raw lidar measurements into compact (N, 3) float32 arrays.
+
+    Every measurement is returned as a new array, unless reuse_buffers is
+    set: then the points are written into two preallocated buffers, which
+    are used alternately, so no new array has to be allocated per
+    measurement. A returned array is then only valid until the next but one
+    call, consumers keeping it longer have to copy it.
+    Optionally, the point cloud is reduced on ingest:
+    - max_range: drop all points further away than max_range (meters)
+    - downsampling='voxel': keep one point per voxel of size voxel_size (meters)
+    - max_points: point budget. If exceeded, the nearest points are kept for
+      downsampling='range', otherwise the cloud is decimated uniformly.
+    """
+
+    DOWNSAMPLING_MODES = [None, 'voxel', 'range']
+
+    def __init__(self, max_points=None, downsampling=None, voxel_size=0.2, max_range=None, reuse_buffers=False,
+                 capacity=0):
+        if downsampling not in self.DOWNSAMPLING_MODES:
+            raise ValueError("Unknown lidar downsampling mode [{}]".format(downsampling))
+
+        self._max_points = max_points
+        self._downsampling = downsampling
+        self._voxel_size = voxel_size
+        self._max_range = max_range
+        self._reuse_buffers = reuse_buffers
+        self._buffers = [np.empty((capacity, 3), dtype=np.float32),
+                         np.empty((capacity, 3), dtype=np.float32)]
+        self._current = 0
+
+    @staticmethod
+    def from_sensor_spec(sensor_spec):
+        """
+        Create the pipeline from the optional keys of an agent's lidar sensor definition
+        """
+        return LidarPipeline(max_points=sensor_spec.get('max_points', None),
+                             downsampling=sensor_spec.get('downsampling', None),
+                             voxel_size=sensor_spec.get('voxel_size', 0.2),
+                             max_range=sensor_spec.get('max_range', None),
+                             reuse_buffers=sensor_spec.get('reuse_buffers', False))
+
+    def _get_buffer(self, size):
+        if not self._reuse_buffers:
+            return np.empty((size, 3), dtype=np.float32)
+
+        self._current = 1 - self._current
+        if self._buffers[self._current].shape[0] < size:
+            capacity = max(size, 2 * self._buffers[self._current].shape[0])
+            self._buffers[self._current] = np.empty((capacity, 3), dtype=np.float32)
+        return self._buffers[self._current][:size]
+
+    def _voxel_filter(self, points):
+        """
+        Keep the first point within every voxel
+        """
+        voxels = np.floor(points / self._voxel_size).astype(np.int64)
+        voxels -= voxels.min(axis=0)
+        keys = (voxels[:, 0] << 42) | (voxels[:, 1] << 21) | voxels[:, 2]
+        _, index = np.unique(keys, return_index=True)
+        index.sort()
+        return points[index]
+
+    def __call__(self, raw_data):
+        points = np.frombuffer(raw_data, dtype=np.dtype('f4'))
+        points = points[:points.shape[0] // 3 * 3].reshape((-1, 3))
+
+        squared_distances = None
+        if self._max_range is not None:
+            squared_distances = np.einsum('ij,ij->i', points, points)
+            in_range = squared_distances <= self._max_range ** 2
+            points = points[in_range]
+            squared_distances = squared_distances[in_range]
+
+        if self._downsampling == 'voxel' and points.shape[0] > 0:
+            points = self._voxel_filter(points)
+
+        if self._max_points is not None and points.shape[0] > self._max_points:
+            if self._downsampling == 'range':
+                if squared_distances is None:
+                    squared_distances = np.einsum('ij,ij->i', points, points)
+                index = np.argpartition(squared_distances, self._max_points - 1)[:self._max_points]
+                index.sort()
+            else:
+                index = np.linspace(0, points.shape[0] - 1, self._max_points).astype(np.intp)
+            output = self._get_buffer(self._max_points)
+            np.take(points, index, axis=0, out=output)
+        else:
+            output = self._get_buffer(points.shape[0])
+            np.copyto(output, points)
+
+        return output
+
+
 class CallBack(object):
-    def __init__(self, tag, sensor, data_provider):
+    def __init__(self, tag, sensor, data_provider, lidar_pipeline=None):
         self._tag = tag
         self._data_provider = data_provider
+        self._lidar_pipeline = lidar_pipeline if lidar_pipeline is not None else LidarPipeline()
 
         self._data_provider.register_sensor(tag, sensor)
 
@@ -154,9 +250,7 @@ class CallBack(object):
         self._data_provider.update_sensor(tag, array, image.frame_number)
 
     def _parse_lidar_cb(self, lidar_data, tag):
-        points = np.frombuffer(lidar_data.raw_data, dtype=np.dtype('f4'))
-        points = copy.deepcopy(points)
-        points = np.reshape(points, (int(points.shape[0] / 3), 3))
+        points = self._lidar_pipeline(lidar_data.raw_data)
         self._data_provider.update_sensor(tag, points, lidar_data.frame_number)
 
     def _parse_gnss_cb(self, gnss_data, tag):
@@ -177,6 +271,13 @@ class SensorInterface(object):
         self._sensors_objects = {}
         self._data_buffers = {}
         self._timestamps = {}
+        self._recorder = None
+
+    def set_recorder(self, recorder):
+        """
+        Forward all sensor updates to the given SensorRecorder (None to disable)
+        """
+        self._recorder = recorder
 
     def register_sensor(self, tag, sensor):
         if tag  in self._sensors_objects:
@@ -191,6 +292,8 @@ class SensorInterface(object):
             raise ValueError("The sensor with tag [{}] has not been created!".format(tag))
         self._data_buffers[tag] = data
         self._timestamps[tag] = timestamp
+        if self._recorder is not None:
+            self._recorder.record(tag, data, timestamp)
 
     def all_sensors_ready(self):
         for key in self._sensors_objects.keys():
@@ -0,0 +1,224 @@
+#!/usr/bin/env python
+
+#
+# This work is licensed under the terms of the MIT license.
+# For a copy, see <https://opensource.org/licenses/MIT>.
+
+"""
+Asynchronous recorder for the sensor streams of a SensorInterface.
+
+The sensor callbacks only put frames into a bounded queue, a writer thread
+stores them on disk. If the queue is full, frames are dropped according to
+the selected policy, instead of blocking the simulator callbacks.
+
+On-disk format of a recording directory:
+- chunk_XXXXX.bin: raw frame bytes, appended one after the other
+- index.jsonl: one JSON record per frame with tag, timestamp, chunk, offset,
+  number of bytes, encoding ("raw" for numpy arrays, "pickle" otherwise),
+  dtype and shape
+- summary.json: number of written and dropped frames per sensor tag, and the
+  error that stopped the writer thread (if any)
+"""
+
+import json
+import os
+import pickle
+import queue
+import threading
+
+import numpy as np
+
+
+class SensorRecorder(object):
+
+    """
+    Records sensor frames into a chunked on-disk format using a writer thread
+
+    drop_policy:
+    - "newest": drop the incoming frame, if the queue is full
+    - "oldest": drop the oldest queued frame to make room for the new one
+    - "block": wait up to block_timeout seconds for free space, then drop the frame
+    """
+
+    DROP_POLICIES = ["newest", "oldest", "block"]
+
+    def __init__(self, path, queue_size=64, chunk_bytes=256 * 1024 * 1024, drop_policy="newest",
+                 block_timeout=0.01):
+        if drop_policy not in self.DROP_POLICIES:
+            raise ValueError("Unknown drop policy [{}]".format(drop_policy))
+
+        if not os.path.exists(path):
+            os.makedirs(path)
+
+        self._path = path
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._chunk_bytes = chunk_bytes
+        self._drop_policy = drop_policy
+        self._block_timeout = block_timeout
+
+        self._written = {}
+        self._dropped = {}
+        self._error = None
+        self._lock = threading.Lock()
+
+        self._chunk_id = -1
+        self._chunk_file = None
+        self._chunk_offset = 0
+        # the index and chunk files stay open while recording, they are closed by stop()
+        self._index_file = open(os.path.join(self._path, "index.jsonl"), "w",  # pylint: disable=consider-using-with
+                                encoding='utf-8')
+
+        self._writer = threading.Thread(target=self._run_writer)
+        self._writer.daemon = True
+        self._writer.start()
+
+    def record(self, tag, data, timestamp):
+        """
+        Enqueue a frame without blocking the caller (except for the "block" policy).
+        Returns True if the frame was accepted.
+        """
+        if self._error is not None:
+            # the writer thread has stopped, nothing would consume the frame
+            self._count_drop(tag)
+            return False
+
+        if isinstance(data, np.ndarray):
+            # sensor buffers may be reused (e.g. by the LidarPipeline)
+            data = data.copy()
+        item = (tag, timestamp, data)
+
+        try:
+            if self._drop_policy == "block":
+                self._queue.put(item, timeout=self._block_timeout)
+            else:
+                self._queue.put_nowait(item)
+            return True
+        except queue.Full:
+            pass
+
+        if self._drop_policy == "oldest":
+            try:
+                dropped_tag, _, _ = self._queue.get_nowait()
+                self._count_drop(dropped_tag)
+                self._queue.put_nowait(item)
+                return True
+            except (queue.Empty, queue.Full):
+                pass
+
+        self._count_drop(tag)
+        return False
+
+    def _count_drop(self, tag):
+        with self._lock:
+            self._dropped[tag] = self._dropped.get(tag, 0) + 1
+
+    def _open_next_chunk(self):
+        if self._chunk_file is not None:
+            self._chunk_file.close()
+        self._chunk_id += 1
+        self._chunk_offset = 0
+        chunk_name = os.path.join(self._path, "chunk_{:05d}.bin".format(self._chunk_id))
+        self._chunk_file = open(chunk_name, "wb")  # pylint: disable=consider-using-with
+
+    def _run_writer(self):
+        """
+        Writer thread: append frames to the current chunk and index them.
+        An error (e.g. a full disk) stops the thread and is reported by stop().
+        """
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+
+            try:
+                self._write_frame(*item)
+            except Exception as exception:  # pylint: disable=broad-except
+                self._error = exception
+                break
+
+    def _write_frame(self, tag, timestamp, data):
+        """
+        Append one frame to the current chunk and index it
+        """
+        entry = {'tag': tag, 'timestamp': timestamp}
+        if isinstance(data, np.ndarray):
+            payload = np.ascontiguousarray(data).tobytes()
+            entry.update({'encoding': 'raw', 'dtype': data.dtype.str, 'shape': list(data.shape)})
+        else:
+            payload = pickle.dumps(data, protocol=2)
+            entry['encoding'] = 'pickle'
+
+        if self._chunk_file is None or self._chunk_offset + len(payload) > self._chunk_bytes:
+            self._open_next_chunk()
+
+        self._chunk_file.write(payload)
+        entry.update({'chunk': self._chunk_id, 'offset': self._chunk_offset, 'nbytes': len(payload)})
+        self._chunk_offset += len(payload)
+        self._index_file.write(json.dumps(entry) + "\n")
+
+        with self._lock:
+            self._written[tag] = self._written.get(tag, 0) + 1
+
+    def stop(self):
+        """
+        Flush all queued frames, close the files and write the summary.
+        If the writer thread failed, the remaining frames are discarded and
+        the error is printed and stored in the summary.
+        """
+        if self._writer is None:
+            return
+
+        # A failed writer does not consume the queue anymore, hence never block on it
+        while self._writer.is_alive():
+            try:
+                self._queue.put(None, timeout=0.1)
+                break
+            except queue.Full:
+                pass
+        self._writer.join()
+        self._writer = None
+
+        if self._chunk_file is not None:
+            self._chunk_file.close()
+        self._index_file.close()
+
+        summary = {'written': self._written, 'dropped': self._dropped}
+        if self._error is not None:
+            print("The sensor recording in {} failed: {}".format(self._path, self._error))
+            summary['error'] = repr(self._error)
+
+        with open(os.path.join(self._path, "summary.json"), "w", encoding='utf-8') as summary_file:
+            json.dump(summary, summary_file)
+
+    def get_dropped_frames(self):
+        """
+        Returns the number of dropped frames per sensor tag
+        """
+        with self._lock:
+            return dict(self._dropped)
+
+
+def read_sensor_recording(path, tag=None):
+    """
+    Generator over all recorded frames (tag, timestamp, data) in a recording directory.
+    Raw frames are returned as read-only numpy arrays mapped from the chunk files.
+    """
+    chunks = {}
+    with open(os.path.join(path, "index.jsonl"), encoding='utf-8') as index_file:
+        for line in index_file:
+            entry = json.loads(line)
+            if tag is not None and entry['tag'] != tag:
+                continue
+
+            chunk_name = os.path.join(path, "chunk_{:05d}.bin".format(entry['chunk']))
+            if entry['encoding'] == 'raw':
+                if chunk_name not in chunks:
+                    chunks[chunk_name] = np.memmap(chunk_name, dtype=np.uint8, mode='r')
+                raw = chunks[chunk_name][entry['offset']:entry['offset'] + entry['nbytes']]
+                data = raw.view(np.dtype(entry['dtype'])).reshape(entry['shape'])
+            else:
+                with open(chunk_name, "rb") as chunk_file:
+                    chunk_file.seek(entry['offset'])
+                    data = pickle.loads(chunk_file.read(entry['nbytes']))
+
+            yield entry['tag'], entry['timestamp'], data
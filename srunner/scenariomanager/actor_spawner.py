@@ -0,0 +1,298 @@
+#!/usr/bin/env python
+
+#
+# This work is licensed under the terms of the MIT license.
+# For a copy, see <https://opensource.org/licenses/MIT>.
+
+"""
+This module provides a spawner, which sets up all actors of a scenario
+configuration with one command batch.
+
+Each actor is spawned with carla.command.SpawnActor, followed by the
+autopilot setting (SetAutopilot on the future actor), and all commands
+are sent with client.apply_batch_sync(). Actors with a random location are
+spawned at a random spawn point. If it is occupied, all failed actors are
+retried with their next spawn point in a further batch.
+
+Command batches require CARLA 0.9.5. With older versions, the actors are
+spawned and reset one by one (world.try_spawn_actor() and actor methods).
+
+Optionally, the spawner reuses actors of previous scenarios from an
+ActorPool instead of spawning new ones: released actors are parked out of
+the way with physics disabled, and handed out again by teleporting them to
+their new transform.
+"""
+
+import random
+
+import carla
+
+from srunner.scenariomanager.carla_data_provider import CarlaBlueprintCache, has_batch_commands
+
+
+def destroy_actors(client, actors):
+    """
+    Destroy all (alive) actors, with one command batch if supported
+    """
+    actors = [actor for actor in actors if actor is not None and actor.is_alive]
+    if not has_batch_commands():
+        for actor in actors:
+            actor.destroy()
+    elif actors:
+        client.apply_batch_sync([carla.command.DestroyActor(actor) for actor in actors])
+
+
+class ActorSpawnRequest(object):
+
+    """
+    Parameters of an actor to be spawned:
+    - model (blueprint filter, e.g. vehicle.*)
+    - transform (ignored for random_location)
+    - hero (role_name 'hero' instead of 'scenario')
+    - autopilot
+    - random_location
+    """
+
+    def __init__(self, model, transform, hero=False, autopilot=False, random_location=False):
+        self.model = model
+        self.transform = transform
+        self.hero = hero
+        self.autopilot = autopilot
+        self.random_location = random_location
+
+
+class ActorPool(object):
+
+    """
+    Released (non-hero) actors, keyed by their blueprint id
+
+    Parked actors are placed below the map, each at its own parking slot,
+    with autopilot and physics disabled, zero velocity and a neutral control.
+    When an actor is acquired again, it is reset the same way and teleported
+    to its new transform (see get_reset_commands()).
+    """
+
+    PARKING_HEIGHT = -500.0     # meters, below the map
+    PARKING_SPACING = 10.0      # meters between two parked actors
+
+    def __init__(self, client):
+        self._client = client
+        self._parked = {}
+        self._parking_slots = {}
+
+    def __len__(self):
+        return sum(len(actors) for actors in self._parked.values())
+
+    @staticmethod
+    def get_reset_commands(actor, transform, autopilot=False, simulate_physics=True):
+        """
+        Commands to teleport the actor to the transform, with zero velocity,
+        a neutral control and the given autopilot and physics settings
+        """
+        commands = [carla.command.ApplyTransform(actor, transform),
+                    carla.command.ApplyVelocity(actor, carla.Vector3D()),
+                    carla.command.SetSimulatePhysics(actor, simulate_physics)]
+        if actor.type_id.startswith('vehicle.'):
+            commands.append(carla.command.ApplyVehicleControl(actor, carla.VehicleControl()))
+            commands.append(carla.command.SetAutopilot(actor, autopilot))
+        elif actor.type_id.startswith('walker.'):
+            commands.append(carla.command.ApplyWalkerControl(actor, carla.WalkerControl()))
+        return commands
+
+    @staticmethod
+    def reset_actor(actor, transform, autopilot=False, simulate_physics=True):
+        """
+        Same as get_reset_commands(), applied directly (without command batches)
+        """
+        actor.set_transform(transform)
+        if hasattr(actor, 'set_velocity'):
+            actor.set_velocity(carla.Vector3D())
+        actor.set_simulate_physics(simulate_physics)
+        if actor.type_id.startswith('vehicle.'):
+            actor.apply_control(carla.VehicleControl())
+            actor.set_autopilot(autopilot)
+        elif actor.type_id.startswith('walker.'):
+            actor.apply_control(carla.WalkerControl())
+
+    def reset(self, resets, simulate_physics=True):
+        """
+        Reset all actors of the (actor, transform, autopilot) tuples, with one
+        command batch if supported
+        """
+        if has_batch_commands():
+            commands = []
+            for actor, transform, autopilot in resets:
+                commands.extend(self.get_reset_commands(actor, transform, autopilot, simulate_physics))
+            if commands:
+                self._client.apply_batch_sync(commands)
+        else:
+            for actor, transform, autopilot in resets:
+                self.reset_actor(actor, transform, autopilot, simulate_physics)
+
+    def _get_parking_transform(self, actor):
+        slot = self._parking_slots.setdefault(actor.id, len(self._parking_slots))
+        return carla.Transform(carla.Location(x=slot * self.PARKING_SPACING, y=0.0, z=self.PARKING_HEIGHT))
+
+    def acquire(self, blueprint_id):
+        """
+        Returns a parked actor of the blueprint or None. The caller has to
+        reset it (see get_reset_commands()).
+        """
+        actors = self._parked.get(blueprint_id)
+        return actors.pop() if actors else None
+
+    def release(self, actors):
+        """
+        Park all (alive) actors with one command batch
+        """
+        parked = []
+        for actor in actors:
+            if actor is not None and actor.is_alive:
+                parked.append((actor, self._get_parking_transform(actor), False))
+                self._parked.setdefault(actor.type_id, []).append(actor)
+        self.reset(parked, simulate_physics=False)
+
+    def destroy(self):
+        """
+        Destroy all parked actors
+        """
+        destroy_actors(self._client, [actor for actors in self._parked.values() for actor in actors])
+        self._parked.clear()
+        self._parking_slots.clear()
+
+
+class BatchActorSpawner(object):
+
+    """
+    Spawns a list of ActorSpawnRequests with as few round trips as possible
+
+    If a pool is given, non-hero actors with a fixed transform are taken
+    from the pool, if it has a parked actor of the chosen blueprint. The
+    blueprint is chosen in any case, so a seeded run spawns the same models
+    with or without the pool.
+
+    Usage:
+    spawner = BatchActorSpawner(client, world, ActorPool(client))
+    actors, errors = spawner.spawn([ActorSpawnRequest('vehicle.*', transform)])
+    ...
+    spawner.release(actors)
+    """
+
+    def __init__(self, client, world, pool=None):
+        self._client = client
+        self._world = world
+        self._pool = pool
+
+    def _get_blueprint(self, request):
+        blueprint = random.choice(CarlaBlueprintCache.filter(self._world, request.model))
+        blueprint.set_attribute('role_name', 'hero' if request.hero else 'scenario')
+        return blueprint
+
+    def spawn(self, requests):
+        """
+        Spawn all requested actors. Returns the list of actors and the list of
+        error messages, both in order of the requests. For a failed request the
+        actor is None, for a successful one the error message is None.
+        """
+        actors = [None] * len(requests)
+        errors = [None] * len(requests)
+
+        resets = []
+        pending = []
+        for index, request in enumerate(requests):
+            blueprint = self._get_blueprint(request)
+            if self._pool is not None and not request.hero and not request.random_location:
+                actor = self._pool.acquire(blueprint.id)
+                if actor is not None:
+                    actors[index] = actor
+                    resets.append((actor, request.transform, request.autopilot))
+                    continue
+            spawn_points = None
+            if request.random_location:
+                spawn_points = list(self._world.get_map().get_spawn_points())
+                random.shuffle(spawn_points)
+                if not spawn_points:
+                    errors[index] = "Error: Unable to spawn vehicle {} (no spawn points)".format(request.model)
+                    continue
+            pending.append((index, request, blueprint, spawn_points))
+
+        if resets:
+            self._pool.reset(resets)
+
+        spawned = self._spawn_batch(pending) if has_batch_commands() else self._spawn_single(pending)
+        for index, (actor, error) in spawned.items():
+            actors[index] = actor
+            errors[index] = error
+
+        return actors, errors
+
+    def _spawn_batch(self, pending):
+        """
+        Spawn the pending (index, request, blueprint, spawn points) tuples with
+        command batches, one batch per spawn attempt.
+        Returns a dictionary index -> (actor, error message)
+        """
+        actor_ids = {}
+        spawned = {}
+        while pending:
+            transforms = []
+            commands = []
+            for _, request, blueprint, spawn_points in pending:
+                transforms.append(request.transform if spawn_points is None else spawn_points.pop(0))
+                commands.append(carla.command.SpawnActor(blueprint, transforms[-1]).then(
+                    carla.command.SetAutopilot(carla.command.FutureActor, request.autopilot)))
+
+            retry = []
+            for item, transform, response in zip(pending, transforms, self._client.apply_batch_sync(commands)):
+                index, request, _, spawn_points = item
+                if not response.error:
+                    actor_ids[index] = response.actor_id
+                elif spawn_points:
+                    retry.append(item)
+                else:
+                    spawned[index] = (None, "Error: Unable to spawn vehicle {} at {} ({})".format(
+                        request.model, transform, response.error))
+            pending = retry
+
+        spawned_actors = {}
+        if actor_ids:
+            spawned_actors = {actor.id: actor for actor in self._world.get_actors(list(actor_ids.values()))}
+        spawned.update({index: (spawned_actors.get(actor_id), None) for index, actor_id in actor_ids.items()})
+        return spawned
+
+    def _spawn_single(self, pending):
+        """
+        Spawn the pending (index, request, blueprint, spawn points) tuples one
+        by one, for CARLA versions without command batches.
+        Returns a dictionary index -> (actor, error message)
+        """
+        spawned = {}
+        for index, request, blueprint, spawn_points in pending:
+            while True:
+                transform = request.transform if spawn_points is None else spawn_points.pop(0)
+                actor = self._world.try_spawn_actor(blueprint, transform)
+                if actor is not None or not spawn_points:
+                    break
+
+            if actor is None:
+                spawned[index] = (None, "Error: Unable to spawn vehicle {} at {}".format(request.model, transform))
+            else:
+                actor.set_autopilot(request.autopilot)
+                spawned[index] = (actor, None)
+        return spawned
+
+    def release(self, actors):
+        """
+        Hand the actors back to the pool, or destroy them, if there is no pool
+        """
+        if self._pool is not None:
+            self._pool.release(actors)
+        else:
+            destroy_actors(self._client, actors)
+
+    def destroy_pool(self):
+        """
+        Destroy all actors parked in the pool
+        """
+        if self._pool is not None:
+            self._pool.destroy()
@@ -0,0 +1,180 @@
+#!/usr/bin/env python
+
+#
+# This work is licensed under the terms of the MIT license.
+# For a copy, see <https://opensource.org/licenses/MIT>.
+
+"""
+This module provides a watchdog for autonomous agents, which measures the
+latency of every agent step and enforces an optional time budget.
+"""
+
+import collections
+import threading
+import time
+
+import carla
+
+from srunner.scenariomanager.timer import GameTime
+from srunner.scenariomanager.traffic_events import TrafficEvent, TrafficEventType
+
+
+class AgentWatchdog(object):
+
+    """
+    Wrapper around an agent (any callable returning a carla.VehicleControl).
+
+    Every call is timed and the latencies are kept for percentile statistics.
+    If a time budget is given, overruns are recorded as traffic events.
+    Depending on the fallback policy the watchdog either waits for the agent
+    ("wait"), or returns after the budget with the last valid control ("last")
+    or with a full brake ("brake"). In the latter cases the agent keeps
+    computing in a worker thread and no new step is requested until it is done.
+    """
+
+    FALLBACK_POLICIES = ["wait", "last", "brake"]
+
+    def __init__(self, agent, budget=None, fallback="wait", history=1000):
+        if fallback not in self.FALLBACK_POLICIES:
+            raise ValueError("Unknown agent fallback policy '{}'".format(fallback))
+
+        self._agent = agent
+        self._budget = budget
+        self._fallback = fallback
+        self._latencies = collections.deque(maxlen=history)
+        self._last_control = None
+
+        self.overruns = 0
+        self.skipped_steps = 0
+        self.list_traffic_events = []
+
+        self._worker = None
+        self._lock = threading.Lock()
+        self._request = threading.Event()
+        self._done = threading.Event()
+        self._busy = False
+        self._exception = None
+        self._stop = False
+
+    def __call__(self):
+        if self._budget is None or self._fallback == "wait":
+            start = time.time()
+            control = self._agent()
+            self._record(time.time() - start)
+            self._last_control = control
+            return control
+
+        return self._call_with_deadline()
+
+    def _call_with_deadline(self):
+        """
+        Request a step from the worker thread and wait at most for the budget
+        """
+        if self._worker is None:
+            self._worker = threading.Thread(target=self._run_worker)
+            self._worker.daemon = True
+            self._worker.start()
+
+        with self._lock:
+            if self._exception is not None:
+                exception, self._exception = self._exception, None
+                raise exception
+
+            if self._busy:
+                # The agent is still working on an earlier step
+                self.skipped_steps += 1
+                return self._fallback_control()
+
+            self._busy = True
+            self._done.clear()
+            self._request.set()
+
+        if self._done.wait(self._budget):
+            with self._lock:
+                if self._exception is not None:
+                    exception, self._exception = self._exception, None
+                    raise exception
+                return self._last_control
+
+        return self._fallback_control()
+
+    def _run_worker(self):
+        """
+        Worker thread executing the agent steps
+        """
+        while True:
+            self._request.wait()
+            self._request.clear()
+            if self._stop:
+                break
+
+            start = time.time()
+            try:
+                control = self._agent()
+            except Exception as exception:    # pylint: disable=broad-except
+                control = None
+                with self._lock:
+                    self._exception = exception
+            latency = time.time() - start
+
+            with self._lock:
+                if control is not None:
+                    self._last_control = control
+                self._record(latency)
+                self._busy = False
+                self._done.set()
+
+    def close(self):
+        """
+        Stop the worker thread. Waits for a running agent step to finish,
+        hence the agent can safely be destroyed afterwards.
+        """
+        if self._worker is not None:
+            self._stop = True
+            self._request.set()
+            self._worker.join()
+            self._worker = None
+
+    def _fallback_control(self):
+        if self._fallback == "last" and self._last_control is not None:
+            return self._last_control
+
+        control = carla.VehicleControl()
+        control.throttle = 0.0
+        control.steer = 0.0
+        control.brake = 1.0
+        control.manual_gear_shift = False
+        return control
+
+    def _record(self, latency):
+        """
+        Store the latency and create a traffic event for an overrun
+        """
+        self._latencies.append(latency)
+
+        if self._budget is not None and latency > self._budget:
+            self.overruns += 1
+            overrun_event = TrafficEvent(type=TrafficEventType.AGENT_STEP_OVERRUN)
+            overrun_event.set_message(
+                "Agent step took {:.3f}s, exceeding the budget of {:.3f}s at game time {:.2f}s".format(
+                    latency, self._budget, GameTime.get_time()))
+            overrun_event.set_dict({'latency': latency, 'budget': self._budget, 'game_time': GameTime.get_time()})
+            self.list_traffic_events.append(overrun_event)
+
+    def get_statistics(self):
+        """
+        Returns a dictionary with step count, latency percentiles (in seconds) and overruns
+        """
+        latencies = sorted(self._latencies)
+        statistics = {'steps': len(latencies), 'overruns': self.overruns, 'skipped_steps': self.skipped_steps}
+
+        for percentile in (50, 90, 99):
+            key = 'p{}'.format(percentile)
+            if latencies:
+                index = min(len(latencies) - 1, int(round(percentile / 100.0 * (len(latencies) - 1))))
+                statistics[key] = latencies[index]
+            else:
+                statistics[key] = 0.0
+        statistics['max'] = latencies[-1] if latencies else 0.0
+
+        return statistics
@@ -408,7 +408,7 @@ class AccelerateToVelocity(AtomicBehavior):
             self._control.throttle = 0
 
         self.logger.debug("%s.update()[%s->%s]" % (self.__class__.__name__, self.status, new_status))
-        self._actor.apply_control(self._control)
+        CarlaDataProvider.apply_control(self._actor, self._control)
 
         return new_status
 
@@ -450,7 +450,7 @@ class KeepVelocity(AtomicBehavior):
         else:
             self._control.throttle = 0.0
 
-        self._actor.apply_control(self._control)
+        CarlaDataProvider.apply_control(self._actor, self._control)
         self.logger.debug("%s.update()[%s->%s]" % (self.__class__.__name__, self.status, new_status))
         return new_status
 
@@ -460,7 +460,7 @@ class KeepVelocity(AtomicBehavior):
         to avoid further acceleration.
         """
         self._control.throttle = 0.0
-        self._actor.apply_control(self._control)
+        CarlaDataProvider.apply_control(self._actor, self._control)
         super(KeepVelocity, self).terminate(new_status)
 
 
@@ -571,7 +571,7 @@ class StopVehicle(AtomicBehavior):
             self._control.brake = 0
 
         self.logger.debug("%s.update()[%s->%s]" % (self.__class__.__name__, self.status, new_status))
-        self._actor.apply_control(self._control)
+        CarlaDataProvider.apply_control(self._actor, self._control)
 
         return new_status
 
@@ -672,7 +672,7 @@ class SyncArrival(AtomicBehavior):
             self._control.throttle = 0
             self._control.brake = min([abs(control_value), 1])
 
-        self._actor.apply_control(self._control)
+        CarlaDataProvider.apply_control(self._actor, self._control)
         self.logger.debug("%s.update()[%s->%s]" % (self.__class__.__name__, self.status, new_status))
         return new_status
 
@@ -683,7 +683,7 @@ class SyncArrival(AtomicBehavior):
         """
         self._control.throttle = 0.0
         self._control.brake = 0.0
-        self._actor.apply_control(self._control)
+        CarlaDataProvider.apply_control(self._actor, self._control)
         super(SyncArrival, self).terminate(new_status)
 
 
@@ -708,12 +708,12 @@ class SteerVehicle(AtomicBehavior):
         """
         Set steer to steer_value until reaching full stop
         """
-        self._control = self._actor.get_control()
+        self._control = CarlaDataProvider.get_control(self._actor)
         self._control.steer = self._steer_value
         new_status = py_trees.common.Status.SUCCESS
 
         self.logger.debug("%s.update()[%s->%s]" % (self.__class__.__name__, self.status, new_status))
-        self._actor.apply_control(self._control)
+        CarlaDataProvider.apply_control(self._actor, self._control)
 
         return new_status
 
@@ -750,14 +750,14 @@ class BasicAgentBehavior(AtomicBehavior):
             new_status = py_trees.common.Status.SUCCESS
 
         self.logger.debug("%s.update()[%s->%s]" % (self.__class__.__name__, self.status, new_status))
-        self._actor.apply_control(self._control)
+        CarlaDataProvider.apply_control(self._actor, self._control)
 
         return new_status
 
     def terminate(self, new_status):
         self._control.throttle = 0.0
         self._control.brake = 0.0
-        self._actor.apply_control(self._control)
+        CarlaDataProvider.apply_control(self._actor, self._control)
         super(BasicAgentBehavior, self).terminate(new_status)
 
 
@@ -13,17 +13,29 @@ scenario was completed successfully or failed.
 The atomic criteria are implemented with py_trees.
 """
 
-import weakref
 import math
 import numpy as np
 import py_trees
 import carla
 
 from srunner.scenariomanager.carla_data_provider import CarlaDataProvider
+from srunner.scenariomanager.sensor_hub import SensorHub
 from srunner.scenariomanager.timer import GameTime
 from srunner.scenariomanager.traffic_events import TrafficEvent, TrafficEventType
 
 
+def route_to_array(route):
+    """
+    Returns the x, y coordinates of the route waypoints as (N, 2) array
+
+    The route is either a list of (carla.Location, RoadOption) tuples
+    or a compiled route (structured array with x and y columns)
+    """
+    if isinstance(route, np.ndarray):
+        return np.column_stack((route['x'], route['y'])).astype(np.float64)
+    return np.array([(location.x, location.y) for location, _ in route], dtype=np.float64).reshape(-1, 2)
+
+
 class Criterion(py_trees.behaviour.Behaviour):
 
     """
@@ -248,10 +260,9 @@ class CollisionTest(Criterion):
         super(CollisionTest, self).__init__(name, actor, 0, None, optional, terminate_on_failure)
         self.logger.debug("%s.__init__()" % (self.__class__.__name__))
 
-        world = self.actor.get_world()
-        blueprint = world.get_blueprint_library().find('sensor.other.collision')
-        self._collision_sensor = world.spawn_actor(blueprint, carla.Transform(), attach_to=self.actor)
-        self._collision_sensor.listen(lambda event: self._count_collisions(weakref.ref(self), event))
+        # The collision sensor of the actor is shared with other criteria (see SensorHub)
+        SensorHub.subscribe(self.actor, 'sensor.other.collision', self, CollisionTest._count_collisions)
+        self._subscribed = True
 
     def update(self):
         """
@@ -275,9 +286,9 @@ class CollisionTest(Criterion):
         """
         Cleanup sensor
         """
-        if self._collision_sensor is not None:
-            self._collision_sensor.destroy()
-        self._collision_sensor = None
+        if self._subscribed:
+            SensorHub.unsubscribe(self.actor, 'sensor.other.collision', self)
+        self._subscribed = False
         super(CollisionTest, self).terminate(new_status)
 
     @staticmethod
@@ -319,10 +330,9 @@ class KeepLaneTest(Criterion):
         super(KeepLaneTest, self).__init__(name, actor, 0, None, optional)
         self.logger.debug("%s.__init__()" % (self.__class__.__name__))
 
-        world = self.actor.get_world()
-        blueprint = world.get_blueprint_library().find('sensor.other.lane_detector')
-        self._lane_sensor = world.spawn_actor(blueprint, carla.Transform(), attach_to=self.actor)
-        self._lane_sensor.listen(lambda event: self._count_lane_invasion(weakref.ref(self), event))
+        # The lane detector of the actor is shared with other criteria (see SensorHub)
+        SensorHub.subscribe(self.actor, 'sensor.other.lane_detector', self, KeepLaneTest._count_lane_invasion)
+        self._subscribed = True
 
     def update(self):
         """
@@ -346,9 +356,9 @@ class KeepLaneTest(Criterion):
         """
         Cleanup sensor
         """
-        if self._lane_sensor is not None:
-            self._lane_sensor.destroy()
-        self._lane_sensor = None
+        if self._subscribed:
+            SensorHub.unsubscribe(self.actor, 'sensor.other.lane_detector', self)
+        self._subscribed = False
         super(KeepLaneTest, self).terminate(new_status)
 
     @staticmethod
@@ -429,9 +439,9 @@ class WrongLaneTest(Criterion):
         self._last_lane_id = None
         self._last_road_id = None
 
-        blueprint = self._world.get_blueprint_library().find('sensor.other.lane_detector')
-        self._lane_sensor = self._world.spawn_actor(blueprint, carla.Transform(), attach_to=self.actor)
-        self._lane_sensor.listen(lambda event: self._lane_change(weakref.ref(self), event))
+        # The lane detector of the actor is shared with other criteria (see SensorHub)
+        SensorHub.subscribe(self.actor, 'sensor.other.lane_detector', self, WrongLaneTest._lane_change)
+        self._subscribed = True
 
     def update(self):
         """
@@ -450,9 +460,9 @@ class WrongLaneTest(Criterion):
         """
         Cleanup sensor
         """
-        if self._lane_sensor is not None:
-            self._lane_sensor.destroy()
-        self._lane_sensor = None
+        if self._subscribed:
+            SensorHub.unsubscribe(self.actor, 'sensor.other.lane_detector', self)
+        self._subscribed = False
         super(WrongLaneTest, self).terminate(new_status)
 
     @staticmethod
@@ -557,7 +567,7 @@ class InRouteTest(Criterion):
             self._offroad_max = offroad_max
 
             self._counter_off_route = 0
-            self._waypoints, _ = zip(*self._route)
+            self._route_xy = route_to_array(self._route)
 
         def update(self):
             """
@@ -574,12 +584,8 @@ class InRouteTest(Criterion):
 
             elif self.test_status == "RUNNING" or self.test_status == "INIT":
                 # are we too far away from the route waypoints (i.e., off route)?
-                off_route = True
-                for waypoint in self._waypoints:
-                    distance = math.sqrt(((location.x - waypoint.x) ** 2) + ((location.y - waypoint.y) ** 2))
-                    if distance < self._radius:
-                        off_route = False
-                        break
+                squared_distances = (self._route_xy[:, 0] - location.x) ** 2 + (self._route_xy[:, 1] - location.y) ** 2
+                off_route = not np.any(squared_distances < self._radius ** 2)
                 if off_route:
                     self._counter_off_route += 1
 
@@ -613,7 +619,7 @@ class RouteCompletionTest(Criterion):
 
         self._current_index = 0
         self._route_length = len(self._route)
-        self._waypoints, _ = zip(*self._route)
+        self._route_xy = route_to_array(self._route)
 
         self._traffic_event = TrafficEvent(type=TrafficEventType.ROUTE_COMPLETION)
         self.list_traffic_events.append(self._traffic_event)
@@ -633,15 +639,10 @@ class RouteCompletionTest(Criterion):
             new_status = py_trees.common.Status.FAILURE
 
         elif self.test_status == "RUNNING" or self.test_status == "INIT":
-            best_distance = float("inf")
-            best_index = self._current_index
-            for index in range(self._current_index, self._route_length):
-                ref_waypoint = self._waypoints[index]
-                distance = math.sqrt(((location.x - ref_waypoint.x) ** 2) + ((location.y - ref_waypoint.y) ** 2))
-                if distance < best_distance:
-                    best_distance = distance
-                    best_index = index
-            self._current_index = best_index
+            # closest waypoint not behind the current one (the first one, if several are equally close)
+            remaining = self._route_xy[self._current_index:]
+            squared_distances = (remaining[:, 0] - location.x) ** 2 + (remaining[:, 1] - location.y) ** 2
+            self._current_index += int(np.argmin(squared_distances))
             self._percentage_route_completed = 100.0*float(self._current_index) / float(self._route_length)
             self._traffic_event.set_dict({'route_completed': self._percentage_route_completed})
             self._traffic_event.set_message("Agent has completed > {:.2f}% of the route".format(self._percentage_route_completed))
@@ -0,0 +1,96 @@
+#!/usr/bin/env python
+
+#
+# This work is licensed under the terms of the MIT license.
+# For a copy, see <https://opensource.org/licenses/MIT>.
+
+"""
+This module provides an index of a py_trees behavior tree, which is built
+once and used instead of walking the tree again and again.
+
+The index holds the nodes in depth-first (pre-)order, the leaves, the
+criteria (nodes with traffic events) and the parent of every node. As the
+nodes of a subtree are stored consecutively, the nodes of any subtree can be
+retrieved without walking it.
+
+The scenario trees are not changed after their construction. If a tree is
+changed, a new index has to be built.
+"""
+
+
+class BehaviorTreeIndex(object):
+
+    """
+    Flattened view of a behavior tree
+
+    Usage:
+    index = BehaviorTreeIndex(scenario_tree, criteria_tree)
+    for leaf in index.leaves:
+        leaf.terminate(py_trees.common.Status.INVALID)
+    """
+
+    def __init__(self, root, criteria_root=None):
+        self.root = root
+        self.nodes = []
+        self.leaves = []
+        self._parents = dict()
+        self._subtree_ends = dict()
+        self._positions = dict()
+        self._nodes_by_name = dict()
+
+        # Iterative depth-first traversal, hence deep trees do not hit the recursion limit.
+        # A node is pushed a second time (with done=True) to record the end of its subtree.
+        stack = [(root, False)]
+        while stack:
+            node, done = stack.pop()
+            if done:
+                self._subtree_ends[node] = len(self.nodes)
+                continue
+
+            self._positions[node] = len(self.nodes)
+            self.nodes.append(node)
+            self._nodes_by_name.setdefault(node.name, []).append(node)
+
+            stack.append((node, True))
+            if node.children:
+                for child in reversed(node.children):
+                    self._parents[child] = node
+                    stack.append((child, False))
+            else:
+                self.leaves.append(node)
+
+        criteria_root = criteria_root if criteria_root is not None else root
+        self.criteria = [node for node in self.get_subtree(criteria_root) if hasattr(node, 'list_traffic_events')]
+
+    def __len__(self):
+        return len(self.nodes)
+
+    def __contains__(self, node):
+        return node in self._positions
+
+    def get_parent(self, node):
+        """
+        Returns the parent of the node (None for the root)
+        """
+        return self._parents.get(node)
+
+    def get_path(self, node):
+        """
+        Returns the list of nodes from the root to the node
+        """
+        path = [node]
+        while path[-1] in self._parents:
+            path.append(self._parents[path[-1]])
+        return list(reversed(path))
+
+    def get_subtree(self, node):
+        """
+        Returns all nodes of the subtree of node (incl. node) in depth-first order
+        """
+        return self.nodes[self._positions[node]:self._subtree_ends[node]]
+
+    def find(self, name):
+        """
+        Returns all nodes with the given name
+        """
+        return list(self._nodes_by_name.get(name, []))
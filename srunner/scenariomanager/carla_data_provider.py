@@ -12,17 +12,39 @@ local buffers to avoid blocking calls to CARLA
 """
 
 import math
+import threading
+
+import carla
+
+
+def has_batch_commands():
+    """
+    Returns True, if the CARLA PythonAPI supports command batches (carla.command, since CARLA 0.9.5)
+    """
+    return hasattr(carla, 'command')
 
 
 def calculate_velocity(actor):
     """
     Method to calculate the velocity of a actor
     """
-    velocity_squared = actor.get_velocity().x**2
-    velocity_squared += actor.get_velocity().y**2
+    velocity = actor.get_velocity()
+    velocity_squared = velocity.x**2
+    velocity_squared += velocity.y**2
     return math.sqrt(velocity_squared)
 
 
+def copy_control(control):
+    """
+    Method to copy a carla.VehicleControl or carla.WalkerControl
+    """
+    if isinstance(control, carla.WalkerControl):
+        return carla.WalkerControl(control.direction, control.speed, control.jump)
+    return carla.VehicleControl(throttle=control.throttle, steer=control.steer, brake=control.brake,
+                                hand_brake=control.hand_brake, reverse=control.reverse,
+                                manual_gear_shift=control.manual_gear_shift, gear=control.gear)
+
+
 class CarlaDataProvider(object):
 
     """
@@ -32,14 +54,20 @@ class CarlaDataProvider(object):
     Currently available data:
     - Absolute velocity
     - Location
+    - Transform
+
+    In addition, it buffers the controls of the actors: behaviors set the
+    control of an actor via apply_control() and the ScenarioManager applies
+    all controls of a tick with one command batch (see flush_controls()).
 
     Potential additions:
     - Acceleration
-    - Transform
     """
 
     _actor_velocity_map = dict()
     _actor_location_map = dict()
+    _actor_transform_map = dict()
+    _actor_control_map = dict()
 
     @staticmethod
     def register_actor(actor):
@@ -59,6 +87,8 @@ class CarlaDataProvider(object):
         else:
             CarlaDataProvider._actor_location_map[actor] = None
 
+        CarlaDataProvider._actor_transform_map[actor] = None
+
     @staticmethod
     def register_actors(actors):
         """
@@ -78,7 +108,9 @@ class CarlaDataProvider(object):
 
         for actor in CarlaDataProvider._actor_location_map:
             if actor is not None and actor.is_alive:
-                CarlaDataProvider._actor_location_map[actor] = actor.get_location()
+                transform = actor.get_transform()
+                CarlaDataProvider._actor_transform_map[actor] = transform
+                CarlaDataProvider._actor_location_map[actor] = transform.location
 
     @staticmethod
     def get_velocity(actor):
@@ -104,6 +136,62 @@ class CarlaDataProvider(object):
         else:
             return CarlaDataProvider._actor_location_map[actor]
 
+    @staticmethod
+    def get_transform(actor):
+        """
+        returns the transform for the given actor
+        """
+        if actor not in CarlaDataProvider._actor_transform_map.keys():
+            # We are initentionally not throwing here
+            # This may cause exception loops in py_trees
+            return None
+        else:
+            return CarlaDataProvider._actor_transform_map[actor]
+
+    @staticmethod
+    def apply_control(actor, control):
+        """
+        Buffer the control for the given actor until the next flush_controls()
+        A later control for the same actor replaces an earlier one
+        """
+        CarlaDataProvider._actor_control_map[actor] = copy_control(control)
+
+    @staticmethod
+    def get_control(actor):
+        """
+        returns (a copy of) the buffered control for the given actor,
+        or its current control, if there is none
+        """
+        if actor in CarlaDataProvider._actor_control_map:
+            return copy_control(CarlaDataProvider._actor_control_map[actor])
+        return actor.get_control()
+
+    @staticmethod
+    def flush_controls(client=None):
+        """
+        Apply all buffered controls, as one command batch if a client is given
+        and command batches are supported (CARLA 0.9.5)
+        """
+        controls = [(actor, control) for actor, control in CarlaDataProvider._actor_control_map.items()
+                    if actor is not None and actor.is_alive]
+        CarlaDataProvider._actor_control_map.clear()
+
+        if client is None or not has_batch_commands():
+            for actor, control in controls:
+                actor.apply_control(control)
+        elif controls:
+            client.apply_batch([carla.command.ApplyWalkerControl(actor, control)
+                                if isinstance(control, carla.WalkerControl)
+                                else carla.command.ApplyVehicleControl(actor, control)
+                                for actor, control in controls])
+
+    @staticmethod
+    def get_registered_actors():
+        """
+        returns a list of all registered actors
+        """
+        return list(CarlaDataProvider._actor_velocity_map.keys())
+
     @staticmethod
     def cleanup():
         """
@@ -111,3 +199,93 @@ class CarlaDataProvider(object):
         """
         CarlaDataProvider._actor_velocity_map.clear()
         CarlaDataProvider._actor_location_map.clear()
+        CarlaDataProvider._actor_transform_map.clear()
+        CarlaDataProvider._actor_control_map.clear()
+
+
+class CarlaBlueprintCache(object):
+
+    """
+    This class provides the blueprint library of a CARLA world and memoizes
+    the results of filter() and find() by pattern, so that the setup of
+    actors, sensors and criteria needs at most one get_blueprint_library()
+    call per world.
+
+    Only the entries of one world are kept: a new world (e.g. after
+    client.load_world()) replaces them. Worlds are identified by their id,
+    or by the world object for CARLA versions without World.id. The cache
+    is thread-safe and shared by the scenario runner, the challenge
+    evaluator and the criteria.
+    The library returns copies of its blueprints, hence callers may modify
+    the returned blueprints (e.g. set_attribute()) without affecting others.
+
+    Usage:
+    blueprint = random.choice(CarlaBlueprintCache.filter(world, 'vehicle.*'))
+    blueprint = CarlaBlueprintCache.find(world, 'sensor.other.collision')
+    """
+
+    _lock = threading.Lock()
+    _world = None
+    _library_map = {}
+    _filter_map = {}
+    _find_map = {}
+
+    @staticmethod
+    def _get_library(world):
+        """
+        Returns the blueprint library of the world. Must be called with the lock held.
+        """
+        # the world is kept, hence the id() of the object cannot be reused by another world
+        world_key = ('id', world.id) if hasattr(world, 'id') else ('object', id(world))
+        if world_key not in CarlaBlueprintCache._library_map:
+            CarlaBlueprintCache._library_map.clear()
+            CarlaBlueprintCache._filter_map.clear()
+            CarlaBlueprintCache._find_map.clear()
+            CarlaBlueprintCache._library_map[world_key] = world.get_blueprint_library()
+            CarlaBlueprintCache._world = world
+        return CarlaBlueprintCache._library_map[world_key]
+
+    @staticmethod
+    def get_blueprint_library(world):
+        """
+        returns the (cached) blueprint library of the world
+        """
+        with CarlaBlueprintCache._lock:
+            return CarlaBlueprintCache._get_library(world)
+
+    @staticmethod
+    def filter(world, pattern):
+        """
+        returns the blueprints matching the pattern (wildcards allowed), see BlueprintLibrary.filter()
+        """
+        with CarlaBlueprintCache._lock:
+            library = CarlaBlueprintCache._get_library(world)
+            if pattern not in CarlaBlueprintCache._filter_map:
+                CarlaBlueprintCache._filter_map[pattern] = library.filter(pattern)
+            return CarlaBlueprintCache._filter_map[pattern]
+
+    @staticmethod
+    def find(world, blueprint_id):
+        """
+        returns a copy of the blueprint with the given id, see BlueprintLibrary.find()
+        Raises IndexError, if there is no such blueprint
+        """
+        with CarlaBlueprintCache._lock:
+            library = CarlaBlueprintCache._get_library(world)
+            if blueprint_id not in CarlaBlueprintCache._find_map:
+                # find() raises, if the blueprint does not exist
+                library.find(blueprint_id)
+                CarlaBlueprintCache._find_map[blueprint_id] = [blueprint.id for blueprint in library].index(
+                    blueprint_id)
+            return library[CarlaBlueprintCache._find_map[blueprint_id]]
+
+    @staticmethod
+    def cleanup():
+        """
+        Remove the cached library and all memoized results
+        """
+        with CarlaBlueprintCache._lock:
+            CarlaBlueprintCache._world = None
+            CarlaBlueprintCache._library_map.clear()
+            CarlaBlueprintCache._filter_map.clear()
+            CarlaBlueprintCache._find_map.clear()
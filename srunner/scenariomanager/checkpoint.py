@@ -0,0 +1,109 @@
+#!/usr/bin/env python
+
+#
+# This work is licensed under the terms of the MIT license.
+# For a copy, see <https://opensource.org/licenses/MIT>.
+
+"""
+This module provides a checkpoint journal for batches of scenarios.
+
+Every finished scenario execution, identified by configuration name,
+repetition and seed, is appended as one JSON line together with its result.
+Each record is synced to disk before the next scenario starts, hence after a
+crash the journal contains all finished executions. When a batch is resumed,
+finished executions are skipped and their results are taken from the journal.
+A journal with records is only started anew, if overwrite is requested.
+"""
+
+import json
+import os
+
+from srunner.scenariomanager.result_sink import read_results
+
+
+class CheckpointJournal(object):
+
+    """
+    Append-only journal of finished scenario executions
+
+    Usage:
+    journal = CheckpointJournal("batch.journal", resume=True)
+    if not journal.is_finished(config.name, repetition, seed):
+        ...
+        journal.add(config.name, repetition, seed, result, score=score)
+    """
+
+    def __init__(self, path, resume=False, overwrite=False):
+        if not resume and not overwrite and self.has_records(path):
+            raise ValueError("The checkpoint journal {} is not empty, resume or overwrite it".format(path))
+
+        directory = os.path.dirname(path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+
+        self.path = path
+        self.records = []
+        self._finished = {}
+
+        if resume and os.path.exists(path):
+            for record in read_results(path):
+                self._add_record(record)
+            self._truncate_incomplete_line()
+            self._file = open(path, 'a')
+        else:
+            self._file = open(path, 'w')
+
+    @staticmethod
+    def has_records(path):
+        """
+        Returns True, if the journal file exists and is not empty
+        """
+        return os.path.isfile(path) and os.path.getsize(path) > 0
+
+    @staticmethod
+    def _key(config_name, repetition, seed):
+        return (config_name, repetition, seed)
+
+    def _add_record(self, record):
+        self.records.append(record)
+        self._finished[self._key(record['config'], record['repetition'], record['seed'])] = record
+
+    def _truncate_incomplete_line(self):
+        """
+        Remove an incomplete last record (e.g. if the process was killed while writing it)
+        """
+        with open(self.path, 'rb+') as journal_file:
+            data = journal_file.read()
+            if data and not data.endswith(b"\n"):
+                journal_file.truncate(data.rfind(b"\n") + 1)
+
+    def is_finished(self, config_name, repetition, seed=None):
+        """
+        Returns True, if the execution is already in the journal
+        """
+        return self._key(config_name, repetition, seed) in self._finished
+
+    def get(self, config_name, repetition, seed=None):
+        """
+        Returns the record of the execution or None
+        """
+        return self._finished.get(self._key(config_name, repetition, seed))
+
+    def add(self, config_name, repetition, seed, result, **values):
+        """
+        Append a finished execution with its result and further (JSON serializable) values
+        """
+        record = dict(values)
+        record.update({'config': config_name, 'repetition': repetition, 'seed': seed, 'result': result})
+        self._file.write(json.dumps(record, sort_keys=True) + "\n")
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._add_record(record)
+
+    def close(self):
+        """
+        Close the journal file
+        """
+        if self._file is not None:
+            self._file.close()
+            self._file = None
@@ -0,0 +1,311 @@
+#!/usr/bin/env python
+
+#
+# This work is licensed under the terms of the MIT license.
+# For a copy, see <https://opensource.org/licenses/MIT>.
+
+"""
+This module re-evaluates the route criteria of atomic_scenario_criteria.py
+on recorded trajectories (see TrajectoryRecorder), without a simulator.
+
+The distances between the ego vehicle and the route / traffic lights are
+computed with numpy for the whole time series at once. Only the small state
+machines of RouteCompletionTest and RunningRedLightTest iterate over the
+ticks, using precomputed lookup tables.
+
+Collisions and wrong way infractions depend on sensor data and the map, hence
+the recorded traffic events are reused for these criteria, as well as the
+agent step overruns.
+"""
+
+from __future__ import print_function
+import argparse
+import json
+
+import numpy as np
+
+from srunner.scenariomanager.scoring import ScoringEngine, get_penalty_table
+from srunner.scenariomanager.trajectory_recorder import load_trajectory
+from srunner.scenariomanager.traffic_events import TrafficEvent, TrafficEventType
+
+
+SCORING_ENGINE = ScoringEngine()
+
+COLLISION_EVENTS = [TrafficEventType.COLLISION_STATIC,
+                    TrafficEventType.COLLISION_VEHICLE,
+                    TrafficEventType.COLLISION_PEDESTRIAN]
+
+
+def _pairwise_distances(points, references, chunk_size=4096):
+    """
+    Generator over chunks (start index, distance matrix) between the
+    points (N x D) and the references (M x D)
+    """
+    for start in range(0, points.shape[0], chunk_size):
+        chunk = points[start:start + chunk_size]
+        differences = chunk[:, np.newaxis, :] - references[np.newaxis, :, :]
+        yield start, np.sqrt(np.einsum('ijk,ijk->ij', differences, differences))
+
+
+def _suffix_argmin(distances):
+    """
+    For every row and column k returns the first index j >= k with the
+    minimum distance within distances[row, k:]
+    """
+    width = distances.shape[1]
+    reversed_distances = distances[:, ::-1]
+    prefix_min = np.minimum.accumulate(reversed_distances, axis=1)
+    previous_min = np.concatenate([np.full((distances.shape[0], 1), np.inf), prefix_min[:, :-1]], axis=1)
+    positions = np.where(reversed_distances <= previous_min, np.arange(width), 0)
+    last_min = np.maximum.accumulate(positions, axis=1)
+    return (width - 1 - last_min)[:, ::-1]
+
+
+def get_ego_track(recording):
+    """
+    Returns frames and the N x 3 locations of the ego vehicle, sorted by frame
+    """
+    if 'ego_id' not in recording['static']:
+        raise ValueError("Recording of scenario '{}' has no ego vehicle, "
+                         "its criteria cannot be re-evaluated".format(recording['scenario']))
+
+    actors = recording['actors']
+    mask = actors['actor_id'] == recording['static']['ego_id']
+    frames = np.asarray(actors['frame'][mask])
+    order = np.argsort(frames, kind='stable')
+    locations = np.stack([actors['x'][mask], actors['y'][mask], actors['z'][mask]], axis=1).astype(np.float64)
+    return frames[order], locations[order]
+
+
+def evaluate_collisions(recording, end_frame=None):
+    """
+    CollisionTest equivalent: collision events up to end_frame
+    """
+    events = []
+    for event in recording['events']:
+        event_type = TrafficEventType[event['type']]
+        if event_type in COLLISION_EVENTS and (end_frame is None or event['frame'] <= end_frame):
+            events.append((event['frame'], TrafficEvent(event_type, event['message'], event['dict'])))
+    return events
+
+
+def evaluate_in_route(frames, locations, route, radius, offroad_max):
+    """
+    InRouteTest equivalent. Returns the frame of the route deviation (or None)
+    and the corresponding traffic events.
+    """
+    off_route = np.ones(frames.shape[0], dtype=bool)
+    for start, distances in _pairwise_distances(locations[:, :2], np.asarray(route)[:, :2]):
+        off_route[start:start + distances.shape[0]] = ~np.any(distances < radius, axis=1)
+
+    deviations = np.nonzero(np.cumsum(off_route) > offroad_max)[0]
+    if deviations.shape[0] == 0:
+        return None, []
+
+    index = deviations[0]
+    x, y, z = locations[index]
+    event = TrafficEvent(type=TrafficEventType.ROUTE_DEVIATION,
+                         message="Agent deviated from the route at (x={}, y={}, z={})".format(x, y, z),
+                         dict={'x': x, 'y': y, 'z': z})
+    return int(frames[index]), [(int(frames[index]), event)]
+
+
+def evaluate_in_radius_region(frames, locations, target, radius):
+    """
+    InRadiusRegionTest equivalent. Returns the frame the target was reached (or None)
+    and the corresponding traffic events.
+    """
+    distances = np.hypot(locations[:, 0] - target[0], locations[:, 1] - target[1])
+    reached = np.nonzero(distances < radius)[0]
+    if reached.shape[0] == 0:
+        return None, []
+
+    frame = int(frames[reached[0]])
+    event = TrafficEvent(type=TrafficEventType.ROUTE_COMPLETED, message="Destination was successfully reached")
+    return frame, [(frame, event)]
+
+
+def evaluate_route_completion(locations, route):
+    """
+    RouteCompletionTest equivalent. Returns the route completion in percent for every tick.
+    """
+    route_length = route.shape[0]
+    indices = np.zeros(locations.shape[0], dtype=np.int64)
+
+    current_index = 0
+    for start, distances in _pairwise_distances(locations[:, :2], np.asarray(route)[:, :2], chunk_size=512):
+        best_indices = _suffix_argmin(distances)
+        for row in range(distances.shape[0]):
+            current_index = best_indices[row, current_index]
+            indices[start + row] = current_index
+
+    return 100.0 * indices / float(route_length)
+
+
+def _traffic_light_states(recording, frames, light_ids):
+    """
+    Returns a (ticks x traffic lights) matrix with the recorded states
+    """
+    table = recording['traffic_lights']
+    states = np.full((frames.shape[0], len(light_ids)), -1, dtype=np.int16)
+    for column, light_id in enumerate(light_ids):
+        mask = table['actor_id'] == light_id
+        light_frames = np.asarray(table['frame'][mask])
+        light_states = np.asarray(table['state'][mask])
+        order = np.argsort(light_frames, kind='stable')
+        light_frames = light_frames[order]
+        positions = np.clip(np.searchsorted(light_frames, frames), 0, max(light_frames.shape[0] - 1, 0))
+        if light_frames.shape[0] > 0:
+            matching = light_frames[positions] == frames
+            states[matching, column] = light_states[order][positions[matching]]
+    return states
+
+
+def evaluate_red_lights(recording, frames, locations):
+    """
+    RunningRedLightTest equivalent. Returns the list of traffic light infractions.
+    """
+    static = recording['static']
+    if not static.get('trigger_volumes') or frames.shape[0] == 0:
+        return []
+
+    light_ids = [int(light_id) for light_id in static['trigger_volumes']]
+    volumes = np.array([static['trigger_volumes'][str(light_id)] for light_id in light_ids], dtype=np.float64)
+    affected_distance = volumes[:, 3] + static.get('ego_extent_length', 0.0)
+
+    red = _traffic_light_states(recording, frames, light_ids) == static['red_light_state']
+    inside = np.zeros(red.shape, dtype=bool)
+    for start, distances in _pairwise_distances(locations, volumes[:, :3]):
+        inside[start:start + distances.shape[0]] = distances <= affected_distance
+
+    candidates = inside & red
+    first_candidate = np.where(np.any(candidates, axis=1), np.argmax(candidates, axis=1), -1)
+
+    events = []
+    target = -1
+    for tick in range(frames.shape[0]):
+        if target >= 0:
+            if not red[tick, target]:
+                target = -1
+            elif not inside[tick, target]:
+                x, y, z = locations[tick]
+                event = TrafficEvent(type=TrafficEventType.TRAFFIC_LIGHT_INFRACTION,
+                                     message="Agent ran a red light {} at (x={}, y={}, x={})".format(
+                                         light_ids[target], x, y, z),
+                                     dict={'id': light_ids[target], 'x': x, 'y': y, 'z': z})
+                events.append((int(frames[tick]), event))
+                target = -1
+
+        if first_candidate[tick] >= 0:
+            target = first_candidate[tick]
+
+    return events
+
+
+def evaluate_recording(recording, route_radius=30.0, offroad_max=20, target_radius=10.0):
+    """
+    Re-evaluate the criteria of a ChallengeBasic scenario on a recording.
+    The default parameters match the ChallengeBasic criteria.
+
+    Returns a dictionary with the per criterion results and the list of
+    (frame, TrafficEvent) tuples, sorted by frame.
+    """
+    frames, locations = get_ego_track(recording)
+    route = recording['route']
+    events = []
+    results = {}
+
+    # criteria terminating the scenario
+    end_frames = []
+    collision_events = evaluate_collisions(recording)
+    if collision_events:
+        end_frames.append(collision_events[0][0])
+
+    if route is not None and frames.shape[0] > 0:
+        deviation_frame, deviation_events = evaluate_in_route(frames, locations, route, route_radius, offroad_max)
+        if deviation_frame is not None:
+            end_frames.append(deviation_frame)
+        events.extend(deviation_events)
+        results['InRouteTest'] = 'FAILURE' if deviation_frame is not None else 'SUCCESS'
+
+    if 'target' in recording['static'] and frames.shape[0] > 0:
+        target_frame, target_events = evaluate_in_radius_region(frames, locations,
+                                                                recording['static']['target'], target_radius)
+        if target_frame is not None:
+            end_frames.append(target_frame)
+        events.extend(target_events)
+        results['InRadiusRegionTest'] = 'SUCCESS' if target_frame is not None else 'RUNNING'
+
+    end_frame = min(end_frames) if end_frames else None
+    if end_frame is not None:
+        keep = frames <= end_frame
+        frames, locations = frames[keep], locations[keep]
+        events = [(frame, event) for frame, event in events if frame <= end_frame]
+
+    collision_events = evaluate_collisions(recording, end_frame)
+    events.extend(collision_events)
+    results['CollisionTest'] = 'FAILURE' if collision_events else 'SUCCESS'
+
+    if route is not None and frames.shape[0] > 0:
+        completion = evaluate_route_completion(locations, route)
+        event = TrafficEvent(type=TrafficEventType.ROUTE_COMPLETION)
+        event.set_dict({'route_completed': float(completion[-1])})
+        event.set_message("Agent has completed > {:.2f}% of the route".format(completion[-1]))
+        events.append((int(frames[-1]), event))
+        results['RouteCompletionTest'] = float(completion[-1])
+
+    red_light_events = evaluate_red_lights(recording, frames, locations)
+    events.extend(red_light_events)
+    results['RunningRedLightTest'] = 'FAILURE' if red_light_events else 'SUCCESS'
+
+    # events which cannot be re-evaluated without the simulator
+    for event in recording['events']:
+        if event['type'] in (TrafficEventType.WRONG_WAY_INFRACTION.name, TrafficEventType.AGENT_STEP_OVERRUN.name):
+            if end_frame is None or event['frame'] <= end_frame:
+                events.append((event['frame'], TrafficEvent(TrafficEventType[event['type']],
+                                                            event['message'], event['dict'])))
+
+    events.sort(key=lambda item: item[0])
+    return {'scenario': recording['scenario'], 'end_frame': end_frame, 'criteria': results, 'traffic_events': events}
+
+
+def score_traffic_events(traffic_events, penalties=None):
+    """
+    Challenge score (route score minus penalties) of a list of (frame, TrafficEvent)
+    The penalties (event type -> penalty) default to the PENALTY_TABLE of scoring.py.
+    """
+    engine = SCORING_ENGINE if penalties is None else ScoringEngine(get_penalty_table(penalties))
+    return engine.score_run(traffic_events)
+
+
+def evaluate_recordings(paths, score_function=score_traffic_events, **criteria_parameters):
+    """
+    Evaluate and score a batch of recordings. Yields (path, result, score).
+    """
+    for path in paths:
+        result = evaluate_recording(load_trajectory(path), **criteria_parameters)
+        yield path, result, score_function(result['traffic_events'])
+
+
+if __name__ == '__main__':
+
+    DESCRIPTION = "Re-evaluate the route criteria on recorded trajectories (see --record-trajectory)"
+
+    PARSER = argparse.ArgumentParser(description=DESCRIPTION)
+    PARSER.add_argument('recordings', nargs='+', help='Recording directories')
+    PARSER.add_argument('--route-radius', type=float, default=30.0, help='Radius of the InRouteTest')
+    PARSER.add_argument('--offroad-max', type=int, default=20, help='Allowed off route ticks of the InRouteTest')
+    PARSER.add_argument('--target-radius', type=float, default=10.0, help='Radius of the InRadiusRegionTest')
+    ARGUMENTS = PARSER.parse_args()
+
+    for recording_path, evaluation, score in evaluate_recordings(ARGUMENTS.recordings,
+                                                                 route_radius=ARGUMENTS.route_radius,
+                                                                 offroad_max=ARGUMENTS.offroad_max,
+                                                                 target_radius=ARGUMENTS.target_radius):
+        print(json.dumps({'recording': recording_path,
+                          'scenario': evaluation['scenario'],
+                          'score': score,
+                          'criteria': evaluation['criteria'],
+                          'traffic_events': [{'frame': frame, 'type': event.get_type().name,
+                                              'message': event.get_message()}
+                                             for frame, event in evaluation['traffic_events']]}))
@@ -0,0 +1,223 @@
+#!/usr/bin/env python
+
+#
+# This work is licensed under the terms of the MIT license.
+# For a copy, see <https://opensource.org/licenses/MIT>.
+
+"""
+This module provides a content-addressed cache for scenario results.
+
+The key of a scenario execution is the hash of everything it depends on:
+- the <scenario> element of the configuration
+- the source of the scenario module and of all srunner modules it imports
+  (transitively, e.g. basic_scenario.py), of the scenario manager package
+  (srunner/scenariomanager), i.e. the behaviors and criteria, and of the
+  challenge package (srunner/challenge)
+- the agent file and its configuration (if any)
+- the seed, the runner version and further options (e.g. randomize)
+
+If a result with the same key exists, the simulation can be skipped. The
+results are stored as JSON files in SCENARIO_RUNNER_CACHE/results.
+"""
+
+import ast
+import glob
+import hashlib
+import json
+import os
+import tempfile
+
+from srunner.scenariomanager.result_sink import get_scenario_record, json_default
+from srunner.scenarios.scenario_catalog import file_hash, get_cache_directory, get_scenario_catalog
+from srunner.scenarios.scenario_registry import get_scenario_registry
+
+
+def get_scenario_config_hash(config_name):
+    """
+    SHA1 of the <scenario> element of the configuration
+    (None, if it is not in the catalog or the name is defined more than once)
+    """
+    catalog = get_scenario_catalog()
+    entries = catalog.get_all(config_name)
+    if len(entries) != 1:
+        return None
+    return hashlib.sha1(catalog.read_scenario(entries[0])).hexdigest()
+
+
+SRUNNER_DIRECTORY = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+_SOURCE_HASHES = {}
+
+
+def _get_srunner_module_files(module_name):
+    """
+    Source files of an srunner module and of its parent packages
+    """
+    parts = module_name.split('.')
+    files = []
+    for length in range(1, len(parts) + 1):
+        path = os.path.join(os.path.dirname(SRUNNER_DIRECTORY), *parts[:length])
+        for file_name in (path + ".py", os.path.join(path, "__init__.py")):
+            if os.path.isfile(file_name):
+                files.append(file_name)
+    return files
+
+
+def get_srunner_imports(file_name):
+    """
+    Source files of the given file and of all srunner modules it imports,
+    transitively (incl. imports within functions)
+    """
+    files = set()
+    pending = [os.path.abspath(file_name)]
+    while pending:
+        current = pending.pop()
+        if current in files:
+            continue
+        files.add(current)
+
+        with open(current, 'rb') as source_file:
+            tree = ast.parse(source_file.read(), current)
+        for node in ast.walk(tree):
+            module_names = []
+            if isinstance(node, ast.Import):
+                module_names = [alias.name for alias in node.names]
+            elif isinstance(node, ast.ImportFrom) and node.level == 0 and node.module:
+                module_names = [node.module] + [node.module + "." + alias.name for alias in node.names]
+            for module_name in module_names:
+                if module_name.split('.')[0] == 'srunner':
+                    pending.extend(_get_srunner_module_files(module_name))
+
+    return files
+
+
+def get_scenario_source_hash(scenario_class):
+    """
+    SHA1 of the source of the scenario module, the srunner modules it imports,
+    srunner/scenariomanager and srunner/challenge
+    (None, if the scenario class is not registered)
+    """
+    module = get_scenario_registry().get_scenario_module(scenario_class)
+    if module is None:
+        return None
+
+    if module not in _SOURCE_HASHES:
+        file_names = get_srunner_imports(get_scenario_registry().get_module_file(module))
+        file_names.update(glob.glob(os.path.join(SRUNNER_DIRECTORY, "scenariomanager", "*.py")))
+        # os.walk instead of glob(recursive=True), which is not available on Python 2.7
+        for directory, _, directory_files in os.walk(os.path.join(SRUNNER_DIRECTORY, "challenge")):
+            file_names.update(os.path.join(directory, file_name) for file_name in directory_files
+                              if file_name.endswith(".py"))
+        sha1 = hashlib.sha1()
+        for file_name in sorted(os.path.abspath(file_name) for file_name in file_names):
+            sha1.update(file_hash(file_name).encode('utf-8'))
+        _SOURCE_HASHES[module] = sha1.hexdigest()
+
+    return _SOURCE_HASHES[module]
+
+
+def get_files_hash(file_names):
+    """
+    SHA1 of the content of the given files (missing files and empty names are ignored)
+    """
+    sha1 = hashlib.sha1()
+    for file_name in file_names:
+        if file_name and os.path.isfile(file_name):
+            sha1.update(file_hash(file_name).encode('utf-8'))
+    return sha1.hexdigest()
+
+
+class ResultCache(object):
+
+    """
+    Content-addressed store of scenario results
+
+    Usage:
+    cache = ResultCache()
+    key = cache.get_run_key(config.name, config.type, seed, VERSION)
+    record = cache.get(key)
+    if record is None:
+        ...
+        cache.put(key, record)
+    """
+
+    def __init__(self, cache_directory=None):
+        cache_directory = cache_directory if cache_directory is not None else get_cache_directory()
+        self.directory = os.path.join(cache_directory, "results")
+
+    @staticmethod
+    def get_run_key(config_name, scenario_class, seed, version, agent_files=None, **options):
+        """
+        Key of a scenario execution. Returns None, if the configuration or
+        the scenario class is unknown, i.e. the result cannot be cached.
+        """
+        config_hash = get_scenario_config_hash(config_name)
+        source_hash = get_scenario_source_hash(scenario_class)
+        if config_hash is None or source_hash is None:
+            return None
+
+        components = {'config': config_hash,
+                      'source': source_hash,
+                      'agent': get_files_hash(agent_files) if agent_files else None,
+                      'seed': seed,
+                      'version': version,
+                      'options': options}
+        return hashlib.sha256(json.dumps(components, sort_keys=True).encode('utf-8')).hexdigest()
+
+    def _get_file(self, key):
+        return os.path.join(self.directory, key[:2], key + ".json")
+
+    def get(self, key):
+        """
+        Returns the cached record of the key or None
+        """
+        try:
+            with open(self._get_file(key)) as result_file:
+                return json.load(result_file)
+        except (IOError, OSError, ValueError):
+            return None
+
+    def put(self, key, record):
+        """
+        Store the record (JSON serializable) atomically. A read-only cache is not an error.
+        """
+        file_name = self._get_file(key)
+        try:
+            if not os.path.exists(os.path.dirname(file_name)):
+                os.makedirs(os.path.dirname(file_name))
+            fd, temporary_file = tempfile.mkstemp(dir=os.path.dirname(file_name), suffix=".tmp")
+            with os.fdopen(fd, 'w') as result_file:
+                json.dump(record, result_file, default=json_default)
+            os.rename(temporary_file, file_name)
+        except (IOError, OSError):
+            pass
+
+    def get_result_sink(self, key):
+        """
+        Returns a result sink (see ScenarioManager.analyze_scenario()), which
+        stores the record of the scenario under the key
+        """
+        return _ResultCacheSink(self, key)
+
+
+class _ResultCacheSink(object):
+
+    """
+    Result sink storing the record of one scenario in the ResultCache
+    """
+
+    def __init__(self, cache, key):
+        self._cache = cache
+        self._key = key
+
+    def write(self, record):
+        """
+        Store the record
+        """
+        self._cache.put(self._key, record)
+
+    def write_scenario(self, data, result, config_name=None, seed=None):
+        """
+        Store the record of an executed scenario (see result_sink.get_scenario_record())
+        """
+        self.write(get_scenario_record(data, result, config_name, seed))
@@ -0,0 +1,174 @@
+#!/usr/bin/env python
+
+#
+# This work is licensed under the terms of the MIT license.
+# For a copy, see <https://opensource.org/licenses/MIT>.
+
+"""
+This module provides a streaming result sink, which appends one JSON record
+per scenario to a single JSON Lines file.
+
+Each record contains the configuration name, seed, result, durations, the
+values of all criteria and their traffic events. The records are buffered
+and written in blocks. The file is synced to disk every fsync_records
+records or fsync_interval seconds (and when the sink is closed), hence a
+crash loses at most the records of the last batch.
+
+Usage:
+with ResultSink("results.jsonl") as sink:
+    sink.write_scenario(manager, result, config_name="FollowLeadingVehicle_1", seed=0)
+
+Reading the records:
+for record in read_results("results.jsonl"):
+    print(record['name'], record['result'])
+"""
+
+import json
+import os
+import time
+
+
+def json_default(value):
+    """
+    Fallback for values json cannot serialize (numpy scalars and arrays, enums, ...)
+    """
+    if hasattr(value, 'tolist'):
+        return value.tolist()
+    if hasattr(value, 'name'):
+        return value.name
+    return str(value)
+
+
+def get_traffic_event_record(event):
+    """
+    Dictionary of a TrafficEvent
+    """
+    return {'type': event.get_type().name,
+            'message': event.get_message(),
+            'data': event.get_dict()}
+
+
+def get_criterion_record(criterion):
+    """
+    Dictionary of a criterion with its status, values and traffic events
+    """
+    actor = getattr(criterion, 'actor', None)
+    return {'name': criterion.name,
+            'actor_id': actor.id if actor is not None else None,
+            'actor_type': actor.type_id if actor is not None else None,
+            'optional': criterion.optional,
+            'status': criterion.test_status,
+            'actual_value': criterion.actual_value,
+            'expected_value': criterion.expected_value_success,
+            'traffic_events': [get_traffic_event_record(event) for event in criterion.list_traffic_events]}
+
+
+def get_scenario_record(data, result, config_name=None, seed=None):
+    """
+    Dictionary of an executed scenario. data is the ScenarioManager,
+    result the overall result (see ScenarioManager.analyze_scenario())
+    """
+    criteria = data.scenario.tree_index.criteria
+    return {'name': config_name if config_name is not None else data.scenario_tree.name,
+            'scenario': data.scenario_tree.name,
+            'seed': seed,
+            'result': result,
+            'start_system_time': data.start_system_time,
+            'end_system_time': data.end_system_time,
+            'duration_system': data.scenario_duration_system,
+            'duration_game': data.scenario_duration_game,
+            'timeout': data.scenario.timeout,
+            'ego_vehicle': data.ego_vehicle.id if data.ego_vehicle is not None else None,
+            'other_actors': [actor.id for actor in data.other_actors if actor is not None],
+            'criteria': [get_criterion_record(criterion) for criterion in criteria]}
+
+
+class ResultSink(object):
+
+    """
+    Appends one JSON record per line to the file path.
+
+    Records are collected in memory and written once buffer_size bytes are
+    pending. Written records are synced to disk every fsync_records records
+    or fsync_interval seconds, whatever comes first.
+    """
+
+    def __init__(self, path, buffer_size=1 << 16, fsync_records=100, fsync_interval=5.0):
+        directory = os.path.dirname(path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+
+        self.path = path
+        self._file = open(path, 'a')
+        self._buffer_size = buffer_size
+        self._fsync_records = fsync_records
+        self._fsync_interval = fsync_interval
+
+        self._pending = []
+        self._pending_size = 0
+        self._unsynced_records = 0
+        self._last_sync = time.time()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def write(self, record):
+        """
+        Append a record (dictionary)
+        """
+        line = json.dumps(record, default=json_default, sort_keys=True) + "\n"
+        self._pending.append(line)
+        self._pending_size += len(line)
+        self._unsynced_records += 1
+
+        if self._pending_size >= self._buffer_size:
+            self._write_pending()
+
+        if self._unsynced_records >= self._fsync_records or time.time() - self._last_sync >= self._fsync_interval:
+            self.sync()
+
+    def write_scenario(self, data, result, config_name=None, seed=None):
+        """
+        Append the record of an executed scenario (see get_scenario_record())
+        """
+        self.write(get_scenario_record(data, result, config_name, seed))
+
+    def _write_pending(self):
+        if self._pending:
+            self._file.write("".join(self._pending))
+            self._pending = []
+            self._pending_size = 0
+
+    def sync(self):
+        """
+        Write all pending records and sync the file to disk
+        """
+        self._write_pending()
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._unsynced_records = 0
+        self._last_sync = time.time()
+
+    def close(self):
+        """
+        Sync and close the file
+        """
+        if self._file is not None:
+            self.sync()
+            self._file.close()
+            self._file = None
+
+
+def read_results(path):
+    """
+    Iterate over the records of a result file. An incomplete last line
+    (e.g. after a crash) is skipped.
+    """
+    with open(path) as result_file:
+        for line in result_file:
+            if not line.endswith("\n"):
+                break
+            yield json.loads(line)
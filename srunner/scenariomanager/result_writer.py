@@ -12,7 +12,14 @@ It shall be used from the ScenarioManager only.
 """
 
 import logging
+import os
+import re
+import shutil
+import tempfile
 import time
+from xml.sax.saxutils import escape, quoteattr
+
+from srunner.scenariomanager.result_sink import get_scenario_record
 
 
 class ResultOutputProvider(object):
@@ -22,25 +29,24 @@ class ResultOutputProvider(object):
     It shall be used from the ScenarioManager only.
     """
 
-    def __init__(self, data, result, stdout=True, filename=None, junit=None):
+    def __init__(self, data, result, stdout=True, filename=None, junit=None, record=None):
         """
         Setup all parameters
-        - _data contains all scenario-related information
-        - _result is overall pass/fail info
+        - _record contains all scenario-related information (see result_sink.get_scenario_record()),
+          it is created from data and the overall pass/fail info result, unless given (e.g. cached)
         - _stdout (True/False) is used to (de)activate terminal output
         - _filename is used to (de)activate file output in tabular form
         - _junit is used to (de)activate file output in _junit form
         """
-        self._data = data
-        self._result = result
+        self._record = record if record is not None else get_scenario_record(data, result)
         self._stdout = stdout
         self._filename = filename
         self._junit = junit
 
         self._start_time = time.strftime('%Y-%m-%d %H:%M:%S',
-                                         time.localtime(self._data.start_system_time))
+                                         time.localtime(self._record['start_system_time']))
         self._end_time = time.strftime('%Y-%m-%d %H:%M:%S',
-                                       time.localtime(self._data.end_system_time))
+                                       time.localtime(self._record['end_system_time']))
 
         self.logger = logging.getLogger()
         self.logger.setLevel(logging.INFO)
@@ -69,16 +75,16 @@ class ResultOutputProvider(object):
         """
         self.logger.info("\n")
         self.logger.info("Scenario: %s --- Result: %s",
-                         self._data.scenario_tree.name, self._result)
+                         self._record['scenario'], self._record['result'])
         self.logger.info("Start time: %s", (self._start_time))
         self.logger.info("End time: %s", (self._end_time))
         self.logger.info("Duration: System Time %5.2fs --- Game Time %5.2fs",
-                         self._data.scenario_duration_system,
-                         self._data.scenario_duration_game)
-        self.logger.info("Ego vehicle:  %s", self._data.ego_vehicle)
+                         self._record['duration_system'],
+                         self._record['duration_game'])
+        self.logger.info("Ego vehicle:  %s", self._record['ego_vehicle'])
 
         actor_string = ""
-        for actor in self._data.other_actors:
+        for actor in self._record['other_actors']:
             actor_string += "{}; ".format(actor)
         self.logger.info("Other actors: %s", actor_string)
         self.logger.info("\n")
@@ -89,32 +95,28 @@ class ResultOutputProvider(object):
             "-----------------------------------------------------------------------------------------------------------------")
         # pylint: enable=line-too-long
 
-        for criterion in self._data.scenario.test_criteria:
-            name_string = criterion.name
-            if criterion.optional:
+        for criterion in self._record['criteria']:
+            name_string = criterion['name']
+            if criterion['optional']:
                 name_string += " (Opt.)"
             else:
                 name_string += " (Req.)"
 
             self.logger.info("%24s (id=%3d) | %30s | %11s | %12.2f | %12.2f ",
-                             criterion.actor.type_id[8:],
-                             criterion.actor.id,
+                             criterion['actor_type'][8:],
+                             criterion['actor_id'],
                              name_string,
-                             # pylint: disable=line-too-long
-                             "FAILURE" if criterion.test_status == "RUNNING" else criterion.test_status,
-                             # pylint: enable=line-too-long
-                             criterion.actual_value,
-                             criterion.expected_value_success)
+                             "FAILURE" if criterion['status'] == "RUNNING" else criterion['status'],
+                             criterion['actual_value'],
+                             criterion['expected_value'])
 
         # Handle timeout separately
-        # pylint: disable=line-too-long
         self.logger.info("%33s | %30s | %11s | %12.2f | %12.2f ",
                          "",
                          "Duration",
-                         "SUCCESS" if self._data.scenario_duration_game < self._data.scenario.timeout else "FAILURE",
-                         self._data.scenario_duration_game,
-                         self._data.scenario.timeout)
-        # pylint: enable=line-too-long
+                         "SUCCESS" if self._record['duration_game'] < self._record['timeout'] else "FAILURE",
+                         self._record['duration_game'],
+                         self._record['timeout'])
 
         self.logger.info("\n")
 
@@ -122,17 +124,7 @@ class ResultOutputProvider(object):
         """
         Writing to Junit XML
         """
-        test_count = 0
-        failure_count = 0
-        for criterion in self._data.scenario.test_criteria:
-            test_count += 1
-            if criterion.test_status != "SUCCESS":
-                failure_count += 1
-
-        # handle timeout
-        test_count += 1
-        if self._data.scenario_duration_game >= self._data.scenario.timeout:
-            failure_count += 1
+        test_count, failure_count, test_suite_string = get_junit_testsuite(self._record)
 
         junit_file = open(self._junit, "w")
 
@@ -144,60 +136,183 @@ class ResultOutputProvider(object):
                               (test_count,
                                failure_count,
                                self._start_time,
-                               self._data.scenario_duration_system))
+                               self._record['duration_system']))
         junit_file.write(test_suites_string)
-
-        test_suite_string = ("  <testsuite name=\"%s\" tests=\"%d\" failures=\"%d\" "
-                             "disabled=\"0\" errors=\"0\" time=\"%5.2f\">\n" %
-                             (self._data.scenario_tree.name,
-                              test_count,
-                              failure_count,
-                              self._data.scenario_duration_system))
         junit_file.write(test_suite_string)
+        junit_file.write("</testsuites>\n")
+        junit_file.close()
 
-        for criterion in self._data.scenario.test_criteria:
-            testcase_name = criterion.name + "_" + \
-                criterion.actor.type_id[8:] + "_" + str(criterion.actor.id)
-            result_string = ("    <testcase name=\"{}\" status=\"run\" "
-                             "time=\"0\" classname=\"Scenarios.{}\">\n".format(
-                                 testcase_name, self._data.scenario_tree.name))
-            if criterion.test_status != "SUCCESS":
-                result_string += "      <failure message=\"{}\"  type=\"\"><!\[CDATA\[\n".format(
-                    criterion.name)
-                result_string += "  Actual:   {}\n".format(
-                    criterion.actual_value)
-                result_string += "  Expected: {}\n".format(
-                    criterion.expected_value_success)
-                result_string += "\n"
-                result_string += "  Exact Value: {} = {}\]\]></failure>\n".format(
-                    criterion.name, criterion.actual_value)
-            else:
-                result_string += "  Exact Value: {} = {}\n".format(
-                    criterion.name, criterion.actual_value)
-            result_string += "    </testcase>\n"
-            junit_file.write(result_string)
 
-        # Handle timeout separately
-        result_string = ("    <testcase name=\"Duration\" status=\"run\" time=\"{}\" "
-                         "classname=\"Scenarios.{}\">\n".format(
-                             self._data.scenario_duration_system,
-                             self._data.scenario_tree.name))
-        if self._data.scenario_duration_game >= self._data.scenario.timeout:
-            result_string += "      <failure message=\"{}\"  type=\"\"><!\[CDATA\[\n".format(
-                "Duration")
-            result_string += "  Actual:   {}\n".format(
-                self._data.scenario_duration_game)
-            result_string += "  Expected: {}\n".format(
-                self._data.scenario.timeout)
-            result_string += "\n"
-            result_string += "  Exact Value: {} = {}\]\]></failure>\n".format(
-                "Duration", self._data.scenario_duration_game)
+def _cdata(text):
+    """
+    Returns text as CDATA section(s). A "]]>" within the text is split
+    across two sections, as it would terminate the section otherwise.
+    """
+    return "<![CDATA[" + text.replace("]]>", "]]]]><![CDATA[>") + "]]>"
+
+
+def _get_junit_testcase(testcase_name, classname, criterion_name, duration, actual_value, expected_value, failure):
+    """
+    Returns the <testcase> element of one criterion
+    """
+    result_string = "    <testcase name={} status=\"run\" time=\"{}\" classname={}>\n".format(
+        quoteattr(testcase_name), duration, quoteattr("Scenarios." + classname))
+    if failure:
+        failure_text = "\n"
+        failure_text += "  Actual:   {}\n".format(actual_value)
+        failure_text += "  Expected: {}\n".format(expected_value)
+        failure_text += "\n"
+        failure_text += "  Exact Value: {} = {}".format(criterion_name, actual_value)
+        result_string += "      <failure message={}  type=\"\">{}</failure>\n".format(quoteattr(criterion_name),
+                                                                                    _cdata(failure_text))
+    else:
+        result_string += escape("  Exact Value: {} = {}".format(criterion_name, actual_value)) + "\n"
+    result_string += "    </testcase>\n"
+    return result_string
+
+
+def get_junit_testsuite(record):
+    """
+    Returns (number of tests, number of failures, <testsuite> element) of an
+    executed scenario, given as record (see result_sink.get_scenario_record())
+    """
+    name = record['name']
+
+    test_count = 0
+    failure_count = 0
+    test_cases = []
+    for criterion in record['criteria']:
+        test_count += 1
+        failure = criterion['status'] != "SUCCESS"
+        if failure:
+            failure_count += 1
+        testcase_name = criterion['name'] + "_" + criterion['actor_type'][8:] + "_" + str(criterion['actor_id'])
+        test_cases.append(_get_junit_testcase(testcase_name, name, criterion['name'], 0, criterion['actual_value'],
+                                              criterion['expected_value'], failure))
+
+    # Handle timeout separately
+    test_count += 1
+    failure = record['duration_game'] >= record['timeout']
+    if failure:
+        failure_count += 1
+    test_cases.append(_get_junit_testcase("Duration", name, "Duration", record['duration_system'],
+                                          record['duration_game'], record['timeout'], failure))
+
+    test_suite_string = ("  <testsuite name={} tests=\"{:d}\" failures=\"{:d}\" "
+                         "disabled=\"0\" errors=\"0\" time=\"{:5.2f}\">\n".format(quoteattr(name),
+                                                                                 test_count,
+                                                                                 failure_count,
+                                                                                 record['duration_system']))
+
+    return test_count, failure_count, test_suite_string + "".join(test_cases) + "  </testsuite>\n"
+
+
+class JUnitReport(object):
+
+    """
+    Consolidated JUnit report of a batch of scenarios, with one <testsuite>
+    per scenario.
+
+    The <testsuite> elements are appended to <path>.part as soon as a scenario
+    finished, only the totals are kept in memory. close() writes the report
+    (atomically) and removes the part file once the batch finished. If the
+    batch was interrupted, the part file is kept and its complete elements are
+    taken over by the next JUnitReport of the same path, if it resumes the
+    batch (resume=True). Otherwise the part file is started anew.
+    """
+
+    _TESTSUITE_PATTERN = re.compile(r'^  <testsuite name=.* tests="(\d+)" failures="(\d+)" '
+                                    r'disabled="0" errors="0" time="\s*([0-9.]+)">$')
+
+    def __init__(self, path, name="Simulation", resume=False):
+        self.path = path
+        self._name = name
+        self._part_file_name = path + ".part"
+        self._start_time = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime())
+
+        self.scenario_count = 0
+        self.scenario_failure_count = 0
+        self.test_count = 0
+        self.failure_count = 0
+        self.duration = 0.0
+
+        directory = os.path.dirname(path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+
+        if resume and os.path.exists(self._part_file_name):
+            self._recover()
+            self._part_file = open(self._part_file_name, "a")
         else:
-            result_string += "  Exact Value: {} = {}\n".format(
-                "Duration", self._data.scenario_duration_game)
-        result_string += "    </testcase>\n"
-        junit_file.write(result_string)
+            self._part_file = open(self._part_file_name, "w")
 
-        junit_file.write("  </testsuite>\n")
-        junit_file.write("</testsuites>\n")
-        junit_file.close()
+    def _recover(self):
+        """
+        Count the complete <testsuite> elements of the part file and cut off an incomplete one
+        """
+        complete_size = 0
+        with open(self._part_file_name) as part_file:
+            position = 0
+            testsuite = None
+            for line in part_file:
+                position += len(line.encode('utf-8'))
+                match = self._TESTSUITE_PATTERN.match(line.rstrip("\n"))
+                if match:
+                    testsuite = match
+                elif line == "  </testsuite>\n" and testsuite is not None:
+                    self._add_totals(int(testsuite.group(1)), int(testsuite.group(2)), float(testsuite.group(3)))
+                    complete_size = position
+                    testsuite = None
+
+        with open(self._part_file_name, "a") as part_file:
+            part_file.truncate(complete_size)
+
+    def _add_totals(self, test_count, failure_count, duration):
+        self.scenario_count += 1
+        self.scenario_failure_count += 1 if failure_count else 0
+        self.test_count += test_count
+        self.failure_count += failure_count
+        self.duration += duration
+
+    def write(self, record):
+        """
+        Add an executed scenario, given as record (see result_sink.get_scenario_record())
+        """
+        test_count, failure_count, test_suite_string = get_junit_testsuite(record)
+        self._part_file.write(test_suite_string)
+        self._part_file.flush()
+        self._add_totals(test_count, failure_count, record['duration_system'])
+
+    def write_scenario(self, data, result, config_name=None, seed=None):
+        """
+        Add an executed scenario (same interface as ResultSink.write_scenario())
+        """
+        self.write(get_scenario_record(data, result, config_name, seed))
+
+    def close(self, finished=True):
+        """
+        Write the consolidated report. The part file is only removed if the
+        batch finished, otherwise it is kept for the next run (e.g. --resume).
+        """
+        if self._part_file is None:
+            return
+        self._part_file.close()
+        self._part_file = None
+
+        directory = os.path.dirname(os.path.abspath(self.path))
+        fd, temporary_file = tempfile.mkstemp(dir=directory, suffix=".xml")
+        with os.fdopen(fd, "w") as junit_file:
+            junit_file.write("<?xml version=\"1.0\" encoding=\"UTF-8\"?>\n")
+            junit_file.write("<testsuites tests=\"{:d}\" failures=\"{:d}\" disabled=\"0\" "
+                             "errors=\"0\" timestamp=\"{}\" time=\"{:5.2f}\" "
+                             "name={} package=\"Scenarios\">\n".format(self.test_count,
+                                                                       self.failure_count,
+                                                                       self._start_time,
+                                                                       self.duration,
+                                                                       quoteattr(self._name)))
+            with open(self._part_file_name) as part_file:
+                shutil.copyfileobj(part_file, junit_file)
+            junit_file.write("</testsuites>\n")
+        os.rename(temporary_file, self.path)
+        if finished:
+            os.remove(self._part_file_name)
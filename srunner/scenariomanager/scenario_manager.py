@@ -19,10 +19,14 @@ import threading
 import py_trees
 
 import srunner
+from srunner.scenariomanager.agent_watchdog import AgentWatchdog
+from srunner.scenariomanager.behavior_tree_index import BehaviorTreeIndex
 from srunner.scenariomanager.carla_data_provider import CarlaDataProvider
 from srunner.scenariomanager.result_writer import ResultOutputProvider
-from srunner.scenariomanager.timer import GameTime, TimeOut
-from srunner.scenariomanager.traffic_events import TrafficEvent, TrafficEventType
+from srunner.scenariomanager.scoring import ScoringEngine
+from srunner.scenariomanager.sensor_hub import SensorHub
+from srunner.scenariomanager.timer import GameTime, GameTimeScheduler, TimeOut
+from srunner.scenariomanager.trajectory_recorder import TrajectoryRecorder
 
 
 class Scenario(object):
@@ -67,24 +71,14 @@ class Scenario(object):
         self.scenario_tree.add_child(self.criteria_tree)
         self.scenario_tree.setup(timeout=1)
 
+        # Index of all nodes, leaves and criteria of the tree (see BehaviorTreeIndex)
+        self.tree_index = BehaviorTreeIndex(self.scenario_tree, self.criteria_tree)
+
     def terminate(self):
         """
         This function sets the status of all leaves in the scenario tree to INVALID
         """
-        # Get list of all leaves in the tree
-        node_list = [self.scenario_tree]
-        more_nodes_exist = True
-        while more_nodes_exist:
-            more_nodes_exist = False
-            for node in node_list:
-                if node.children:
-                    node_list.remove(node)
-                    more_nodes_exist = True
-                    for child in node.children:
-                        node_list.append(child)
-
-        # Set status to INVALID
-        for node in node_list:
+        for node in self.tree_index.leaves:
             node.terminate(py_trees.common.Status.INVALID)
 
 
@@ -111,16 +105,29 @@ class ScenarioManager(object):
     ego_vehicle = None
     other_actors = None
 
-    def __init__(self, world, debug_mode=False):
+    def __init__(self, world, debug_mode=False, agent_time_budget=None, agent_fallback="wait", client=None):
         """
         Init requires scenario as input
+
+        agent_time_budget (seconds) and agent_fallback configure the watchdog
+        for the agent steps (see AgentWatchdog)
+
+        If a client is given, the controls of all actors are applied with
+        one command batch per tick (see CarlaDataProvider.flush_controls())
         """
         self._debug_mode = debug_mode
         self.agent = None
+        self._agent_time_budget = agent_time_budget
+        self._agent_fallback = agent_fallback
         self._autonomous_agent_plugged = False
         self._running = False
+        self._scenario_finished = threading.Event()
         self._timestamp_last_run = 0.0
         self._my_lock = threading.Lock()
+        self._world = world
+        self._client = client
+        self._trajectory_recorder = None
+        self.scoring_engine = ScoringEngine()
 
         self.scenario_duration_system = 0.0
         self.scenario_duration_game = 0.0
@@ -145,6 +152,16 @@ class ScenarioManager(object):
         # To print the scenario tree uncomment the next line
         # py_trees.display.render_dot_tree(self.scenario_tree)
 
+    def start_trajectory_recording(self, path, route=None, target=None):
+        """
+        Record the trajectories of the loaded scenario into the directory path
+        (see TrajectoryRecorder). The recording is closed in stop_scenario().
+        The optional route and target location are stored to allow an offline
+        route evaluation.
+        """
+        self._trajectory_recorder = TrajectoryRecorder(path, self._world, self.scenario, self.ego_vehicle,
+                                                       route, target)
+
     def restart(self):
         """
         Reset all parameters
@@ -161,15 +178,20 @@ class ScenarioManager(object):
         """
         Trigger the start of the scenario and wait for it to finish/fail
         """
-        self.agent = agent
+        self.agent = None
+        if agent is not None:
+            self.agent = AgentWatchdog(agent, self._agent_time_budget, self._agent_fallback)
         print("ScenarioManager: Running scenario {}".format(self.scenario_tree.name))
         self.start_system_time = time.time()
         start_game_time = GameTime.get_time()
 
+        self._scenario_finished.clear()
         self._running = True
 
-        while self._running:
-            time.sleep(0.5)
+        # Set by _tick_scenario, hence fast (e.g. headless) simulations do not wait for a polling interval.
+        # The timeout keeps the loop interruptible.
+        while not self._scenario_finished.wait(0.5):
+            pass
 
         self.end_system_time = time.time()
         end_game_time = GameTime.get_time()
@@ -181,6 +203,14 @@ class ScenarioManager(object):
         if self.scenario_tree.status == py_trees.common.Status.FAILURE:
             print("ScenarioManager: Terminated due to failure")
 
+    @staticmethod
+    def get_next_wakeup_time():
+        """
+        Returns the game time at which the next waiting behavior (e.g. TimeOut)
+        is due, or None if no behavior is waiting (see GameTimeScheduler)
+        """
+        return GameTimeScheduler.get_next_time()
+
     def _tick_scenario(self, timestamp):
         """
         Run next tick of scenario
@@ -206,10 +236,16 @@ class ScenarioManager(object):
                 # Tick scenario
                 self.scenario_tree.tick_once()
 
+                if self._trajectory_recorder is not None:
+                    self._trajectory_recorder.on_tick(timestamp, self.agent)
+
                 if self.agent:
                     # Invoke agent
                     action = self.agent()
-                    self.ego_vehicle.apply_control(action)
+                    CarlaDataProvider.apply_control(self.ego_vehicle, action)
+
+                # Apply the controls of all actors at once
+                CarlaDataProvider.flush_controls(self._client)
 
                 if self._debug_mode:
                     print("\n")
@@ -219,21 +255,35 @@ class ScenarioManager(object):
 
                 if self.scenario_tree.status != py_trees.common.Status.RUNNING:
                     self._running = False
+                    self._scenario_finished.set()
 
     def stop_scenario(self):
         """
         This function triggers a proper termination of a scenario
         """
+        if self.agent is not None:
+            # The agent may be destroyed after this call, hence stop its worker thread
+            self.agent.close()
+
         if self.scenario is not None:
             self.scenario.terminate()
+            CarlaDataProvider.flush_controls(self._client)
+
+        if self._trajectory_recorder is not None:
+            self._trajectory_recorder.close()
+            self._trajectory_recorder = None
 
         CarlaDataProvider.cleanup()
+        SensorHub.cleanup()
 
-    def analyze_scenario(self, stdout, filename, junit):
+    def analyze_scenario(self, stdout, filename, junit, result_sinks=None, config_name=None, seed=None):
         """
         This function is intended to be called from outside and provide
         statistics about the scenario (human-readable, in form of a junit
         report, etc.)
+
+        The scenario (incl. the configuration name and seed) is also written
+        to all result_sinks (ResultSink, JUnitReport).
         """
 
         failure = False
@@ -262,25 +312,21 @@ class ScenarioManager(object):
         output = ResultOutputProvider(self, result, stdout, filename, junit)
         output.write()
 
+        for result_sink in result_sinks or []:
+            result_sink.write_scenario(self, result, config_name, seed)
+
         return failure or timeout
 
     def analyze_scenario_challenge(self):
         """
         This function is intended to be called from outside and provide
         statistics about the scenario (human-readable, for the CARLA challenge.)
-        """
-        PENALTY_COLLISION_STATIC = 10
-        PENALTY_COLLISION_VEHICLE = 10
-        PENALTY_COLLISION_PEDESTRIAN = 30
-        PENALTY_TRAFFIC_LIGHT = 10
-        PENALTY_WRONG_WAY = 5
 
-        target_reached = False
+        The score is computed by the scoring_engine (see scoring.py).
+        """
         failure = False
         result = "SUCCESS"
         final_score = 0.0
-        score_penalty = 0.0
-        score_route = 0.0
         return_message = ""
 
         if isinstance(self.scenario.test_criteria, py_trees.composites.Parallel):
@@ -291,86 +337,23 @@ class ScenarioManager(object):
                 result = "TIMEOUT"
 
             list_traffic_events = []
-            for node in self.scenario.test_criteria.children:
-                if  node.list_traffic_events:
+            for node in self.scenario.tree_index.criteria:
+                if node.list_traffic_events:
                     list_traffic_events.extend(node.list_traffic_events)
+            if self.agent is not None:
+                list_traffic_events.extend(self.agent.list_traffic_events)
+
+            scores = self.scoring_engine.score([list_traffic_events])
+            final_score = float(scores.scores[0])
 
-            list_collisions = []
-            list_red_lights = []
-            list_wrong_way = []
-            list_route_dev = []
-            # analyze all traffic events
-            for event in list_traffic_events:
-                if event.get_type() == TrafficEventType.COLLISION_STATIC:
-                    score_penalty += PENALTY_COLLISION_STATIC
-                    msg = event.get_message()
-                    if msg:
-                        list_collisions.append(event.get_message())
-
-                elif event.get_type() == TrafficEventType.COLLISION_VEHICLE:
-                    score_penalty += PENALTY_COLLISION_VEHICLE
-                    msg = event.get_message()
-                    if msg:
-                        list_collisions.append(event.get_message())
-
-                elif event.get_type() == TrafficEventType.COLLISION_PEDESTRIAN:
-                    score_penalty += PENALTY_COLLISION_PEDESTRIAN
-                    msg = event.get_message()
-                    if msg:
-                        list_collisions.append(event.get_message())
-
-                elif event.get_type() == TrafficEventType.TRAFFIC_LIGHT_INFRACTION:
-                    score_penalty += PENALTY_TRAFFIC_LIGHT
-                    msg = event.get_message()
-                    if msg:
-                        list_red_lights.append(event.get_message())
-
-                elif event.get_type() == TrafficEventType.WRONG_WAY_INFRACTION:
-                    score_penalty += PENALTY_WRONG_WAY
-                    msg = event.get_message()
-                    if msg:
-                        list_wrong_way.append(event.get_message())
-
-                elif event.get_type() == TrafficEventType.ROUTE_DEVIATION:
-                    msg = event.get_message()
-                    if msg:
-                        list_route_dev.append(event.get_message())
-
-                elif event.get_type() == TrafficEventType.ROUTE_COMPLETED:
-                    score_route = 100.0
-                    target_reached = True
-                elif event.get_type() == TrafficEventType.ROUTE_COMPLETION:
-                    if not target_reached:
-                        score_route = event.get_dict()['route_completed']
-
-            final_score = max(score_route - score_penalty, 0)
-
-            return_message += "\n=================================="
-            return_message += "\n==[{}] [Score = {:.2f} : (route_score={}, infractions=-{})]".format(result,
-                                                                                                   final_score,
-                                                                                                   score_route,
-                                                                                                   score_penalty)
-            if list_collisions:
-                return_message += "\n===== Collisions:"
-                for item in list_collisions:
-                    return_message += "\n========== {}".format(item)
-
-            if list_red_lights:
-                return_message += "\n===== Red lights:"
-                for item in list_red_lights:
-                    return_message += "\n========== {}".format(item)
-
-            if list_wrong_way:
-                return_message += "\n===== Wrong way:"
-                for item in list_wrong_way:
-                    return_message += "\n========== {}".format(item)
-
-            if list_route_dev:
-                return_message += "\n===== Route deviation:"
-                for item in list_route_dev:
-                    return_message += "\n========== {}".format(item)
-
-            return_message += "\n=================================="
+            extra_lines = []
+            if self.agent is not None:
+                statistics = self.agent.get_statistics()
+                extra_lines.append(
+                    "===== Agent step latency: p50={:.1f}ms p90={:.1f}ms p99={:.1f}ms max={:.1f}ms".format(
+                        1000 * statistics['p50'], 1000 * statistics['p90'],
+                        1000 * statistics['p99'], 1000 * statistics['max']))
 
+            return_message = scores.get_report(0, result, extra_lines)
 
         return result, final_score, return_message
\ No newline at end of file
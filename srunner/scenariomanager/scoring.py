@@ -0,0 +1,177 @@
+#!/usr/bin/env python
+
+#
+# This work is licensed under the terms of the MIT license.
+# For a copy, see <https://opensource.org/licenses/MIT>.
+
+"""
+This module provides the scoring of the CARLA challenge.
+
+The penalties are defined by a table (PENALTY_TABLE). The traffic events of
+one or many scenario runs are collected into arrays (run, event type, route
+completion), from which the counts per event type, the penalties and the
+route scores of all runs are computed at once. The text report of a run is
+only rendered on request.
+
+Usage:
+engine = ScoringEngine()
+scores = engine.score([traffic_events_run_0, traffic_events_run_1])
+print(scores.scores, scores.get_count(0, TrafficEventType.COLLISION_VEHICLE))
+print(scores.get_report(0, "SUCCESS"))
+"""
+
+import numpy as np
+
+from srunner.scenariomanager.traffic_events import TrafficEventType
+
+
+# Event type, penalty, section of the report (None: not listed)
+PENALTY_TABLE = [
+    (TrafficEventType.COLLISION_STATIC, 10, "Collisions"),
+    (TrafficEventType.COLLISION_VEHICLE, 10, "Collisions"),
+    (TrafficEventType.COLLISION_PEDESTRIAN, 30, "Collisions"),
+    (TrafficEventType.TRAFFIC_LIGHT_INFRACTION, 10, "Red lights"),
+    (TrafficEventType.WRONG_WAY_INFRACTION, 5, "Wrong way"),
+    (TrafficEventType.ROUTE_DEVIATION, 0, "Route deviation"),
+    (TrafficEventType.AGENT_STEP_OVERRUN, 0, "Agent step overruns"),
+    (TrafficEventType.ROUTE_COMPLETION, 0, None),
+    (TrafficEventType.ROUTE_COMPLETED, 0, None)
+]
+
+ROUTE_COMPLETED_SCORE = 100.0
+
+
+def get_penalty_table(penalties):
+    """
+    Copy of PENALTY_TABLE with the penalties of the dictionary event type -> penalty
+    """
+    return [(event_type, penalties.get(event_type, penalty), section) for event_type, penalty, section in PENALTY_TABLE]
+
+
+class Scores(object):
+
+    """
+    Scores of a batch of runs (see ScoringEngine.score())
+
+    - counts: number of events per run and event type (indexed by TrafficEventType.value)
+    - penalties, route_scores, scores: one value per run
+    """
+
+    def __init__(self, engine, counts, penalties, route_scores, events, messages):
+        self._engine = engine
+        self.counts = counts
+        self.penalties = penalties
+        self.route_scores = route_scores
+        self.scores = np.maximum(route_scores - penalties, 0)
+        self._events = events
+        self._messages = messages
+
+    def __len__(self):
+        return self.scores.shape[0]
+
+    def get_count(self, run, event_type):
+        """
+        Number of events of the given type in the run
+        """
+        return int(self.counts[run, event_type.value])
+
+    def get_messages(self, run, event_types):
+        """
+        Messages of all events of the given types in the run (in order of the events)
+        """
+        type_values = [event_type.value for event_type in event_types]
+        indices = np.flatnonzero((self._events['run'] == run) & np.isin(self._events['type'], type_values))
+        return [self._messages[index] for index in indices if self._messages[index]]
+
+    def get_report(self, run, result, extra_lines=None):
+        """
+        Text report of the run with its result, score and the messages of all infractions
+        """
+        lines = ["", "==================================",
+                 "==[{}] [Score = {:.2f} : (route_score={}, infractions=-{})]".format(
+                     result, float(self.scores[run]), float(self.route_scores[run]), float(self.penalties[run]))]
+
+        for section, event_types in self._engine.sections:
+            messages = self.get_messages(run, event_types)
+            if messages:
+                lines.append("===== {}:".format(section))
+                lines.extend("========== {}".format(message) for message in messages)
+
+        lines.extend(extra_lines or [])
+        lines.append("==================================")
+        return "\n".join(lines)
+
+
+class ScoringEngine(object):
+
+    """
+    Computes the challenge scores of one or many runs from their traffic events
+    """
+
+    def __init__(self, penalty_table=None):
+        penalty_table = penalty_table if penalty_table is not None else PENALTY_TABLE
+
+        self.type_count = max(event_type.value for event_type in TrafficEventType) + 1
+        self.penalty_vector = np.zeros(self.type_count, dtype=np.float64)
+        self.sections = []
+        section_types = {}
+        for event_type, penalty, section in penalty_table:
+            self.penalty_vector[event_type.value] = penalty
+            if section is None:
+                continue
+            if section not in section_types:
+                section_types[section] = []
+                self.sections.append((section, section_types[section]))
+            section_types[section].append(event_type)
+
+        self._event_dtype = np.dtype([('run', np.int64), ('type', np.int64), ('route_completed', np.float64)])
+
+    def collect(self, runs):
+        """
+        Collect the traffic events of all runs (lists of TrafficEvent or (frame, TrafficEvent))
+        into one array of (run, type, route_completed) and the list of their messages
+        """
+        rows = []
+        messages = []
+        for run, traffic_events in enumerate(runs):
+            for event in traffic_events:
+                if isinstance(event, tuple):
+                    event = event[1]
+                event_type = event.get_type()
+                route_completed = np.nan
+                if event_type == TrafficEventType.ROUTE_COMPLETION:
+                    route_completed = event.get_dict()['route_completed']
+                rows.append((run, event_type.value, route_completed))
+                messages.append(event.get_message())
+
+        return np.array(rows, dtype=self._event_dtype), messages
+
+    def score(self, runs):
+        """
+        Scores of all runs, each given as list of traffic events
+        """
+        runs = list(runs)
+        events, messages = self.collect(runs)
+        run_count = len(runs)
+
+        counts = np.zeros((run_count, self.type_count), dtype=np.int64)
+        np.add.at(counts, (events['run'], events['type']), 1)
+        penalties = counts.dot(self.penalty_vector)
+
+        # The route score is the completion of the last ROUTE_COMPLETION event,
+        # unless the route was completed (ROUTE_COMPLETED)
+        route_scores = np.zeros(run_count, dtype=np.float64)
+        completion = np.flatnonzero(events['type'] == TrafficEventType.ROUTE_COMPLETION.value)
+        last_completion = np.full(run_count, -1, dtype=np.int64)
+        np.maximum.at(last_completion, events['run'][completion], completion)
+        has_completion = last_completion >= 0
+        route_scores[has_completion] = events['route_completed'][last_completion[has_completion]]
+        route_scores[counts[:, TrafficEventType.ROUTE_COMPLETED.value] > 0] = ROUTE_COMPLETED_SCORE
+
+        return Scores(self, counts, penalties, route_scores, events, messages)
+
+    def score_run(self, traffic_events):
+        """
+        Score of a single run
+        """
+        return float(self.score([traffic_events]).scores[0])
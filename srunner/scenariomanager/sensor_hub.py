@@ -0,0 +1,122 @@
+#!/usr/bin/env python
+
+#
+# This work is licensed under the terms of the MIT license.
+# For a copy, see <https://opensource.org/licenses/MIT>.
+
+"""
+This module provides a hub of sensors shared by the criteria.
+
+Several criteria observe the same actor with the same kind of sensor (e.g.
+CollisionTest and the lane invasion criteria). Instead of spawning one sensor
+per criterion, the hub spawns at most one sensor of each type per actor and
+forwards its events to all subscribers. The subscribers are only referenced
+weakly, and the sensor is destroyed once its last subscriber left.
+"""
+
+import threading
+import weakref
+
+import carla
+
+from srunner.scenariomanager.carla_data_provider import CarlaBlueprintCache
+
+
+class _SharedSensor(object):
+
+    """
+    A sensor attached to an actor with its subscribers
+    (list of (weak reference to the subscriber, callback))
+    """
+
+    def __init__(self, sensor):
+        self.sensor = sensor
+        self.subscribers = []
+
+
+class SensorHub(object):
+
+    """
+    This (static) class provides sensors shared by all criteria of an actor
+
+    Usage (the callback receives a weak reference to the subscriber and the event):
+    SensorHub.subscribe(actor, 'sensor.other.collision', self, CollisionTest._count_collisions)
+    ...
+    SensorHub.unsubscribe(actor, 'sensor.other.collision', self)
+    """
+
+    _lock = threading.Lock()
+    _sensors = dict()   # (actor id, sensor type) -> _SharedSensor
+
+    @staticmethod
+    def subscribe(actor, sensor_type, subscriber, callback):
+        """
+        Forward the events of the sensor_type sensor of the actor to
+        callback(weakref.ref(subscriber), event). The sensor is spawned
+        with the first subscriber.
+        """
+        key = (actor.id, sensor_type)
+        with SensorHub._lock:
+            shared_sensor = SensorHub._sensors.get(key)
+            if shared_sensor is None:
+                world = actor.get_world()
+                blueprint = CarlaBlueprintCache.find(world, sensor_type)
+                sensor = world.spawn_actor(blueprint, carla.Transform(), attach_to=actor)
+                shared_sensor = _SharedSensor(sensor)
+                SensorHub._sensors[key] = shared_sensor
+                sensor.listen(lambda event: SensorHub._on_event(key, event))
+
+            shared_sensor.subscribers.append((weakref.ref(subscriber), callback))
+
+    @staticmethod
+    def unsubscribe(actor, sensor_type, subscriber):
+        """
+        Stop forwarding events to the subscriber. The sensor is destroyed,
+        if it has no subscribers left. Unknown subscribers are ignored.
+        """
+        key = (actor.id, sensor_type)
+        with SensorHub._lock:
+            shared_sensor = SensorHub._sensors.get(key)
+            if shared_sensor is None:
+                return
+
+            shared_sensor.subscribers = [(reference, callback) for reference, callback in shared_sensor.subscribers
+                                         if reference() is not None and reference() is not subscriber]
+            if not shared_sensor.subscribers:
+                del SensorHub._sensors[key]
+                shared_sensor.sensor.destroy()
+
+    @staticmethod
+    def _on_event(key, event):
+        """
+        Callback of a shared sensor, forwarding the event to all (alive) subscribers
+        """
+        with SensorHub._lock:
+            shared_sensor = SensorHub._sensors.get(key)
+            if shared_sensor is None:
+                return
+            subscribers = list(shared_sensor.subscribers)
+
+        for reference, callback in subscribers:
+            if reference() is not None:
+                callback(reference, event)
+
+    @staticmethod
+    def get_sensor_count():
+        """
+        returns the number of sensors currently spawned by the hub
+        """
+        return len(SensorHub._sensors)
+
+    @staticmethod
+    def cleanup():
+        """
+        Destroy all sensors and remove all subscribers
+        """
+        with SensorHub._lock:
+            shared_sensors = list(SensorHub._sensors.values())
+            SensorHub._sensors.clear()
+
+        for shared_sensor in shared_sensors:
+            if shared_sensor.sensor.is_alive:
+                shared_sensor.sensor.destroy()
@@ -9,8 +9,15 @@
 """
 This module provides access to the CARLA game time and contains a py_trees
 timeout behavior using the CARLA game time
+
+Behaviors waiting for a game time can register a wake-up with the
+GameTimeScheduler instead of comparing the game time on every tick.
 """
 
+import heapq
+import itertools
+import weakref
+
 import py_trees
 
 
@@ -35,13 +42,16 @@ class GameTime(object):
         if GameTime._last_frame < timestamp.frame_count:
             GameTime._current_game_time += timestamp.delta_seconds
             GameTime._last_frame = timestamp.frame_count
+            GameTimeScheduler.on_game_time(GameTime._current_game_time)
 
     @staticmethod
     def restart():
         """
         Reset game timer to 0
+        All scheduled wake-ups are removed
         """
         GameTime._current_game_time = 0.0
+        GameTimeScheduler.restart()
 
     @staticmethod
     def get_time():
@@ -51,14 +61,84 @@ class GameTime(object):
         return GameTime._current_game_time
 
 
+class GameTimeScheduler(object):
+
+    """
+    This (static) class calls callbacks once the game time reaches their
+    wake-up time. The wake-ups are kept in a heap, hence every tick only
+    looks at the due wake-ups.
+
+    handle = GameTimeScheduler.schedule(GameTime.get_time() + 5.0, callback)
+    GameTimeScheduler.cancel(handle)
+
+    The callbacks are called from GameTime.on_carla_tick(), i.e. before the
+    scenario tree is ticked.
+    """
+
+    _wakeups = []   # heap of [wake-up time, sequence number, callback]
+    _sequence = itertools.count()
+
+    @staticmethod
+    def schedule(wakeup_time, callback):
+        """
+        Call callback() once the game time reaches wakeup_time
+        Returns a handle to cancel the wake-up
+        """
+        handle = [wakeup_time, next(GameTimeScheduler._sequence), callback]
+        heapq.heappush(GameTimeScheduler._wakeups, handle)
+        return handle
+
+    @staticmethod
+    def cancel(handle):
+        """
+        Cancel a scheduled wake-up (it is removed from the heap, once it is due)
+        """
+        handle[2] = None
+
+    @staticmethod
+    def on_game_time(game_time):
+        """
+        Call the callbacks of all wake-ups due at game_time
+        """
+        wakeups = GameTimeScheduler._wakeups
+        while wakeups and wakeups[0][0] <= game_time:
+            callback = heapq.heappop(wakeups)[2]
+            if callback is not None:
+                callback()
+
+    @staticmethod
+    def get_next_time():
+        """
+        Returns the game time of the next wake-up or None
+        """
+        wakeups = GameTimeScheduler._wakeups
+        while wakeups and wakeups[0][2] is None:
+            heapq.heappop(wakeups)
+        return wakeups[0][0] if wakeups else None
+
+    @staticmethod
+    def restart():
+        """
+        Remove all wake-ups
+        """
+        GameTimeScheduler._wakeups = []
+
+
 class TimeOut(py_trees.behaviour.Behaviour):
 
     """
     This class contains an atomic timeout behavior.
     It uses the CARLA game time, not the system time which is used by
     the py_trees timer.
+
+    The timeout registers a wake-up with the GameTimeScheduler and skips the
+    time comparison until it is woken up.
     """
 
+    # The wake-up is scheduled slightly early, so rounding errors of the game time
+    # never delay the timeout; once woken up, the elapsed time is compared exactly
+    _wakeup_tolerance = 1e-6
+
     def __init__(self, timeout, name="TimeOut"):
         """
         Setup timeout
@@ -67,6 +147,8 @@ class TimeOut(py_trees.behaviour.Behaviour):
         self.logger.debug("%s.__init__()" % (self.__class__.__name__))
         self._timeout_value = timeout
         self._start_time = 0.0
+        self._wakeup = None
+        self._due = False
         self.timeout = False
 
     def setup(self, unused_timeout=15):
@@ -75,14 +157,38 @@ class TimeOut(py_trees.behaviour.Behaviour):
 
     def initialise(self):
         self._start_time = GameTime.get_time()
+        self._cancel_wakeup()
+        self._due = self._timeout_value <= 0
+        if not self._due:
+            node = weakref.ref(self)
+            self._wakeup = GameTimeScheduler.schedule(self._start_time + self._timeout_value - self._wakeup_tolerance,
+                                                      lambda: TimeOut._wake_up(node))
         self.logger.debug("%s.initialise()" % (self.__class__.__name__))
 
+    @staticmethod
+    def _wake_up(node):
+        """
+        Callback of the GameTimeScheduler (the node is a weak reference)
+        """
+        node = node()
+        if node is not None:
+            node._wakeup = None     # pylint: disable=protected-access
+            node._due = True        # pylint: disable=protected-access
+
+    def _cancel_wakeup(self):
+        if self._wakeup is not None:
+            GameTimeScheduler.cancel(self._wakeup)
+            self._wakeup = None
+
     def update(self):
         """
         Get current game time, and compare it to the timeout value
         Upon reaching the timeout value the status changes to SUCCESS
         """
 
+        if not self._due:
+            return py_trees.common.Status.RUNNING
+
         elapsed_time = GameTime.get_time() - self._start_time
 
         if elapsed_time < self._timeout_value:
@@ -97,5 +203,6 @@ class TimeOut(py_trees.behaviour.Behaviour):
         return new_status
 
     def terminate(self, new_status):
+        self._cancel_wakeup()
         self.logger.debug("%s.terminate()[%s->%s]" % (
             self.__class__.__name__, self.status, new_status))
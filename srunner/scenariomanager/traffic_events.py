@@ -13,6 +13,7 @@ class TrafficEventType(Enum):
     ROUTE_COMPLETED = 6
     TRAFFIC_LIGHT_INFRACTION = 7
     WRONG_WAY_INFRACTION = 8
+    AGENT_STEP_OVERRUN = 9
 
 
 class TrafficEvent(object):
@@ -0,0 +1,285 @@
+#!/usr/bin/env python
+
+#
+# This work is licensed under the terms of the MIT license.
+# For a copy, see <https://opensource.org/licenses/MIT>.
+
+"""
+This module provides a recorder for the actor trajectories of a scenario,
+and a loader for the recorded files.
+
+A recording is a directory with one raw binary file per column, which can
+be memory-mapped with numpy:
+- actors.<column>.bin: one row per registered actor and tick
+  (frame, game_time, actor_id, x, y, z, roll, pitch, yaw, velocity)
+- traffic_lights.<column>.bin: one row per traffic light and tick
+  (frame, actor_id, state)
+- events.jsonl: all traffic events of the criteria and of the agent watchdog,
+  with the frame they were first reported in (appended while recording).
+  Events updated by their criterion (e.g. the ROUTE_COMPLETION event) are
+  appended again with the same id, the last line of an id is its final state.
+- route.npy: x, y, z of the route waypoints (if a route was given)
+- meta.json: column data types, scenario name and static information
+  (ego id and bounding box, traffic light trigger volumes)
+"""
+
+import json
+import math
+import os
+
+import numpy as np
+
+import carla
+
+from srunner.scenariomanager.carla_data_provider import CarlaDataProvider
+from srunner.scenariomanager.timer import GameTime
+
+
+ACTOR_COLUMNS = [('frame', np.int64), ('game_time', np.float64), ('actor_id', np.int32),
+                 ('x', np.float32), ('y', np.float32), ('z', np.float32),
+                 ('roll', np.float32), ('pitch', np.float32), ('yaw', np.float32),
+                 ('velocity', np.float32)]
+
+TRAFFIC_LIGHT_COLUMNS = [('frame', np.int64), ('actor_id', np.int32), ('state', np.uint8)]
+
+
+class TrajectoryRecorder(object):
+
+    """
+    Records the state of all actors registered at the CarlaDataProvider,
+    all traffic light states and the traffic events of the criteria and
+    of the agent (see AgentWatchdog).
+
+    on_tick() only appends tuples to in-memory lists, which are converted
+    into columns and appended to the files every flush_interval ticks.
+    New and updated traffic events are written on every tick and flushed
+    together with the columns, hence a crash loses at most flush_interval ticks.
+    """
+
+    def __init__(self, path, world, scenario, ego_vehicle=None, route=None, target=None, flush_interval=100):
+        if not os.path.exists(path):
+            os.makedirs(path)
+
+        self._path = path
+        self._flush_interval = flush_interval
+        self._ticks_since_flush = 0
+
+        self._actor_rows = []
+        self._traffic_light_rows = []
+        self._actor_dtype = np.dtype(ACTOR_COLUMNS)
+        self._traffic_light_dtype = np.dtype(TRAFFIC_LIGHT_COLUMNS)
+
+        self._traffic_lights = [actor for actor in world.get_actors() if 'traffic_light' in actor.type_id]
+        self._criteria = list(scenario.tree_index.criteria)
+        self._written_events = {}
+        self._agent = None
+        self._last_frame = None
+        self._events_file = open(os.path.join(path, "events.jsonl"), "w")
+
+        self._files = {}
+        for table, columns in (('actors', ACTOR_COLUMNS), ('traffic_lights', TRAFFIC_LIGHT_COLUMNS)):
+            for column, _ in columns:
+                self._files[(table, column)] = open(os.path.join(path, "{}.{}.bin".format(table, column)), "wb")
+
+        if route is not None:
+            if isinstance(route, np.ndarray):
+                route_xyz = np.column_stack((route['x'], route['y'], route['z'])).astype(np.float64)
+            else:
+                route_xyz = np.array([(location.x, location.y, location.z) for location, _ in route], dtype=np.float64)
+            np.save(os.path.join(path, "route.npy"), route_xyz)
+
+        with open(os.path.join(path, "meta.json"), "w") as meta_file:
+            json.dump({'scenario': scenario.scenario_tree.name,
+                       'actors': [(column, np.dtype(dtype).str) for column, dtype in ACTOR_COLUMNS],
+                       'traffic_lights': [(column, np.dtype(dtype).str) for column, dtype in TRAFFIC_LIGHT_COLUMNS],
+                       'static': self._get_static_information(ego_vehicle, target)},
+                      meta_file)
+
+    def _get_static_information(self, ego_vehicle, target):
+        """
+        Information that does not change during the scenario, but is required
+        to re-evaluate criteria offline
+        """
+        static = {'red_light_state': int(carla.TrafficLightState.Red), 'trigger_volumes': {}}
+
+        if ego_vehicle is not None:
+            extent = ego_vehicle.bounding_box.extent
+            static['ego_id'] = ego_vehicle.id
+            static['ego_extent_length'] = math.sqrt(extent.x**2 + extent.y**2 + extent.z**2)
+
+        if target is not None:
+            static['target'] = [target.x, target.y, target.z]
+
+        for traffic_light in self._traffic_lights:
+            if hasattr(traffic_light, 'trigger_volume'):
+                location = traffic_light.get_transform().transform(traffic_light.trigger_volume.location)
+                extent = traffic_light.trigger_volume.extent
+                static['trigger_volumes'][str(traffic_light.id)] = [
+                    location.x, location.y, location.z, math.sqrt(extent.x**2 + extent.y**2 + extent.z**2)]
+
+        return static
+
+    def _write_events(self, frame, source_index, source, events):
+        """
+        Write the new traffic events of a source and those that changed since they were written
+        """
+        for index, event in enumerate(events):
+            event_id = "{}.{}".format(source_index, index)
+            event_dict = event.get_dict()
+            state = (event.get_message(), dict(event_dict) if event_dict is not None else None)
+            written = self._written_events.get(event_id)
+            if written is not None and written[1] == state:
+                continue
+
+            first_frame = written[0] if written is not None else frame
+            self._written_events[event_id] = (first_frame, state)
+            self._events_file.write(json.dumps({'id': event_id,
+                                                'frame': first_frame,
+                                                'criterion': source,
+                                                'type': event.get_type().name,
+                                                'message': state[0],
+                                                'dict': state[1]}) + "\n")
+
+    def _get_event_sources(self):
+        """
+        List of (name, traffic events) of all criteria and the agent
+        """
+        sources = [(criterion.name, criterion.list_traffic_events) for criterion in self._criteria]
+        if self._agent is not None:
+            sources.append(("AgentWatchdog", self._agent.list_traffic_events))
+        return sources
+
+    def _write_all_events(self, frame):
+        for index, (name, events) in enumerate(self._get_event_sources()):
+            self._write_events(frame, index, name, events)
+
+    def _check_events(self):
+        """
+        Check that events.jsonl contains the final state of every traffic event,
+        e.g. the final route completion of the RouteCompletionTest
+        """
+        recorded = {event['id']: event for event in read_events(os.path.join(self._path, "events.jsonl"))}
+        mismatches = []
+        for source_index, (name, events) in enumerate(self._get_event_sources()):
+            for index, event in enumerate(events):
+                record = recorded.get("{}.{}".format(source_index, index))
+                if (record is None or record['type'] != event.get_type().name or
+                        record['message'] != event.get_message() or record['dict'] != event.get_dict()):
+                    mismatches.append("{} {}".format(name, event.get_type().name))
+        if mismatches:
+            print("TrajectoryRecorder: final state of traffic events not recorded: " + ", ".join(mismatches))
+        return not mismatches
+
+    def on_tick(self, timestamp, agent=None):
+        """
+        Append the state of the current tick. Has to be called after the
+        CarlaDataProvider and the scenario tree were updated. The traffic
+        events of the agent (AgentWatchdog) are recorded, if it is given.
+        """
+        frame = timestamp.frame_count
+        game_time = GameTime.get_time()
+        self._last_frame = frame
+        self._agent = agent
+
+        for actor in CarlaDataProvider.get_registered_actors():
+            transform = CarlaDataProvider.get_transform(actor)
+            if transform is None:
+                continue
+            location = transform.location
+            rotation = transform.rotation
+            self._actor_rows.append((frame, game_time, actor.id,
+                                     location.x, location.y, location.z,
+                                     rotation.roll, rotation.pitch, rotation.yaw,
+                                     CarlaDataProvider.get_velocity(actor)))
+
+        for traffic_light in self._traffic_lights:
+            self._traffic_light_rows.append((frame, traffic_light.id, int(traffic_light.state)))
+
+        self._write_all_events(frame)
+
+        self._ticks_since_flush += 1
+        if self._ticks_since_flush >= self._flush_interval:
+            self.flush()
+
+    def flush(self):
+        """
+        Convert the buffered rows into columns and append them to the files
+        """
+        for table, rows, dtype in (('actors', self._actor_rows, self._actor_dtype),
+                                   ('traffic_lights', self._traffic_light_rows, self._traffic_light_dtype)):
+            if not rows:
+                continue
+            array = np.array(rows, dtype=dtype)
+            for column in dtype.names:
+                array[column].tofile(self._files[(table, column)])
+                self._files[(table, column)].flush()
+
+        self._events_file.flush()
+
+        self._actor_rows = []
+        self._traffic_light_rows = []
+        self._ticks_since_flush = 0
+
+    def close(self):
+        """
+        Write the final state of the traffic events (criteria may update them
+        when they terminate), flush the remaining rows and close the files.
+        Returns False, if the final state of a traffic event was not recorded.
+        """
+        if self._last_frame is not None:
+            self._write_all_events(self._last_frame)
+        self.flush()
+        for file_handle in self._files.values():
+            file_handle.close()
+        self._files = {}
+        self._events_file.close()
+        return self._check_events()
+
+
+def read_events(file_name):
+    """
+    Read the traffic events of a recording, in order of their first report.
+    Only the last (final) state of an updated event is returned.
+    """
+    events = []
+    positions = {}
+    with open(file_name) as events_file:
+        for line in events_file:
+            event = json.loads(line)
+            if 'id' in event and event['id'] in positions:
+                events[positions[event['id']]] = event
+            else:
+                positions[event.get('id')] = len(events)
+                events.append(event)
+    return events
+
+
+def load_trajectory(path):
+    """
+    Load a recorded trajectory. Returns a dictionary with the tables 'actors'
+    and 'traffic_lights' (dictionaries of memory-mapped numpy columns), the list
+    of 'events', the 'route' (array or None), the 'static' information and the
+    'scenario' name.
+    """
+    with open(os.path.join(path, "meta.json")) as meta_file:
+        meta = json.load(meta_file)
+
+    recording = {'scenario': meta['scenario'], 'static': meta.get('static', {}), 'events': [], 'route': None}
+    route_file_name = os.path.join(path, "route.npy")
+    if os.path.exists(route_file_name):
+        recording['route'] = np.load(route_file_name, mmap_mode='r')
+
+    for table in ('actors', 'traffic_lights'):
+        recording[table] = {}
+        for column, dtype in meta[table]:
+            file_name = os.path.join(path, "{}.{}.bin".format(table, column))
+            if os.path.getsize(file_name) > 0:
+                recording[table][column] = np.memmap(file_name, dtype=np.dtype(dtype), mode='r')
+            else:
+                recording[table][column] = np.empty(0, dtype=np.dtype(dtype))
+
+    events_file_name = os.path.join(path, "events.jsonl")
+    if os.path.exists(events_file_name):
+        recording['events'] = read_events(events_file_name)
+
+    return recording
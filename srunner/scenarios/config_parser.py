@@ -10,31 +10,57 @@
 This module provides a parser for scenario configuration files
 """
 
-import glob
 import os
+import tempfile
 import xml.etree.ElementTree as ET
 
+import numpy as np
+
 import carla
 from agents.navigation.local_planner import RoadOption
 
+from srunner.scenarios.scenario_catalog import get_cache_directory, get_scenario_catalog
+
+
+# Compiled route: one row per waypoint, the connection is the index into ROAD_OPTIONS
+ROUTE_DTYPE = np.dtype([('x', np.float64), ('y', np.float64), ('z', np.float64), ('connection', np.uint8)])
+ROAD_OPTIONS = list(RoadOption)
+
 
 class RouteConfiguration(object):
 
     """
     This class provides the basic  configuration for a route
-    """
 
-    def __init__(self, node):
-        self.data = []
+    The route is kept as structured numpy array (ROUTE_DTYPE). The list of
+    (carla.Location, RoadOption) tuples (data) is created on first access.
+    """
 
-        for waypoint in node.iter("waypoint"):
-            x = float(set_attrib(waypoint, 'x', 0))
-            y = float(set_attrib(waypoint, 'y', 0))
-            z = float(set_attrib(waypoint, 'z', 0))
-            c = set_attrib(waypoint, 'connection', '')
-            connection = RoadOption[c.split('.')[1]]
+    def __init__(self, node=None, array=None):
+        if array is None:
+            road_option_index = {road_option.name: index for index, road_option in enumerate(ROAD_OPTIONS)}
+            waypoints = []
+            for waypoint in node.iter("waypoint"):
+                x = float(set_attrib(waypoint, 'x', 0))
+                y = float(set_attrib(waypoint, 'y', 0))
+                z = float(set_attrib(waypoint, 'z', 0))
+                c = set_attrib(waypoint, 'connection', '')
+                waypoints.append((x, y, z, road_option_index[c.split('.')[1]]))
+            array = np.array(waypoints, dtype=ROUTE_DTYPE)
+
+        self.array = array
+        self._data = None
+
+    @property
+    def data(self):
+        """
+        List of (carla.Location, RoadOption) tuples
+        """
+        if self._data is None:
+            self._data = [(carla.Location(float(x), float(y), float(z)), ROAD_OPTIONS[connection])
+                          for x, y, z, connection in self.array.tolist()]
+        return self._data
 
-            self.data.append((carla.Location(x, y, z), connection))
 
 class TargetConfiguration(object):
 
@@ -118,6 +144,18 @@ def parse_scenario_configuration(file_name, scenario_name):
     the config file will be returned. Otherwise only the scenario,
     that matches the scenario_name.
     """
+    return list(iterate_scenario_configurations(file_name, scenario_name))
+
+
+def iterate_scenario_configurations(file_name, scenario_name):
+    """
+    Lazy version of parse_scenario_configuration(), which yields the
+    ScenarioConfigurations one after the other
+
+    The file is parsed incrementally (iterparse) and every element is cleared
+    once it was processed. Scenarios not matching the scenario_name are skipped
+    without creating their configuration (incl. the route).
+    """
 
     single_scenario_only = True
     if scenario_name.startswith("group:"):
@@ -125,67 +163,124 @@ def parse_scenario_configuration(file_name, scenario_name):
         scenario_name = scenario_name[6:]
         file_name = scenario_name
 
-    scenario_config_file = os.getenv('ROOT_SCENARIO_RUNNER', "./") + "/srunner/configs/" + file_name + ".xml"
-    tree = ET.parse(scenario_config_file)
+    # A single scenario (and every other definition with the same name in
+    # the file) is parsed from its byte range in the configuration file
+    if single_scenario_only:
+        entries = get_scenario_catalog().get_all(scenario_name, file_name)
+        for entry in entries:
+            yield parse_scenario_node(ET.fromstring(get_scenario_catalog().read_scenario(entry)),
+                                      entry['hash'], entry['ordinal'])
+        if entries:
+            return
 
-    scenario_configurations = []
+    scenario_config_file = os.getenv('ROOT_SCENARIO_RUNNER', "./") + "/srunner/configs/" + file_name + ".xml"
 
-    for scenario in tree.iter("scenario"):
+    root = None
+    matching = False
+    ordinal = 0
+    for event, element in ET.iterparse(scenario_config_file, events=("start", "end")):
+        if root is None:
+            root = element
+
+        if element.tag != "scenario":
+            # children of matching scenarios are needed until the end of the scenario
+            if event == "end" and not matching:
+                element.clear()
+            continue
+
+        if event == "start":
+            matching = not single_scenario_only or set_attrib(element, 'name', None) == scenario_name
+        else:
+            if matching:
+                entries = get_scenario_catalog().get_all(set_attrib(element, 'name', None), file_name)
+                config_hash = entries[0]['hash'] if entries else None
+                yield parse_scenario_node(element, config_hash, ordinal)
+            matching = False
+            ordinal += 1
+            element.clear()
+            root.clear()
 
-        new_config = ScenarioConfiguration()
-        new_config.town = set_attrib(scenario, 'town', None)
-        new_config.name = set_attrib(scenario, 'name', None)
-        new_config.type = set_attrib(scenario, 'type', None)
-        new_config.other_actors = []
 
-        for ego_vehicle in scenario.iter("ego_vehicle"):
-            new_config.ego_vehicle = ActorConfiguration(ego_vehicle)
+def get_route_cache_file(config_hash, scenario_name, ordinal):
+    """
+    File of the compiled route of a scenario, for the configuration file with the given hash.
+    The ordinal (position of the scenario within the file) separates scenarios with the same name.
+    """
+    return os.path.join(get_cache_directory(), "routes", config_hash, "{}.{}.npy".format(scenario_name, ordinal))
 
-        for target in scenario.iter("target"):
-            new_config.target = TargetConfiguration(target)
 
-        for route in scenario.iter("route"):
-            new_config.route = RouteConfiguration(route)
+def _load_route(node, cache_file):
+    """
+    Load the compiled route from cache_file, or parse the route node and
+    compile it into the cache_file (if given)
+    """
+    if cache_file is not None and os.path.exists(cache_file):
+        try:
+            return RouteConfiguration(array=np.load(cache_file, mmap_mode='r'))
+        except (IOError, OSError, ValueError):
+            pass
 
-        for other_actor in scenario.iter("other_actor"):
-            new_config.other_actors.append(ActorConfiguration(other_actor))
+    route = RouteConfiguration(node)
 
-        if single_scenario_only:
-            if new_config.name == scenario_name:
-                scenario_configurations.append(new_config)
-        else:
-            scenario_configurations.append(new_config)
+    if cache_file is not None:
+        try:
+            if not os.path.exists(os.path.dirname(cache_file)):
+                os.makedirs(os.path.dirname(cache_file))
+            fd, temporary_file = tempfile.mkstemp(dir=os.path.dirname(cache_file), suffix=".npy")
+            with os.fdopen(fd, 'wb') as route_file:
+                np.save(route_file, route.array)
+            os.rename(temporary_file, cache_file)
+        except (IOError, OSError):
+            pass
 
-    return scenario_configurations
+    return route
 
 
-def get_list_of_scenarios():
+def parse_scenario_node(scenario, config_hash=None, ordinal=None):
     """
-    Parse *all* config files and provide a list with all scenarios @return
+    Create the ScenarioConfiguration of a <scenario> XML node
+
+    If the hash of the configuration file and the position of the scenario
+    within the file (ordinal) are given, the route is loaded from (or stored
+    into) the compiled route cache.
     """
+    new_config = ScenarioConfiguration()
+    new_config.town = set_attrib(scenario, 'town', None)
+    new_config.name = set_attrib(scenario, 'name', None)
+    new_config.type = set_attrib(scenario, 'type', None)
+    new_config.other_actors = []
 
-    list_of_config_files = glob.glob("{}/srunner/configs/*.xml".format(os.getenv('ROOT_SCENARIO_RUNNER', "./")))
+    for ego_vehicle in scenario.iter("ego_vehicle"):
+        new_config.ego_vehicle = ActorConfiguration(ego_vehicle)
 
-    scenarios = []
-    for file_name in list_of_config_files:
-        tree = ET.parse(file_name)
-        for scenario in tree.iter("scenario"):
-            scenarios.append(set_attrib(scenario, 'name', None))
+    for target in scenario.iter("target"):
+        new_config.target = TargetConfiguration(target)
 
-    return scenarios
+    for route in scenario.iter("route"):
+        cache_file = None
+        if config_hash is not None and ordinal is not None:
+            cache_file = get_route_cache_file(config_hash, new_config.name, ordinal)
+        new_config.route = _load_route(route, cache_file)
 
+    for other_actor in scenario.iter("other_actor"):
+        new_config.other_actors.append(ActorConfiguration(other_actor))
 
-def find_scenario_config(scenario_name):
+    return new_config
+
+
+def get_list_of_scenarios():
     """
-    Parse *all* config files and find first match for scenario config
+    Provide a list with all scenarios of *all* config files @return
+    The scenarios are looked up in the (cached) scenario catalog.
     """
+    return get_scenario_catalog().get_names()
 
-    list_of_config_files = glob.glob("{}/srunner/configs/*.xml".format(os.getenv('ROOT_SCENARIO_RUNNER', "./")))
-
-    for file_name in list_of_config_files:
-        tree = ET.parse(file_name)
-        for scenario in tree.iter("scenario"):
-            if set_attrib(scenario, 'name', None) == scenario_name:
-                return os.path.basename(file_name).split(".")[0]
 
+def find_scenario_config(scenario_name):
+    """
+    Find first match for scenario config in the scenario catalog
+    """
+    entry = get_scenario_catalog().get(scenario_name)
+    if entry is not None:
+        return entry['file']
     return None
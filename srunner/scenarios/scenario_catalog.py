@@ -0,0 +1,214 @@
+#!/usr/bin/env python
+
+#
+# This work is licensed under the terms of the MIT license.
+# For a copy, see <https://opensource.org/licenses/MIT>.
+
+"""
+This module provides an index of all scenarios defined in the
+configuration files (srunner/configs/*.xml).
+
+For every scenario the catalog stores the configuration file, type, town
+and the byte range of its <scenario> element. The index is cached on disk
+and only the configuration files that changed (modification time and size,
+confirmed by the content hash) are scanned again.
+"""
+
+import glob
+import hashlib
+import json
+import os
+import re
+import tempfile
+import xml.parsers.expat
+
+CATALOG_VERSION = 2
+
+
+def get_config_directory():
+    """
+    Directory of the scenario configuration files
+    """
+    return os.path.join(os.getenv('ROOT_SCENARIO_RUNNER', "./"), "srunner", "configs")
+
+
+def get_cache_directory():
+    """
+    Directory for cached indices (can be set with SCENARIO_RUNNER_CACHE)
+    """
+    return os.getenv('SCENARIO_RUNNER_CACHE', os.path.join(os.path.expanduser("~"), ".cache", "scenario_runner"))
+
+
+def file_hash(file_name):
+    """
+    SHA1 of the file content
+    """
+    sha1 = hashlib.sha1()
+    with open(file_name, 'rb') as file_handle:
+        for chunk in iter(lambda: file_handle.read(1 << 20), b''):
+            sha1.update(chunk)
+    return sha1.hexdigest()
+
+
+def index_config_file(file_name):
+    """
+    Scan a configuration file and return a list of its scenarios with
+    name, type, town and byte range (offset, length) of the element
+    """
+    with open(file_name, 'rb') as file_handle:
+        data = file_handle.read()
+
+    config_name = os.path.basename(file_name).split(".")[0]
+    scenarios = []
+    parser = xml.parsers.expat.ParserCreate()
+
+    def start_element(tag, attributes):
+        if tag == "scenario":
+            scenarios.append({'name': attributes.get('name'),
+                              'type': attributes.get('type'),
+                              'town': attributes.get('town'),
+                              'file': config_name,
+                              'offset': parser.CurrentByteIndex})
+
+    def end_element(tag):
+        if tag == "scenario":
+            # expat reports the start of an end tag, or the end of a self-closing element
+            end = parser.CurrentByteIndex
+            if re.match(br'</scenario[\s>]', data[end:end + 11]):
+                end = data.index(b'>', end) + 1
+            scenarios[-1]['length'] = end - scenarios[-1]['offset']
+
+    parser.StartElementHandler = start_element
+    parser.EndElementHandler = end_element
+    parser.Parse(data, True)
+
+    return scenarios
+
+
+class ScenarioCatalog(object):
+
+    """
+    Index of all scenarios: name -> configuration file, type, town and byte range
+
+    Usage:
+    catalog = ScenarioCatalog()
+    entry = catalog.get("FollowLeadingVehicle")
+    """
+
+    def __init__(self, config_directory=None, cache_directory=None):
+        self.config_directory = config_directory if config_directory is not None else get_config_directory()
+        cache_directory = cache_directory if cache_directory is not None else get_cache_directory()
+
+        directory_key = hashlib.sha1(os.path.abspath(self.config_directory).encode('utf-8')).hexdigest()[:16]
+        self._cache_file = os.path.join(cache_directory, "catalog-{}.json".format(directory_key))
+
+        self._files = {}
+        self._scenarios = {}
+        self._names = []
+        self.update()
+
+    def _load_cache(self):
+        try:
+            with open(self._cache_file) as cache_file:
+                cache = json.load(cache_file)
+        except (IOError, OSError, ValueError):
+            return {}
+        if cache.get('version') != CATALOG_VERSION:
+            return {}
+        return cache.get('files', {})
+
+    def _save_cache(self):
+        """
+        Write the index atomically. A read-only cache directory is not an error.
+        """
+        try:
+            cache_directory = os.path.dirname(self._cache_file)
+            if not os.path.exists(cache_directory):
+                os.makedirs(cache_directory)
+            fd, temporary_file = tempfile.mkstemp(dir=cache_directory, suffix=".tmp")
+            with os.fdopen(fd, 'w') as cache_file:
+                json.dump({'version': CATALOG_VERSION, 'files': self._files}, cache_file)
+            os.rename(temporary_file, self._cache_file)
+        except (IOError, OSError):
+            pass
+
+    def update(self):
+        """
+        Re-scan all configuration files that changed since the index was built
+        """
+        cached_files = self._load_cache()
+        files = {}
+        modified = False
+
+        for file_name in sorted(glob.glob(os.path.join(self.config_directory, "*.xml"))):
+            stat = os.stat(file_name)
+            key = os.path.abspath(file_name)
+            entry = cached_files.get(key)
+
+            if entry is None or entry['mtime'] != stat.st_mtime or entry['size'] != stat.st_size:
+                content_hash = file_hash(file_name)
+                if entry is None or entry['hash'] != content_hash:
+                    entry = {'hash': content_hash, 'scenarios': index_config_file(file_name)}
+                entry['mtime'] = stat.st_mtime
+                entry['size'] = stat.st_size
+                modified = True
+
+            files[key] = entry
+
+        self._files = files
+        if modified or set(files.keys()) != set(cached_files.keys()):
+            self._save_cache()
+
+        self._scenarios = {}
+        self._names = []
+        for key in sorted(files.keys()):
+            for ordinal, scenario in enumerate(files[key]['scenarios']):
+                self._names.append(scenario['name'])
+                scenario = dict(scenario)
+                scenario['path'] = key
+                scenario['hash'] = files[key]['hash']
+                scenario['ordinal'] = ordinal
+                self._scenarios.setdefault(scenario['name'], []).append(scenario)
+
+    def get(self, scenario_name):
+        """
+        Returns the first catalog entry of the scenario or None
+        """
+        entries = self._scenarios.get(scenario_name)
+        return entries[0] if entries else None
+
+    def get_all(self, scenario_name, config_name=None):
+        """
+        Returns all catalog entries of the scenario in order of their definition,
+        optionally only those of the configuration file config_name
+        """
+        return [entry for entry in self._scenarios.get(scenario_name, [])
+                if config_name is None or entry['file'] == config_name]
+
+    def get_names(self):
+        """
+        Returns the names of all scenarios in order of their definition
+        """
+        return list(self._names)
+
+    def read_scenario(self, entry):
+        """
+        Returns the raw <scenario> element of a catalog entry
+        """
+        with open(entry['path'], 'rb') as file_handle:
+            file_handle.seek(entry['offset'])
+            return file_handle.read(entry['length'])
+
+
+_CATALOG = None
+
+
+def get_scenario_catalog():
+    """
+    Returns the catalog of the current configuration directory, which is
+    created (and validated against the files) once per process
+    """
+    global _CATALOG     # pylint: disable=global-statement
+    if _CATALOG is None or _CATALOG.config_directory != get_config_directory():
+        _CATALOG = ScenarioCatalog()
+    return _CATALOG
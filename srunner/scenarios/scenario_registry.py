@@ -0,0 +1,286 @@
+#!/usr/bin/env python
+
+#
+# This work is licensed under the terms of the MIT license.
+# For a copy, see <https://opensource.org/licenses/MIT>.
+
+"""
+This module provides the registry of all scenario classes.
+
+Scenario modules are discovered in srunner/scenarios and in external packages,
+which register their modules for the entry point group "srunner.scenarios", e.g.
+in their setup.py:
+
+    entry_points={'srunner.scenarios': ['my_scenarios = my_package.my_scenarios']}
+
+A scenario module declares its scenarios in a module-level list of class names
+named <GROUP>_SCENARIOS, e.g. FOLLOW_LEADING_VEHICLE_SCENARIOS. The group
+(FollowLeadingVehicle) is the name of the config file in srunner/configs.
+
+The modules are not imported for the discovery, their source is parsed instead.
+The result is stored in an index file and only modules, which changed since,
+are parsed again. A scenario module is imported once its class is requested.
+"""
+
+from __future__ import print_function
+import ast
+import glob
+import importlib
+import importlib.util
+import json
+import os
+import sys
+import tempfile
+
+from srunner.scenarios.scenario_catalog import get_cache_directory
+
+ENTRY_POINT_GROUP = "srunner.scenarios"
+REGISTRY_VERSION = 1
+
+
+def _group_name(variable_name):
+    """
+    FOLLOW_LEADING_VEHICLE_SCENARIOS -> FollowLeadingVehicle
+    """
+    return "".join(part.capitalize() for part in variable_name[:-len("_SCENARIOS")].split("_"))
+
+
+def scan_scenario_module(file_name):
+    """
+    Parse the source of a scenario module and return a dictionary
+    group -> list of scenario classes
+    """
+    with open(file_name, 'rb') as module_file:
+        tree = ast.parse(module_file.read(), file_name)
+
+    groups = {}
+    for node in tree.body:
+        if not isinstance(node, ast.Assign) or len(node.targets) != 1 or not isinstance(node.targets[0], ast.Name):
+            continue
+        variable_name = node.targets[0].id
+        if not variable_name.endswith("_SCENARIOS") or not isinstance(node.value, (ast.List, ast.Tuple)):
+            continue
+        try:
+            groups[_group_name(variable_name)] = [str(ast.literal_eval(element)) for element in node.value.elts]
+        except ValueError:
+            continue
+
+    return groups
+
+
+def _get_entry_point_modules():
+    """
+    Returns the module paths registered for the entry point group
+    """
+    try:
+        from importlib import metadata   # pylint: disable=import-outside-toplevel
+    except ImportError:
+        try:
+            import pkg_resources    # pylint: disable=import-outside-toplevel
+        except ImportError:
+            return []
+        return sorted(entry_point.module_name for entry_point in pkg_resources.iter_entry_points(ENTRY_POINT_GROUP))
+
+    entry_points = metadata.entry_points()
+    if hasattr(entry_points, 'select'):
+        entry_points = entry_points.select(group=ENTRY_POINT_GROUP)
+    else:
+        entry_points = entry_points.get(ENTRY_POINT_GROUP, [])
+    return sorted(entry_point.value.split(":")[0].strip() for entry_point in entry_points)
+
+
+def _get_module_file(module):
+    """
+    Returns the source file of a module without importing it (None if not found)
+    """
+    try:
+        spec = importlib.util.find_spec(module)
+    except (ImportError, ValueError):
+        return None
+    if spec is None or spec.origin is None or not spec.origin.endswith(".py"):
+        return None
+    return spec.origin
+
+
+class ScenarioRegistry(object):
+
+    """
+    Registry of all scenario classes: scenario class -> group and module
+
+    Usage:
+    registry = ScenarioRegistry()
+    scenario_class = registry.get_scenario_class("FollowLeadingVehicle")
+    """
+
+    def __init__(self, cache_directory=None):
+        cache_directory = cache_directory if cache_directory is not None else get_cache_directory()
+        self._cache_file = os.path.join(cache_directory, "scenario_registry.json")
+
+        self._modules = {}
+        self._groups = {}
+        self._scenario_classes = {}
+        self.update()
+
+    def _get_scenario_modules(self):
+        """
+        Returns a list of (module, source file) of all scenario modules
+        """
+        package_directory = os.path.dirname(os.path.abspath(__file__))
+        modules = []
+        for file_name in sorted(glob.glob(os.path.join(package_directory, "*.py"))):
+            module_name = os.path.basename(file_name)[:-3]
+            if module_name != "__init__":
+                modules.append(("srunner.scenarios." + module_name, file_name))
+
+        for module in _get_entry_point_modules():
+            file_name = _get_module_file(module)
+            if file_name is None:
+                print("Scenario module '{}' registered as entry point cannot be found".format(module))
+                continue
+            modules.append((module, file_name))
+
+        return modules
+
+    def _load_cache(self):
+        try:
+            with open(self._cache_file) as cache_file:
+                cache = json.load(cache_file)
+        except (IOError, OSError, ValueError):
+            return {}
+        if cache.get('version') != REGISTRY_VERSION:
+            return {}
+        return cache.get('modules', {})
+
+    def _save_cache(self):
+        """
+        Write the index atomically. A read-only cache directory is not an error.
+        """
+        try:
+            cache_directory = os.path.dirname(self._cache_file)
+            if not os.path.exists(cache_directory):
+                os.makedirs(cache_directory)
+            fd, temporary_file = tempfile.mkstemp(dir=cache_directory, suffix=".tmp")
+            with os.fdopen(fd, 'w') as cache_file:
+                json.dump({'version': REGISTRY_VERSION, 'modules': self._modules}, cache_file)
+            os.rename(temporary_file, self._cache_file)
+        except (IOError, OSError):
+            pass
+
+    def update(self):
+        """
+        Discover all scenario modules, parsing only those changed since the index was built
+        """
+        cached_modules = self._load_cache()
+        modules = {}
+        modified = False
+
+        for module, file_name in self._get_scenario_modules():
+            stat = os.stat(file_name)
+            entry = cached_modules.get(module)
+            if entry is None or entry['file'] != file_name or \
+                    entry['mtime'] != stat.st_mtime or entry['size'] != stat.st_size:
+                entry = {'file': file_name, 'mtime': stat.st_mtime, 'size': stat.st_size,
+                         'groups': scan_scenario_module(file_name)}
+                modified = True
+            modules[module] = entry
+
+        self._modules = modules
+        if modified or set(modules.keys()) != set(cached_modules.keys()):
+            self._save_cache()
+
+        self._groups = {}
+        self._scenario_classes = {}
+        for module in sorted(modules.keys()):
+            for group, scenario_classes in modules[module]['groups'].items():
+                self._groups.setdefault(group, [])
+                for scenario_class in scenario_classes:
+                    if scenario_class in self._scenario_classes:
+                        print("Scenario class '{}' of module '{}' already registered by module '{}'".format(
+                            scenario_class, module, self._scenario_classes[scenario_class][1]))
+                        continue
+                    self._groups[group].append(scenario_class)
+                    self._scenario_classes[scenario_class] = (group, module)
+
+    def get_scenario_groups(self, groups=None, exclude=None):
+        """
+        Returns a dictionary group -> list of scenario classes,
+        optionally restricted to the given groups or without the excluded groups
+        """
+        return {group: list(scenario_classes) for group, scenario_classes in sorted(self._groups.items())
+                if (groups is None or group in groups) and (exclude is None or group not in exclude)}
+
+    def get_scenario_module(self, scenario_class):
+        """
+        Returns the module path of the scenario class or None, without importing it
+        """
+        if scenario_class not in self._scenario_classes:
+            return None
+        return self._scenario_classes[scenario_class][1]
+
+    def get_module_file(self, module):
+        """
+        Returns the source file of a registered scenario module or None
+        """
+        if module not in self._modules:
+            return None
+        return self._modules[module]['file']
+
+    def get_scenario_class(self, scenario_class, groups=None):
+        """
+        Import the module of the scenario class and return the class.
+        Returns None, if the class is not registered (within the given groups).
+        """
+        if scenario_class not in self._scenario_classes:
+            return None
+
+        group, module = self._scenario_classes[scenario_class]
+        if groups is not None and group not in groups:
+            return None
+
+        return getattr(importlib.import_module(module), scenario_class)
+
+
+_REGISTRY = None
+
+
+def get_scenario_registry():
+    """
+    Returns the scenario registry, which is created once per process
+    """
+    global _REGISTRY    # pylint: disable=global-statement
+    if _REGISTRY is None:
+        _REGISTRY = ScenarioRegistry()
+    return _REGISTRY
+
+
+def get_scenario_groups(groups=None, exclude=None):
+    """
+    Returns a dictionary group -> list of scenario classes (see ScenarioRegistry)
+    """
+    return get_scenario_registry().get_scenario_groups(groups, exclude)
+
+
+def get_scenario_module(scenario_class):
+    """
+    Returns the module path of the scenario class or None (see ScenarioRegistry)
+    """
+    return get_scenario_registry().get_scenario_module(scenario_class)
+
+
+def get_scenario_class(scenario_class, groups=None):
+    """
+    Returns the scenario class or None (see ScenarioRegistry)
+    """
+    return get_scenario_registry().get_scenario_class(scenario_class, groups)
+
+
+def get_scenario_class_or_fail(scenario_class, groups=None):
+    """
+    Get scenario class by scenario name
+    If scenario is not supported or not found, exit script
+    """
+    scenario = get_scenario_class(scenario_class, groups)
+    if scenario is None:
+        print("Scenario '{}' not supported ... Exiting".format(scenario_class))
+        sys.exit(-1)
+    return scenario